@@ -1,17 +1,29 @@
 import os
-import json
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, g, render_template, request, jsonify, send_file, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
-import pandas as pd
 from datetime import datetime, timedelta
-import plotly.express as px
-import plotly.graph_objects as go
 from dotenv import load_dotenv
 import logging
+import tempfile
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
 
 # Import our custom modules
-from msproject_integration import MSProjectIntegration
+from backends import BACKENDS, BackendUnavailableError, get_backend
 from earned_schedule import EarnedScheduleCalculator
+from baseline_curve import BaselineCurveCache
+from portfolio import PortfolioStore
+from import_jobs import ImportJobManager
+from live_updates import EventBroker
+from snapshot_store import SnapshotStore
+from shared_state import SharedStateStore
+from milestone_record import Milestone, DATE_FORMAT
+from monte_carlo import MonteCarloForecaster, SPIDistribution
+from forecast_backtest import DEFAULT_STEP_DAYS, DEFAULT_TOLERANCE_DAYS, ForecastBacktester, status_date_range
+from instrumentation import metrics
+from response_encoding import compress_response, encode_json, format_milestones, get_format
 
 # Set up logging
 logging.basicConfig(
@@ -25,51 +37,375 @@ logger = logging.getLogger('app')
 # Load environment variables
 load_dotenv()
 
+# Directory MS Project XML (MSPDI) exports may be imported from by path
+MSPDI_IMPORT_DIR = os.getenv('MSPDI_IMPORT_DIR')
+
+# Upload file extensions imported as Milestone Forecast workbooks
+EXCEL_EXTENSIONS = ('.xlsx', '.xlsm')
+
+# Seconds an HTTP request waits for a short COM call queued behind running imports
+COM_CALL_TIMEOUT = float(os.getenv('COM_CALL_TIMEOUT', '30'))
+
+# Backend of imports from MS Project: 'com' (MS Project over pywin32) or 'fake' (synthetic project)
+MSPROJECT_BACKEND = os.getenv('MSPROJECT_BACKEND', 'com')
+
+# Number of tasks in the synthetic project of the 'fake' backend
+FAKE_TASK_COUNT = int(os.getenv('FAKE_TASK_COUNT', '1000'))
+
+# SQLite database holding the status-date snapshot history (default: snapshots.db in the
+# application's instance folder)
+SNAPSHOT_DB = os.getenv('SNAPSHOT_DB')
+
+# SQLite database through which worker processes (e.g. gunicorn -w 4) share their projects;
+# unset, each process keeps its own
+SHARED_STATE_DB = os.getenv('SHARED_STATE_DB')
+
+# Seconds between background checks for changes saved by other workers (pushed to live clients)
+SHARED_STATE_POLL_INTERVAL = float(os.getenv('SHARED_STATE_POLL_INTERVAL', '1'))
+
+# Debugger and reloader of the development server (python app.py); off unless FLASK_DEBUG is set,
+# since the debugger runs arbitrary code for anyone who can reach it
+DEBUG = os.getenv('FLASK_DEBUG', '').lower() in ('1', 'true', 'yes')
+
+class MilestoneJSONProvider(DefaultJSONProvider):
+    """JSON provider that turns Milestone records and datetimes into strings
+    
+    Milestones keep native dates in memory; this is the only place they are
+    formatted. Responses are compact, also in debug mode, and encoded with
+    orjson.
+    """
+    
+    compact = True
+    
+    @staticmethod
+    def default(o):
+        if isinstance(o, Milestone):
+            return o.to_dict()
+        if isinstance(o, datetime):
+            return o.strftime(DATE_FORMAT)
+        return DefaultJSONProvider.default(o)
+    
+    def dumps(self, obj, **kwargs):
+        with metrics.span('json.dumps'):
+            # Other options (e.g. indent) are left to the standard library encoder
+            if kwargs.keys() <= {'separators'}:
+                return encode_json(obj, self.default, self.sort_keys).decode()
+            return super().dumps(obj, **kwargs)
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        with metrics.span('json.dumps'):
+            data = encode_json(obj, self.default, self.sort_keys)
+        return self._app.response_class(data + b'\n', mimetype=self.mimetype)
+
 app = Flask(__name__)
+app.json = MilestoneJSONProvider(app)
 CORS(app)  # Enable CORS
 
-# Initialize project integration
-project_integration = MSProjectIntegration()
+@app.before_request
+def start_request_timer():
+    """Remember when the request started, for the request duration histogram"""
+    if metrics.enabled:
+        g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_duration(response):
+    """Record the request duration by route, method and status"""
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        metrics.observe('http_request_duration_seconds', time.perf_counter() - started,
+                        route=route, method=request.method, status=response.status_code)
+    return response
+
+@app.after_request
+def compress(response):
+    """Compress JSON and text responses with brotli or gzip when the client accepts it"""
+    with metrics.span('response.compress'):
+        return compress_response(response, request.accept_encodings)
+
+# Milestone sources are imported on first use, so COM is only loaded by COM work
+com_backend = get_backend(MSPROJECT_BACKEND)
+mspdi_backend = get_backend('mspdi')
+excel_backend = get_backend('excel')
+
+# One MS Project COM connection, kept alive and shared by all integrations
+com_session = com_backend.create_session(**({'task_count': FAKE_TASK_COUNT} if MSPROJECT_BACKEND == 'fake' else {}))
+
+# Integration with the active project, created on first use
+project_integrations = {}
 
 # Initialize earned schedule calculator
 earned_schedule_calc = EarnedScheduleCalculator()
 
-# Global variable to store imported milestones
-milestones_data = []
+# Planned value curves, cached per project baseline version
+baseline_curves = BaselineCurveCache()
+
+# Forecast history, one snapshot per project and status date
+snapshot_store = SnapshotStore(SNAPSHOT_DB or os.path.join(app.instance_path, 'snapshots.db'))
+
+# Change events pushed to connected browsers (Server-Sent Events)
+event_broker = EventBroker(encode=app.json.dumps)
+
+# Projects saved for the other worker processes, if several serve the app
+shared_state = SharedStateStore(SHARED_STATE_DB) if SHARED_STATE_DB else None
+
+# All COM work runs on one worker thread, which holds the COM connection; job states are
+# shared with the other workers
+import_jobs = ImportJobManager(finalizer=com_session.close, store=shared_state)
+
+# Imported projects with their milestones, keyed by project name
+portfolio = PortfolioStore(earned_schedule_calc, baseline_curves, snapshots=snapshot_store, events=event_broker,
+                           shared=shared_state)
+
+# Probabilistic forecasts from sampled SPI(t)
+monte_carlo = MonteCarloForecaster(earned_schedule_calc)
+
+# Metrics over ranges of status dates and forecast accuracy
+backtester = ForecastBacktester(earned_schedule_calc)
+
+# Process running the shared state poller thread
+shared_state_poller = {'pid': None, 'lock': threading.Lock()}
+
+@app.before_request
+def sync_shared_state():
+    """Take over what other worker processes saved before serving a request"""
+    if shared_state is None:
+        return
+    start_shared_state_poller()
+    portfolio.sync_shared()
+
+def start_shared_state_poller():
+    """Keep taking over other workers' changes in the background, so live clients see them
+    
+    Started on the first request of each worker process, since threads do
+    not survive the fork of a preforking server.
+    """
+    with shared_state_poller['lock']:
+        if shared_state_poller['pid'] == os.getpid():
+            return
+        shared_state_poller['pid'] = os.getpid()
+    
+    def poll():
+        while True:
+            time.sleep(SHARED_STATE_POLL_INTERVAL)
+            portfolio.sync_shared()
+    
+    threading.Thread(target=poll, name='shared-state-poller', daemon=True).start()
+
+# Project name used when a source does not report one
+DEFAULT_PROJECT_NAME = 'Default'
+
+def get_request_options():
+    """Options of a POST request, from its JSON body or form fields"""
+    return request.get_json(silent=True) or request.form.to_dict()
+
+def get_status_date(options):
+    """Status date requested by the client, defaulting to now
+    
+    Clients that want small incremental deltas should send a fixed status
+    date (e.g. the reporting date): with the default, every milestone with
+    a baseline is recomputed on each call because its results depend on it.
+    """
+    value = options.get('status_date')
+    if not value:
+        return datetime.now()
+    status_date = earned_schedule_calc._parse_date(value)
+    if status_date is None:
+        raise ValueError(f'Invalid status_date: {value}')
+    return status_date
+
+def get_sweep_dates(options):
+    """Status dates of a sweep or backtest request
+    
+    Either a 'status_dates' list, or every 'step_days' (default 7) from
+    'start' to 'end' (default: the status date, or now). 'start' defaults
+    to 52 weeks before the end.
+    """
+    values = options.get('status_dates')
+    if values not in (None, ''):
+        if isinstance(values, str):
+            # Form fields send the list comma-separated
+            values = [value for value in values.split(',') if value]
+        if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
+            raise ValueError('status_dates must be a list of dates (YYYY-MM-DD)')
+        if not values:
+            raise ValueError('status_dates must list at least one date')
+        dates = [earned_schedule_calc._parse_date(value) for value in values]
+        if None in dates:
+            raise ValueError(f'Invalid status_dates: {values[dates.index(None)]}')
+        return dates
+    
+    end = get_status_date({'status_date': options.get('end') or options.get('status_date')})
+    start = earned_schedule_calc._parse_date(options['start']) if options.get('start') else end - timedelta(weeks=52)
+    if start is None:
+        raise ValueError(f"Invalid start: {options['start']}")
+    step_days = options.get('step_days')
+    step_days = DEFAULT_STEP_DAYS if step_days in (None, '') else int(step_days)
+    return status_date_range(start, end, step_days)
+
+def get_project(name=None):
+    """Project named in the request (default: the active one), None if not loaded"""
+    return portfolio.project(name or None)
+
+def get_com_source(project_name=None):
+    """MS Project source of the configured backend; the one for the active project is reused
+    
+    Raises BackendUnavailableError if the backend cannot run here (e.g. no pywin32).
+    """
+    if project_name:
+        return com_backend.create_source(project_name=project_name, session=com_session)
+    if None not in project_integrations:
+        project_integrations[None] = com_backend.create_source(session=com_session)
+    return project_integrations[None]
+
+def get_import_source():
+    """Pick the backend and milestone source for an import request
+    
+    An uploaded 'file', or a JSON body with source 'mspdi' or 'excel' and a
+    'path' relative to MSPDI_IMPORT_DIR, selects the file importer: Excel
+    workbooks (.xlsx, .xlsm) are read by the Milestone Forecast importer,
+    other files as MSPDI XML. Anything else imports from MS Project through
+    the configured backend. Returns (backend, source).
+    """
+    upload = request.files.get('file')
+    if upload:
+        backend = excel_backend if (upload.filename or '').lower().endswith(EXCEL_EXTENSIONS) else mspdi_backend
+        return backend, backend.create_source(upload.stream)
+    
+    options = get_request_options()
+    if options.get('source') not in ('mspdi', 'excel'):
+        return com_backend, get_com_source(options.get('project'))
+    
+    backend = get_backend(options['source'])
+    if not MSPDI_IMPORT_DIR:
+        raise ValueError('Importing files by path requires MSPDI_IMPORT_DIR to be set. Upload the file instead.')
+    base_dir = os.path.realpath(MSPDI_IMPORT_DIR)
+    path = os.path.realpath(os.path.join(base_dir, options.get('path') or ''))
+    if os.path.commonpath([base_dir, path]) != base_dir or not os.path.isfile(path):
+        raise ValueError(f"File not found in import directory: {options.get('path')}")
+    return backend, backend.create_source(path)
 
 @app.route('/')
 def index():
     """Main page route"""
     return render_template('index.html')
 
+def run_import(source, options, status_date, since, progress=None, include_milestones=True,
+               response_format='records'):
+    """Extract milestones from a source and merge them into the portfolio
+    
+    Returns the response payload of the import, with milestone lists in
+    ``response_format`` ('records' or 'columns').
+    """
+    # Extract milestones from MS Project or an MSPDI export
+    milestones = source.extract_milestones(progress=progress)
+    
+    # Check if we got any milestones
+    if not milestones or len(milestones) == 0:
+        logger.warning("No milestones found in the project")
+        return {
+            'status': 'warning',
+            'message': 'No milestones found in the project. Please ensure your project has tasks marked as milestones.'
+        }
+    
+    # Merge into the project's cache, recomputing only milestones whose inputs
+    # changed or whose results depend on a moved status date or baseline
+    project_name = options.get('project') or source.get_project_name() or DEFAULT_PROJECT_NAME
+    delta = portfolio.load(project_name, milestones, status_date, source=source)
+    project = portfolio.project(project_name)
+    
+    if is_incremental(options):
+        if since is not None:
+            delta = project.tracker.changes_since(since)
+        if delta is not None:
+            return {
+                'status': 'success',
+                'message': f'Imported {len(milestones)} milestones, {len(delta["changed"])} changed',
+                'project': project_name,
+                'delta': dict(delta, changed=format_milestones(delta['changed'], response_format))
+            }
+    
+    result = {
+        'status': 'success',
+        'message': f'Successfully imported {len(milestones)} milestones',
+        'project': project_name,
+        'version': project.tracker.version
+    }
+    if include_milestones:
+        result['milestones'] = project_milestones(project, response_format)
+    return result
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Counters and stage/request timings in the Prometheus text format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+def is_incremental(options):
+    """Whether an import asks for a delta instead of the full result"""
+    return options.get('incremental') not in (None, False, '', 'false', '0')
+
+def project_milestones(project, response_format):
+    """All milestones of a project in a response layout ('records' or 'columns')"""
+    return project.milestone_columns() if response_format == 'columns' else project.milestones()
+
 @app.route('/api/import-from-msproject', methods=['POST'])
 def import_from_msproject():
-    """API endpoint to import data from MS Project"""
-    global milestones_data
+    """API endpoint to import data from MS Project
+    
+    Imports over COM run as background jobs on the COM worker thread: the
+    response is 202 with the job, whose state, progress and result are
+    polled at /api/import-jobs/<id>. A second import of the same project
+    with the same options while one is queued or running joins that job. Uploaded MSPDI files and
+    Excel workbooks are imported right away.
+    
+    With 'incremental' set, only milestones added, changed or recomputed to
+    different results are returned, as a delta against the 'since' version
+    (default: the previous import). 'project' names the project to import
+    (an open MS Project file, or the name to store an MSPDI file under);
+    the imported project becomes the active one. 'format=columns' returns
+    milestone lists as one array per field.
+    """
+    options = get_request_options()
     try:
-        # Extract milestones from MS Project
-        milestones = project_integration.extract_milestones()
-        
-        # Check if we got any milestones
-        if not milestones or len(milestones) == 0:
-            logger.warning("No milestones found in the project")
-            return jsonify({
-                'status': 'warning',
-                'message': 'No milestones found in the project. Please ensure your project has tasks marked as milestones.'
-            }), 200
-        
-        # Save to global variable and return success
-        milestones_data = milestones
-        
-        # Calculate Earned Schedule metrics for each milestone
-        for milestone in milestones_data:
-            earned_schedule_calc.calculate_milestone_metrics(milestone)
-        
+        backend, source = get_import_source()
+        status_date = get_status_date(options)
+        since = int(options['since']) if options.get('since') not in (None, '') else None
+        response_format = get_format(options.get('format'))
+    except ValueError as e:
         return jsonify({
-            'status': 'success',
-            'message': f'Successfully imported {len(milestones)} milestones',
-            'milestones': milestones
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    except BackendUnavailableError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 503
+    
+    if backend.uses_com:
+        project_name = options.get('project') or None
+        # Only imports with the same options share a job, since they shape the result. The
+        # requested status date is part of the key, not the resolved one: imports without one
+        # all default to now and join the running job
+        job, created = import_jobs.submit(
+            ('msproject', project_name, options.get('status_date') or None, is_incremental(options), since,
+             response_format),
+            lambda progress: run_import(source, options, status_date, since, progress, include_milestones=False,
+                                        response_format=response_format),
+            description=f"Import {project_name or 'active project'} from MS Project"
+        )
+        response = jsonify({
+            'status': 'accepted',
+            'message': 'Import started' if created else 'Import of this project already in progress',
+            'job': job.to_dict()
         })
+        response.status_code = 202
+        response.headers['Location'] = f'/api/import-jobs/{job.id}'
+        return response
+    
+    try:
+        return jsonify(run_import(source, options, status_date, since, response_format=response_format))
     except Exception as e:
         logger.error(f"Error importing milestones: {str(e)}")
         return jsonify({
@@ -77,24 +413,64 @@ def import_from_msproject():
             'message': f'Error importing milestones: {str(e)}'
         }), 500
 
+@app.route('/api/import-jobs', methods=['GET'])
+def list_import_jobs():
+    """Recent import jobs, oldest first"""
+    return jsonify(import_jobs.job_states())
+
+@app.route('/api/import-jobs/<job_id>', methods=['GET'])
+def get_import_job(job_id):
+    """State, progress (tasks scanned / total) and result of an import job"""
+    job = import_jobs.job_state(job_id)
+    if job is None:
+        return jsonify({
+            'status': 'error',
+            'message': f'Unknown import job: {job_id}'
+        }), 404
+    return jsonify(job)
+
+def check_msproject():
+    """Connect to MS Project and list the open projects (runs on the COM worker)"""
+    try:
+        project_integration = get_com_source()
+    except BackendUnavailableError as e:
+        return False, str(e), []
+    success, message = project_integration.connect_to_msproject()
+    open_projects = project_integration.get_currently_open_projects() if success else []
+    return success, message, open_projects
+
+def find_milestones():
+    """Extract milestones from the active project without importing them (runs on the COM worker)"""
+    try:
+        project_integration = get_com_source()
+    except BackendUnavailableError as e:
+        return False, str(e), []
+    success, message = project_integration.connect_to_msproject()
+    if not success:
+        return success, message, []
+    logger.info("Attempting to extract milestones from MS Project")
+    return success, message, project_integration.extract_milestones()
+
 @app.route('/api/msproject-status', methods=['GET'])
 def get_msproject_status():
     """Check if MS Project is running and what projects are open"""
     try:
-        # Try to connect to MS Project
-        success, message = project_integration.connect_to_msproject()
-        
-        # Get list of open projects if connection was successful
-        open_projects = []
-        if success:
-            open_projects = project_integration.get_currently_open_projects()
+        success, message, open_projects = import_jobs.call(check_msproject, timeout=COM_CALL_TIMEOUT)
         
         return jsonify({
             'status': 'success' if success else 'error',
             'message': message,
             'connected': success,
-            'open_projects': open_projects
+            'open_projects': open_projects,
+            'session': com_session.stats()
         })
+    except FutureTimeoutError:
+        return jsonify({
+            'status': 'error',
+            'message': 'MS Project is busy with an import, please try again shortly.',
+            'connected': False,
+            'open_projects': []
+        }), 503
     except Exception as e:
         logger.error(f"Error checking MS Project status: {str(e)}")
         return jsonify({
@@ -104,22 +480,30 @@ def get_msproject_status():
             'open_projects': []
         }), 500
 
+@app.route('/api/backends', methods=['GET'])
+def list_backends():
+    """Registered milestone source backends and the one used for MS Project imports"""
+    return jsonify({
+        'msproject_backend': com_backend.name,
+        'backends': [backend.to_dict() for backend in BACKENDS.values()]
+    })
+
+@app.route('/api/com-session', methods=['GET'])
+def get_com_session():
+    """COM connection reuse and latency counters"""
+    return jsonify(com_session.stats())
+
 @app.route('/api/locate-milestones', methods=['GET'])
 def locate_milestones():
     """Locate milestones in the currently open MS Project file"""
     try:
-        # First check if MS Project is running
-        success, message = project_integration.connect_to_msproject()
+        success, message, milestones = import_jobs.call(find_milestones, timeout=COM_CALL_TIMEOUT)
         if not success:
             logger.error(f"Could not connect to MS Project: {message}")
             return jsonify({
                 'status': 'error',
                 'message': f"Could not connect to MS Project: {message}"
             }), 500
-            
-        # Extract milestones from MS Project without importing them
-        logger.info("Attempting to extract milestones from MS Project")
-        milestones = project_integration.extract_milestones()
         
         # Format milestone info for the frontend
         milestone_info = []
@@ -141,6 +525,11 @@ def locate_milestones():
             'message': f'Found {len(milestone_info)} milestones in the current project',
             'milestones': milestone_info
         })
+    except FutureTimeoutError:
+        return jsonify({
+            'status': 'error',
+            'message': 'MS Project is busy with an import, please try again shortly.'
+        }), 503
     except Exception as e:
         error_msg = f"Error locating milestones: {str(e)}"
         logger.error(error_msg)
@@ -150,27 +539,108 @@ def locate_milestones():
             'message': error_msg
         }), 500
 
+# Query parameters that turn /api/milestones into a paged query
+MILESTONE_QUERY_PARAMS = ('page', 'limit', 'cursor', 'sort', 'order', 'risk', 'status', 'wbs', 'name')
+
+def get_list_arg(name):
+    """Comma-separated query parameter as a list (None if absent)"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    return [item.strip() for item in value.split(',') if item.strip()]
+
 @app.route('/api/milestones', methods=['GET'])
 def get_milestones():
-    """API endpoint to get all milestones"""
-    global milestones_data
-    return jsonify(milestones_data)
+    """API endpoint to get all milestones, the changes since a version, or one page of a query
+    
+    'project' selects a loaded project; the default is the active one. With
+    any of 'sort' (sv_t, spi_t, forecast_finish, risk), 'order' (asc/desc),
+    'risk', 'status' (comma-separated), 'wbs' (prefix), 'name' (substring),
+    'limit', 'page' or 'cursor', one page of matching milestones is returned
+    from the project's index; pages more than 10,000 milestones deep need a
+    cursor. 'format=columns' returns the milestones as one array per field
+    instead of one object per milestone.
+    """
+    project = get_project(request.args.get('project'))
+    try:
+        response_format = get_format(request.args.get('format'))
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    if any(param in request.args for param in MILESTONE_QUERY_PARAMS):
+        if project is None:
+            return jsonify({'version': 0, 'total': 0, 'items': [], 'has_more': False, 'next_cursor': None})
+        order = request.args.get('order', 'asc').lower()
+        try:
+            if order not in ('asc', 'desc'):
+                raise ValueError(f'Invalid order: {order}. Use asc or desc')
+            with project.lock:
+                project.index.sync(project.tracker)
+                result = project.index.query(
+                    sort=request.args.get('sort') or None,
+                    descending=order == 'desc',
+                    cursor=request.args.get('cursor') or None,
+                    page=request.args.get('page', type=int),
+                    limit=request.args.get('limit', type=int),
+                    risk=get_list_arg('risk'),
+                    status=get_list_arg('status'),
+                    wbs=request.args.get('wbs') or None,
+                    name=request.args.get('name') or None
+                )
+                return jsonify(dict(result, items=format_milestones(result['items'], response_format),
+                                    project=project.name))
+        except ValueError as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
+    
+    if project is None:
+        return jsonify(format_milestones([], response_format))
+    since = request.args.get('since', type=int)
+    with project.lock:
+        if since is not None:
+            delta = project.tracker.changes_since(since)
+            if delta is not None:
+                return jsonify(dict(delta, changed=format_milestones(delta['changed'], response_format),
+                                    project=project.name))
+        return jsonify(project_milestones(project, response_format))
 
 @app.route('/api/calculate-forecast', methods=['POST'])
 def calculate_forecast():
-    """Calculate and return forecast for all milestones"""
-    global milestones_data
+    """Calculate and return forecast for all milestones of a project
     
+    'format=columns' returns the forecasts as one array per field.
+    """
+    options = get_request_options()
     try:
-        # Update data with forecasts
-        forecasted_milestones = earned_schedule_calc.calculate_forecasts(milestones_data)
-        
-        # Update global data
-        milestones_data = forecasted_milestones
+        status_date = get_status_date(options)
+        response_format = get_format(options.get('format'))
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    
+    project = get_project(options.get('project'))
+    if project is None:
+        return jsonify({
+            'status': 'success',
+            'version': 0,
+            'forecasts': format_milestones([], response_format)
+        })
+    
+    try:
+        # Update data with forecasts; only status-date dependent milestones are recomputed
+        delta = portfolio.forecast(project.name, status_date)
         
         return jsonify({
             'status': 'success',
-            'forecasts': forecasted_milestones
+            'project': project.name,
+            'version': delta['version'],
+            'forecasts': project_milestones(project, response_format)
         })
     except Exception as e:
         logger.error(f"Error calculating forecasts: {str(e)}")
@@ -179,21 +649,468 @@ def calculate_forecast():
             'message': f'Error calculating forecasts: {str(e)}'
         }), 500
 
+@app.route('/api/monte-carlo-forecast', methods=['POST'])
+def monte_carlo_forecast():
+    """P50/P80/P95 (or other 'percentiles') finish dates per milestone from sampled SPI(t)
+    
+    'project' selects a loaded project (default: the active one) and
+    'projects' several, which are simulated in parallel. 'distribution'
+    ({type, median/sigma or mean/std, correlation}) replaces the one
+    fitted to the project history; 'trials' and 'seed' are optional.
+    """
+    options = get_request_options()
+    try:
+        status_date = get_status_date(options)
+        distribution = options.get('distribution')
+        if distribution is not None:
+            if not isinstance(distribution, dict):
+                raise ValueError('distribution must be an object')
+            distribution = SPIDistribution.from_dict(distribution)
+        percentiles = options.get('percentiles')
+        if isinstance(percentiles, str):
+            percentiles = [float(p) for p in percentiles.split(',') if p]
+        trials = int(options['trials']) if options.get('trials') not in (None, '') else None
+        seed = int(options['seed']) if options.get('seed') is not None else None
+    except (TypeError, ValueError) as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    
+    names = options.get('projects') or None
+    if isinstance(names, str):
+        names = [name for name in names.split(',') if name]
+    if names is None:
+        project = get_project(options.get('project'))
+        names = [project.name] if project is not None else []
+    unknown = [name for name in names if portfolio.project(name) is None]
+    if unknown or not names:
+        return jsonify({
+            'status': 'error',
+            'message': f"Projects not loaded: {', '.join(unknown)}" if unknown
+            else 'No milestone data available. Please import from MS Project first.'
+        }), 404
+    
+    try:
+        results = portfolio.monte_carlo(monte_carlo, status_date, names, distribution, trials, percentiles, seed)
+        return jsonify({
+            'status': 'success',
+            'status_date': status_date,
+            'projects': results
+        })
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    except Exception as e:
+        logger.error(f"Error running Monte Carlo forecast: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Error running Monte Carlo forecast: {str(e)}'
+        }), 500
+
+@app.route('/api/status-sweep', methods=['POST'])
+def status_sweep():
+    """SV(t), SPI(t), TSPI and forecast finish of every milestone at every status date of a range
+    
+    Status dates come from 'status_dates' or 'start'/'end'/'step_days'
+    (see get_sweep_dates); 'metrics' limits the returned matrices. Each
+    matrix has one row per status date and one column per milestone.
+    """
+    options = get_request_options()
+    try:
+        status_dates = get_sweep_dates(options)
+        fields = options.get('metrics') or None
+        if isinstance(fields, str):
+            fields = [field for field in fields.split(',') if field]
+    except (TypeError, ValueError) as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    
+    project = get_project(options.get('project'))
+    if project is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'No milestone data available. Please import from MS Project first.'
+        }), 404
+    
+    try:
+        return jsonify(dict(portfolio.status_sweep(backtester, project.name, status_dates, fields), status='success'))
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    except Exception as e:
+        logger.error(f"Error sweeping status dates: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Error sweeping status dates: {str(e)}'
+        }), 500
+
+@app.route('/api/backtest', methods=['POST'])
+def backtest_forecasts():
+    """How close past forecasts came to the actual finishes, over a range of status dates
+    
+    'source' is 'sweep' (recompute the forecasts as of each status date,
+    the default) or 'snapshots' (the forecasts saved at the time).
+    'tolerance_days' (default 7) sets when a forecast counts as accurate.
+    """
+    options = get_request_options()
+    try:
+        status_dates = get_sweep_dates(options)
+        tolerance_days = options.get('tolerance_days')
+        tolerance_days = DEFAULT_TOLERANCE_DAYS if tolerance_days in (None, '') else float(tolerance_days)
+    except (TypeError, ValueError) as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    
+    project = get_project(options.get('project'))
+    if project is None:
+        return jsonify({
+            'status': 'error',
+            'message': 'No milestone data available. Please import from MS Project first.'
+        }), 404
+    
+    try:
+        result = portfolio.backtest(backtester, project.name, status_dates, tolerance_days,
+                                    options.get('source') or 'sweep')
+        return jsonify(dict(result, status='success'))
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    except Exception as e:
+        logger.error(f"Error backtesting forecasts: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Error backtesting forecasts: {str(e)}'
+        }), 500
+
+# Parts of the dashboard payload, in response order
+DASHBOARD_FIELDS = ('summary', 'timeline', 'milestones')
+
+def get_dashboard_fields():
+    """Dashboard parts selected by 'fields' (comma-separated), less those turned off by 'milestones' or 'timeline'"""
+    fields = get_list_arg('fields') or list(DASHBOARD_FIELDS)
+    unknown = [field for field in fields if field not in DASHBOARD_FIELDS]
+    if unknown:
+        raise ValueError(f"Invalid fields: {', '.join(unknown)}. Use {', '.join(DASHBOARD_FIELDS)}")
+    return [field for field in DASHBOARD_FIELDS
+            if field in fields and request.args.get(field, 'true').lower() not in ('false', '0', 'no')]
+
 @app.route('/api/dashboard-data', methods=['GET'])
 def get_dashboard_data():
-    """Get processed data for dashboard visualizations"""
-    global milestones_data
+    """Get processed data for dashboard visualizations
+    
+    The response carries the milestone version as ETag; a client sending it
+    back in If-None-Match gets a 304 until the milestones change.
+    'fields' selects the parts to return (summary, timeline, milestones;
+    default all), e.g. 'fields=summary' for clients that page through
+    /api/milestones and load the timeline downsampled from /api/timeline;
+    'milestones=false' and 'timeline=false' leave out one part.
+    'format=columns' returns the milestone list as one array per field.
+    """
+    project = get_project(request.args.get('project'))
+    if project is None or not project.tracker.order:
+        return jsonify({
+            'status': 'error',
+            'message': 'No milestone data available. Please import from MS Project first.'
+        }), 404
+    
+    try:
+        fields = get_dashboard_fields()
+        response_format = get_format(request.args.get('format'))
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    
+    with project.lock:
+        project.dashboard.sync(project.tracker)
+        etag = project.dashboard.etag(project.shared_generation)
+        if len(fields) < len(DASHBOARD_FIELDS):
+            etag = f"{etag}-{'-'.join(fields) or 'empty'}"
+        if 'milestones' in fields and response_format == 'columns':
+            etag = f'{etag}-columns'
+        if request.if_none_match.contains_weak(etag):
+            response = app.response_class(status=304)
+        else:
+            data = project.dashboard.dashboard_data(project.milestones(), project.tracker.order)
+            data = {field: data[field] for field in fields}
+            if 'milestones' in data and response_format == 'columns':
+                data['milestones'] = project.milestone_columns()
+            response = jsonify(data)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/api/timeline', methods=['GET'])
+def get_timeline():
+    """Baseline vs forecast timeline of a project, downsampled to a number of points
+    
+    'points' (default 500) caps the number of entries; 'start' and 'end'
+    limit the baseline dates to a viewport, so a zoomed chart asks for the
+    range it shows. When more milestones fall in the range, it is split
+    into equal time buckets that each return their worst and best SV(t).
+    """
+    project = get_project(request.args.get('project'))
+    if project is None or not project.tracker.order:
+        return jsonify({
+            'status': 'error',
+            'message': 'No milestone data available. Please import from MS Project first.'
+        }), 404
+    
+    try:
+        bounds = {}
+        for name in ('start', 'end'):
+            value = request.args.get(name)
+            bounds[name] = earned_schedule_calc._parse_date(value) if value else None
+            if value and bounds[name] is None:
+                raise ValueError(f'Invalid {name}: {value}')
+        points = request.args.get('points', type=int)
+        with project.lock:
+            project.timeline.sync(project.tracker)
+            result = project.timeline.query(points, **bounds)
+            return jsonify(dict(result, project=project.name))
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    except Exception as e:
+        logger.error(f"Error building timeline: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Error building timeline: {str(e)}'
+        }), 500
+
+@app.route('/api/wbs-rollup', methods=['GET'])
+def get_wbs_rollup():
+    """SV(t), SPI(t) and risk totals of a WBS branch and the branches below it
     
-    if not milestones_data:
+    'wbs' selects the branch (default: the whole project) and 'depth'
+    (default 1) how many levels of sub-branches are included. Totals are
+    kept up to date per milestone in the project's WBS tree.
+    """
+    project = get_project(request.args.get('project'))
+    if project is None or not project.tracker.order:
         return jsonify({
             'status': 'error',
             'message': 'No milestone data available. Please import from MS Project first.'
         }), 404
     
-    # Process data for dashboard
-    dashboard_data = earned_schedule_calc.prepare_dashboard_data(milestones_data)
+    wbs = request.args.get('wbs') or None
+    try:
+        with project.lock:
+            project.wbs.sync(project.tracker)
+            rollup = project.wbs.query(wbs, request.args.get('depth', 1, type=int))
+            version = project.wbs.version
+    except KeyError:
+        return jsonify({
+            'status': 'error',
+            'message': f'No milestones under WBS {wbs}'
+        }), 404
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    except Exception as e:
+        logger.error(f"Error rolling up WBS: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Error rolling up WBS: {str(e)}'
+        }), 500
+    return jsonify({'project': project.name, 'version': version, 'rollup': rollup})
+
+@app.route('/api/export/excel', methods=['GET'])
+def export_excel():
+    """Download a project's calculated milestones as a Milestone Forecast workbook
     
-    return jsonify(dashboard_data)
+    'project' selects a loaded project; the default is the active one. The
+    workbook is written row by row in write-only mode to a temporary file,
+    which is then streamed to the client, so memory use does not grow with
+    the number of milestones. It can be imported again as a milestone source.
+    """
+    project = get_project(request.args.get('project'))
+    if project is None or not project.tracker.order:
+        return jsonify({
+            'status': 'error',
+            'message': 'No milestone data available. Please import from MS Project first.'
+        }), 404
+    
+    try:
+        # openpyxl is loaded on the first export, like the import backends
+        from excel_io import ExcelExporter
+        
+        output = tempfile.TemporaryFile()
+        with project.lock:
+            status_date = project.tracker.status_date
+            ExcelExporter().export(project.milestones(), output, project.name, status_date)
+        output.seek(0)
+    except Exception as e:
+        logger.error(f"Error exporting milestones to Excel: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Error exporting milestones to Excel: {str(e)}'
+        }), 500
+    
+    stamp = (status_date or datetime.now()).strftime('%Y-%m-%d')
+    return send_file(
+        output,
+        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        as_attachment=True,
+        download_name=f'{project.name} - Milestone SV(t) Forecast {stamp}.xlsx'
+    )
+
+@app.route('/api/events', methods=['GET'])
+def stream_events():
+    """Server-Sent Events stream of milestone and summary changes
+    
+    Events: 'milestones' (a tracker delta with the project name), 'summary'
+    (the project's new summary and changed timeline entries, by id),
+    'project_removed' and 'reset' (reload everything). 'project' limits the
+    stream to one project. Reconnecting clients resume from Last-Event-ID.
+    """
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id') or None
+    subscription = event_broker.subscribe(last_event_id, project=request.args.get('project') or None)
+    return Response(
+        stream_with_context(event_broker.stream(subscription)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/portfolio', methods=['GET'])
+def get_portfolio():
+    """Summary of every loaded project and of the whole portfolio"""
+    try:
+        return jsonify({
+            'status': 'success',
+            'active': portfolio.active,
+            'summary': portfolio.summary(),
+            'projects': portfolio.project_summaries()
+        })
+    except Exception as e:
+        logger.error(f"Error summarizing portfolio: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Error summarizing portfolio: {str(e)}'
+        }), 500
+
+@app.route('/api/portfolio/forecast', methods=['POST'])
+def forecast_portfolio():
+    """Recalculate forecasts of all loaded projects (or those listed in 'projects') in parallel"""
+    options = get_request_options()
+    try:
+        status_date = get_status_date(options)
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    
+    names = options.get('projects') or None
+    if isinstance(names, str):
+        names = [name for name in names.split(',') if name]
+    unknown = [name for name in names or [] if portfolio.project(name) is None]
+    if unknown:
+        return jsonify({
+            'status': 'error',
+            'message': f"Projects not loaded: {', '.join(unknown)}"
+        }), 404
+    
+    try:
+        deltas = portfolio.forecast_all(status_date, names)
+        return jsonify({
+            'status': 'success',
+            'versions': {name: delta['version'] for name, delta in deltas.items()},
+            'summary': portfolio.summary()
+        })
+    except Exception as e:
+        logger.error(f"Error calculating portfolio forecasts: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Error calculating portfolio forecasts: {str(e)}'
+        }), 500
+
+@app.route('/api/portfolio/<path:name>', methods=['DELETE'])
+def remove_portfolio_project(name):
+    """Remove a project from the portfolio"""
+    if not portfolio.remove(name):
+        return jsonify({
+            'status': 'error',
+            'message': f'Project not loaded: {name}'
+        }), 404
+    return jsonify({
+        'status': 'success',
+        'message': f'Removed project {name}',
+        'active': portfolio.active
+    })
+
+def get_history_window():
+    """Status date range of a history request: 'weeks' back from 'until' (default 52 weeks to now)"""
+    until = request.args.get('until') or None
+    weeks = request.args.get('weeks', default=52, type=int)
+    if until is not None and earned_schedule_calc._parse_date(until) is None:
+        raise ValueError(f'Invalid until date: {until}')
+    return snapshot_store.since_weeks(weeks, until), until
+
+@app.route('/api/history/milestones/<int:uid>', methods=['GET'])
+def get_milestone_history(uid):
+    """SV(t)/SPI(t) trend of one milestone (by UniqueID) over the saved status dates"""
+    project = request.args.get('project') or portfolio.active
+    try:
+        since, until = get_history_window()
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    
+    try:
+        return jsonify({
+            'status': 'success',
+            'project': project,
+            'id': uid,
+            'trend': snapshot_store.milestone_trend(project, uid, since=since, until=until)
+        })
+    except Exception as e:
+        logger.error(f"Error reading milestone history: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Error reading milestone history: {str(e)}'
+        }), 500
+
+@app.route('/api/history/weekly', methods=['GET'])
+def get_weekly_history():
+    """SV(t)/SPI(t) per project and week, for one project or the whole portfolio"""
+    try:
+        since, until = get_history_window()
+    except ValueError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+    
+    try:
+        return jsonify({
+            'status': 'success',
+            'weeks': snapshot_store.weekly_summary(request.args.get('project') or None, since=since, until=until)
+        })
+    except Exception as e:
+        logger.error(f"Error reading weekly history: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Error reading weekly history: {str(e)}'
+        }), 500
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    app.run(debug=DEBUG)
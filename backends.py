@@ -0,0 +1,119 @@
+import importlib
+import importlib.util
+import logging
+import threading
+
+
+class BackendUnavailableError(Exception):
+    """A backend's platform dependencies (e.g. pywin32) are not installed"""
+
+
+def _resolve(path):
+    """Import 'module:attribute' and return the attribute"""
+    module_name, _, attribute = path.partition(':')
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+class SourceBackend:
+    """One kind of milestone source, imported only when first used
+
+    ``source`` and ``session`` are 'module:attribute' paths of the source
+    class and, for COM-style backends, of the factory of the
+    COMSessionManager the sources share. Nothing is imported until
+    create_source() or create_session() is called, so the app starts
+    without loading COM (or failing where pywin32 does not exist).
+    """
+
+    def __init__(self, name, source, description, session=None, requires=()):
+        """Initialize the backend description"""
+        self.name = name
+        self.source = source
+        self.session = session
+        self.description = description
+        self.requires = tuple(requires)
+        self._loaded = {}
+        self._lock = threading.Lock()
+
+    @property
+    def uses_com(self):
+        """Whether sources run on the COM worker thread with a shared session"""
+        return self.session is not None
+
+    def available(self):
+        """Whether the required modules are installed (checked without importing them)"""
+        return all(importlib.util.find_spec(module) is not None for module in self.requires)
+
+    def create_source(self, *args, **kwargs):
+        """Instantiate the source class, importing it on first use"""
+        return self._load('source')(*args, **kwargs)
+
+    def create_session(self, **kwargs):
+        """Create the session shared by this backend's sources (None if it has none)"""
+        if self.session is None:
+            return None
+        return self._load('session')(**kwargs)
+
+    def to_dict(self):
+        """Description for the API"""
+        return {
+            'name': self.name,
+            'description': self.description,
+            'uses_com': self.uses_com,
+            'available': self.available(),
+            'loaded': 'source' in self._loaded
+        }
+
+    def _load(self, kind):
+        """Import the source or session factory once
+
+        Only sources need the platform modules; sessions load them lazily
+        themselves, so a session can exist on any platform.
+        """
+        with self._lock:
+            if kind not in self._loaded:
+                missing = [module for module in self.requires if importlib.util.find_spec(module) is None]
+                if missing and kind == 'source':
+                    raise BackendUnavailableError(
+                        f"The '{self.name}' backend needs modules that are not installed: {', '.join(missing)}"
+                    )
+                self._loaded[kind] = _resolve(getattr(self, kind))
+                logging.getLogger('backends').info(f"Loaded {kind} of the '{self.name}' backend")
+            return self._loaded[kind]
+
+
+# Registered backends by name
+BACKENDS = {}
+
+
+def register_backend(name, source, description, session=None, requires=()):
+    """Add a backend to the registry"""
+    BACKENDS[name] = SourceBackend(name, source, description, session, requires)
+    return BACKENDS[name]
+
+
+def get_backend(name):
+    """Backend by name; raises ValueError for unknown names"""
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown backend: {name}. Use one of {', '.join(BACKENDS)}")
+
+
+register_backend(
+    'com', 'msproject_integration:MSProjectIntegration',
+    'Running MS Project Desktop over COM (Windows, pywin32)',
+    session='com_session:COMSessionManager', requires=('win32com', 'pythoncom')
+)
+register_backend(
+    'fake', 'msproject_integration:MSProjectIntegration',
+    'In-process fake MS Project with a synthetic schedule, for development and tests',
+    session='fake_com:make_fake_session'
+)
+register_backend(
+    'mspdi', 'mspdi_import:MSPDIImporter',
+    'MS Project XML (MSPDI) exports, no MS Project required'
+)
+register_backend(
+    'excel', 'excel_io:ExcelImporter',
+    'Milestone Forecast workbooks (.xlsx) in the ES Calculator layout', requires=('openpyxl',)
+)
@@ -0,0 +1,221 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import logging
+
+import numpy as np
+
+# Budget fields tried in order when weighting baseline tasks
+WEIGHT_FIELDS = ('baseline_cost', 'baseline_work', 'baseline_duration')
+
+logger = logging.getLogger('BaselineCurve')
+
+def _to_datetime(value):
+    """Convert a baseline date (datetime or formatted string) to a datetime"""
+    if isinstance(value, datetime):
+        return value
+    if not value or not isinstance(value, str):
+        return None
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+def _task_weight(task, weight_field, start, finish):
+    """Budget of a baseline task under the given weighting"""
+    if weight_field == 'baseline_duration':
+        return (finish - start).total_seconds() / 86400
+    try:
+        return float(task.get(weight_field) or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+class PlannedValueCurve:
+    """Cumulative planned value (PV) of a project baseline over time
+    
+    The curve is stored as breakpoints: day offsets from the baseline start and
+    the cumulative PV reached at each one. Baseline task budgets are spread
+    linearly over their baseline windows and zero-duration tasks add a step,
+    so PV is piecewise linear between breakpoints. Earned Schedule lookups
+    are a binary search plus a linear interpolation, O(log n) per lookup.
+    """
+    
+    def __init__(self, start, offsets, cumulative_pv, weight_field='baseline_cost', task_weights=None):
+        """Initialize the curve from precomputed breakpoints and the budget of each task by id"""
+        self.start = start
+        self.offsets = np.asarray(offsets, dtype=float)
+        self.cumulative_pv = np.asarray(cumulative_pv, dtype=float)
+        self.weight_field = weight_field
+        self.task_weights = task_weights or {}
+    
+    @classmethod
+    def from_tasks(cls, tasks):
+        """Build the curve from baseline task records
+        
+        Each task needs baseline_start and baseline_finish and is weighted by
+        baseline_cost, else baseline_work, else its baseline duration; the
+        first field with any non-zero budget in the project is used for all
+        tasks so that costs and hours are never mixed. Returns None when no
+        task has usable baseline dates.
+        """
+        windows = []
+        for task in tasks:
+            start = _to_datetime(task.get('baseline_start'))
+            finish = _to_datetime(task.get('baseline_finish'))
+            if start is None or finish is None:
+                continue
+            windows.append((task, start, max(start, finish)))
+        
+        if not windows:
+            return None
+        
+        weight_field = WEIGHT_FIELDS[-1]
+        for field in WEIGHT_FIELDS[:-1]:
+            if any(_task_weight(task, field, start, finish) > 0 for task, start, finish in windows):
+                weight_field = field
+                break
+        
+        origin = min(start for _, start, _ in windows)
+        starts = np.array([(start - origin).total_seconds() / 86400 for _, start, _ in windows])
+        finishes = np.array([(finish - origin).total_seconds() / 86400 for _, _, finish in windows])
+        weights = np.array([max(_task_weight(task, weight_field, start, finish), 0.0)
+                            for task, start, finish in windows])
+        
+        # Breakpoints are every distinct baseline start or finish
+        times = np.unique(np.concatenate([starts, finishes]))
+        start_idx = np.searchsorted(times, starts)
+        finish_idx = np.searchsorted(times, finishes)
+        
+        # Ramps change the PV slope at their ends; zero-duration tasks add a step
+        ramps = finishes > starts
+        rates = np.where(ramps, weights / np.where(ramps, finishes - starts, 1.0), 0.0)
+        slope_delta = np.zeros(len(times))
+        np.add.at(slope_delta, start_idx[ramps], rates[ramps])
+        np.add.at(slope_delta, finish_idx[ramps], -rates[ramps])
+        steps = np.zeros(len(times))
+        np.add.at(steps, start_idx[~ramps], weights[~ramps])
+        
+        slopes = np.cumsum(slope_delta)
+        ramp_pv = np.concatenate([[0.0], np.cumsum(slopes[:-1] * np.diff(times))])
+        before_step = ramp_pv + np.concatenate([[0.0], np.cumsum(steps)[:-1]])
+        after_step = before_step + steps
+        
+        # A step is two breakpoints at the same offset; drop the empty ones
+        offsets = np.repeat(times, 2)
+        cumulative_pv = np.column_stack([before_step, after_step]).ravel()
+        keep = np.ones(len(offsets), dtype=bool)
+        keep[0::2] = steps > 0
+        
+        task_weights = {task['id']: float(weight) for (task, _, _), weight in zip(windows, weights)
+                        if task.get('id') is not None}
+        return cls(origin, offsets[keep], cumulative_pv[keep], weight_field, task_weights)
+    
+    @property
+    def total_pv(self):
+        """Planned value at completion (budget at completion)"""
+        return float(self.cumulative_pv[-1])
+    
+    @property
+    def finish(self):
+        """Baseline finish of the last task on the curve"""
+        return self.start + timedelta(days=float(self.offsets[-1]))
+    
+    def earned_value(self, tasks):
+        """Earned value of task records, using the curve's budget weighting
+        
+        Budgets are looked up by task id, so progress records without
+        baseline fields can be valued against a cached curve; tasks the
+        curve does not know are weighted by their own baseline fields.
+        """
+        total = 0.0
+        for task in tasks:
+            weight = self.task_weights.get(task.get('id'))
+            if weight is None:
+                start = _to_datetime(task.get('baseline_start'))
+                finish = _to_datetime(task.get('baseline_finish'))
+                if start is None or finish is None:
+                    continue
+                weight = max(_task_weight(task, self.weight_field, start, max(start, finish)), 0.0)
+            percent_complete = task.get('percent_complete') or 0
+            total += weight * percent_complete / 100
+        return total
+    
+    def planned_value(self, when):
+        """Cumulative planned value at a date"""
+        offset = (when - self.start).total_seconds() / 86400
+        return float(np.interp(offset, self.offsets, self.cumulative_pv))
+    
+    def earned_schedule_days(self, earned_value):
+        """Days from the baseline start at which PV first equals the earned value
+        
+        Accepts a scalar or an array of earned values. Values at or below zero
+        map to the baseline start and values above the total PV map to the
+        baseline finish.
+        """
+        ev = np.asarray(earned_value, dtype=float)
+        pv = self.cumulative_pv
+        offsets = self.offsets
+        
+        # First breakpoint whose cumulative PV reaches the earned value
+        idx = np.clip(np.searchsorted(pv, ev, side='left'), 1, len(pv) - 1) if len(pv) > 1 else None
+        if idx is None:
+            result = np.full(ev.shape, offsets[0])
+        else:
+            lo_pv, hi_pv = pv[idx - 1], pv[idx]
+            span = np.where(hi_pv > lo_pv, hi_pv - lo_pv, 1.0)
+            fraction = np.clip((ev - lo_pv) / span, 0.0, 1.0)
+            result = offsets[idx - 1] + fraction * (offsets[idx] - offsets[idx - 1])
+            result = np.where(ev <= pv[0], offsets[0], result)
+            result = np.where(ev > pv[-1], offsets[-1], result)
+        
+        return float(result) if result.ndim == 0 else result
+    
+    def earned_schedule(self, earned_value):
+        """Date at which PV first equals the earned value"""
+        return self.start + timedelta(days=self.earned_schedule_days(earned_value))
+
+class BaselineCurveCache:
+    """Thread-safe LRU cache of planned value curves keyed by project and baseline version"""
+    
+    def __init__(self, max_size=32):
+        """Initialize an empty cache"""
+        self.max_size = max_size
+        self._curves = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get_curve(self, project_key, baseline_version, build):
+        """Return the cached curve for a baseline version, building it on a miss
+        
+        ``build`` is called without arguments and must return the baseline task
+        records. Without a baseline version nothing can be cached safely, so
+        the curve is always rebuilt.
+        """
+        if baseline_version is None:
+            return PlannedValueCurve.from_tasks(build())
+        
+        key = (project_key, baseline_version)
+        with self._lock:
+            if key in self._curves:
+                self._curves.move_to_end(key)
+                self.hits += 1
+                return self._curves[key]
+        
+        curve = PlannedValueCurve.from_tasks(build())
+        with self._lock:
+            self.misses += 1
+            self._curves[key] = curve
+            self._curves.move_to_end(key)
+            while len(self._curves) > self.max_size:
+                self._curves.popitem(last=False)
+        logger.info(f"Built planned value curve for {project_key} (baseline {baseline_version})")
+        return curve
+    
+    def invalidate(self, project_key=None):
+        """Drop cached curves for one project, or all of them"""
+        with self._lock:
+            for key in [k for k in self._curves if project_key is None or k[0] == project_key]:
+                del self._curves[key]
@@ -0,0 +1,375 @@
+"""Benchmarks of the forecasting engine, COM extraction and the HTTP endpoints
+
+Times each benchmark on seeded synthetic schedules (synthetic_schedule.py)
+of several sizes and reports the best time, throughput (milestones per
+second) and peak traced memory. Results can be saved as JSON and compared
+against an earlier run to catch regressions:
+
+    python benchmark.py --sizes 100,1000,10000,100000
+    python benchmark.py --only forecasts --sizes 1000000
+    python benchmark.py --json baseline.json
+    python benchmark.py --compare baseline.json --threshold 1.25
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import timedelta
+
+from synthetic_schedule import STATUS_DATE, generate_milestones, generate_network, generate_records
+
+DEFAULT_SIZES = (100, 1000, 10000, 100000)
+
+# (name, setup(size, seed) -> (callable, items[, call counter]), largest size or None).
+# Setups returning a fake_com.CallCounter also report COM round trips per item
+BENCHMARKS = []
+
+
+class SkipBenchmark(Exception):
+    """A benchmark cannot run in this environment (e.g. pywin32 is missing)"""
+
+
+def benchmark(name, max_size=None):
+    """Register a benchmark setup function"""
+    def register(setup):
+        BENCHMARKS.append((name, setup, max_size))
+        return setup
+    return register
+
+
+def get_calculator():
+    """A shared EarnedScheduleCalculator"""
+    from earned_schedule import EarnedScheduleCalculator
+    if not hasattr(get_calculator, 'instance'):
+        get_calculator.instance = EarnedScheduleCalculator()
+    return get_calculator.instance
+
+
+@benchmark('calculate_milestone_metrics', max_size=100000)
+def setup_scalar_metrics(size, seed):
+    calc = get_calculator()
+    milestones = generate_milestones(size, seed)
+    return lambda: [calc.calculate_milestone_metrics(m, status_date=STATUS_DATE) for m in milestones], size
+
+
+@benchmark('calculate_forecasts[dict]')
+def setup_forecasts_dicts(size, seed):
+    calc = get_calculator()
+    milestones = generate_milestones(size, seed)
+    return lambda: calc.calculate_forecasts(milestones, status_date=STATUS_DATE), size
+
+
+@benchmark('calculate_forecasts[record]')
+def setup_forecasts_records(size, seed):
+    calc = get_calculator()
+    milestones = generate_records(size, seed)
+    return lambda: calc.calculate_forecasts(milestones, status_date=STATUS_DATE), size
+
+
+@benchmark('calculate_forecasts[calendar]')
+def setup_forecasts_calendar(size, seed):
+    from work_calendar import WorkCalendar
+    calc = get_calculator()
+    milestones = generate_records(size, seed)
+    calendar = WorkCalendar('1111100', ['2024-01-01', '2024-12-25', '2025-01-01'])
+    return lambda: calc.calculate_forecasts(milestones, status_date=STATUS_DATE, calendar=calendar), size
+
+
+@benchmark('ForecastBacktester.sweep[52 dates]', max_size=100000)
+def setup_status_sweep(size, seed):
+    from forecast_backtest import ForecastBacktester, status_date_range
+    backtester = ForecastBacktester(get_calculator())
+    status_dates = status_date_range(STATUS_DATE - timedelta(weeks=51), STATUS_DATE)
+    job = backtester.prepare(generate_records(size, seed), status_dates, current_date=STATUS_DATE)
+    return lambda: backtester.sweep(job), size * len(status_dates)
+
+
+@benchmark('DependencyGraph build')
+def setup_network_build(size, seed):
+    from dependency_graph import DependencyGraph
+    tasks = generate_network(size, seed)
+    return lambda: DependencyGraph(tasks), size
+
+
+@benchmark('DependencyGraph.update')
+def setup_network_update(size, seed):
+    from dependency_graph import DependencyGraph
+    tasks = generate_network(size, seed)
+    network = DependencyGraph(tasks)
+    # An open milestone in the middle of the network; every call moves its forecast
+    milestone = next(task for task in tasks[size // 2:] if task['id'] % 20 == 0 and not task['actual_finish'])
+    slips = iter(range(1, 10 ** 9))
+    return lambda: network.update({milestone['id']: milestone['finish'] + timedelta(days=next(slips) % 30)}), 1
+
+
+@benchmark('prepare_dashboard_data')
+def setup_dashboard_data(size, seed):
+    calc = get_calculator()
+    milestones = calc.calculate_forecasts(generate_records(size, seed), status_date=STATUS_DATE)
+    return lambda: calc.prepare_dashboard_data(milestones), size
+
+
+@benchmark('_extract_task_data', max_size=100000)
+def setup_extract_task_data(size, seed):
+    try:
+        from msproject_integration import MSProjectIntegration
+    except ImportError as e:
+        raise SkipBenchmark(f'MS Project integration unavailable: {e}')
+    from fake_com import make_fake_application
+
+    app, counter = make_fake_application(task_count=size, milestone_ratio=1.0, blank_ratio=0, seed=seed)
+    integration = MSProjectIntegration()
+    integration.app = app
+    integration.project = app.ActiveProject
+    tasks = [task for task in integration.project.Tasks if task is not None]
+    return lambda: [integration._extract_task_data(task) for task in tasks], len(tasks), counter
+
+
+def setup_task_source(strategy):
+    """Setup reading the milestones of a fake project of ``size`` tasks with a COMTaskSource strategy"""
+    def setup(size, seed):
+        from fake_com import make_fake_application
+        from task_sources import COMTaskSource
+
+        app, counter = make_fake_application(task_count=size, seed=seed)
+        source = COMTaskSource(app.ActiveProject, app, strategy=strategy)
+        return lambda: list(source.iter_milestones()), size, counter
+    return setup
+
+
+benchmark('COMTaskSource[filter]', max_size=100000)(setup_task_source('filter'))
+benchmark('COMTaskSource[scan]', max_size=100000)(setup_task_source('scan'))
+
+
+@benchmark('ExcelExporter.export', max_size=100000)
+def setup_excel_export(size, seed):
+    try:
+        from excel_io import ExcelExporter
+    except ImportError as e:
+        raise SkipBenchmark(f'Excel export unavailable: {e}')
+    exporter = ExcelExporter()
+    milestones = get_calculator().calculate_forecasts(generate_records(size, seed), status_date=STATUS_DATE)
+
+    def export():
+        with tempfile.TemporaryFile() as output:
+            exporter.export(milestones, output, 'Benchmark', STATUS_DATE)
+    return export, size
+
+
+def get_client(size, seed):
+    """Flask test client of the app with a synthetic project of the given size loaded"""
+    state = get_client.__dict__
+    if 'app' not in state:
+        # The app opens its snapshot database on import; MS Project endpoints use the fake backend
+        os.environ.setdefault('SNAPSHOT_DB', os.path.join(tempfile.mkdtemp(), 'benchmark.db'))
+        os.environ.setdefault('MSPROJECT_BACKEND', 'fake')
+        try:
+            import app
+        except ImportError as e:
+            raise SkipBenchmark(f'Flask app unavailable: {e}')
+        state['app'] = app
+        state['loaded'] = None
+    app = state['app']
+    if state['loaded'] != (size, seed):
+        for name in app.portfolio.names():
+            app.portfolio.remove(name)
+        app.portfolio.load('Benchmark', generate_records(size, seed), STATUS_DATE)
+        state['loaded'] = (size, seed)
+    return app.app.test_client()
+
+
+def endpoint(name, method, url, body=None, max_size=None, headers=None):
+    """Register a benchmark of one request through the Flask test client"""
+    def setup(size, seed):
+        client = get_client(size, seed)
+
+        def request():
+            response = client.open(url, method=method, json=body, headers=headers)
+            if response.status_code != 200:
+                raise RuntimeError(f'{method} {url} returned {response.status_code}')
+            return response.data
+        return request, size
+    benchmark(name, max_size)(setup)
+
+
+endpoint('GET /api/milestones', 'GET', '/api/milestones')
+endpoint('GET /api/milestones (columns, gzip)', 'GET', '/api/milestones?format=columns',
+         headers={'Accept-Encoding': 'gzip'})
+endpoint('GET /api/milestones (page)', 'GET', '/api/milestones?sort=sv_t&risk=High,Medium&limit=100')
+endpoint('GET /api/dashboard-data', 'GET', '/api/dashboard-data')
+endpoint('GET /api/timeline', 'GET', '/api/timeline?points=500')
+endpoint('GET /api/wbs-rollup', 'GET', '/api/wbs-rollup?wbs=1&depth=1')
+endpoint('POST /api/calculate-forecast', 'POST', '/api/calculate-forecast',
+         {'status_date': STATUS_DATE.strftime('%Y-%m-%d')})
+endpoint('GET /api/portfolio', 'GET', '/api/portfolio')
+endpoint('GET /api/history/weekly', 'GET', '/api/history/weekly?until=2025-01-31')
+endpoint('POST /api/monte-carlo-forecast', 'POST', '/api/monte-carlo-forecast',
+         {'status_date': STATUS_DATE.strftime('%Y-%m-%d'), 'trials': 1000, 'seed': 0}, max_size=100000)
+endpoint('POST /api/status-sweep', 'POST', '/api/status-sweep',
+         {'end': STATUS_DATE.strftime('%Y-%m-%d'), 'step_days': 7, 'metrics': ['sv_t']}, max_size=100000)
+endpoint('POST /api/backtest', 'POST', '/api/backtest', {'end': STATUS_DATE.strftime('%Y-%m-%d'), 'step_days': 7},
+         max_size=100000)
+endpoint('GET /api/export/excel', 'GET', '/api/export/excel', max_size=100000)
+
+
+def get_com_client(size, seed):
+    """Flask test client of the app importing from a fake MS Project of ``size`` tasks, and its call counter"""
+    client = get_client(size, seed)
+    state = get_client.__dict__
+    app = state['app']
+    if app.com_backend.name != 'fake':
+        raise SkipBenchmark(f'MS Project endpoints are benchmarked with MSPROJECT_BACKEND=fake, '
+                            f'not {app.com_backend.name}')
+    if state.get('com_loaded') != (size, seed):
+        from fake_com import make_fake_session
+
+        # A fresh fake project of this size, used from the COM worker like the configured one
+        app.import_jobs.call(app.com_session.close)
+        app.com_session = make_fake_session(task_count=size, seed=seed)
+        app.project_integrations.clear()
+        state['com_loaded'] = (size, seed)
+    return client, app.com_session.call_counter
+
+
+def com_endpoint(name, method, url, body=None, max_size=None, items=None):
+    """Register a benchmark of one MS Project request against the fake backend
+
+    Sizes are task counts. Imports answer 202 with a job, which is waited
+    for. ``items`` fixes the item count of requests that do not scale with
+    the project (e.g. 1 for a status check).
+    """
+    def setup(size, seed):
+        client, counter = get_com_client(size, seed)
+        app = get_client.__dict__['app']
+        if url == '/api/import-from-msproject':
+            # The imported project becomes the active one: reload the synthetic project next time
+            get_client.__dict__['loaded'] = None
+
+        def request():
+            response = client.open(url, method=method, json=body)
+            if response.status_code == 202:
+                job = app.import_jobs.get(response.get_json()['job']['id'])
+                job.done.wait()
+                if job.error:
+                    raise RuntimeError(f'{method} {url} failed: {job.error}')
+            elif response.status_code != 200:
+                raise RuntimeError(f'{method} {url} returned {response.status_code}')
+            return response.data
+        return request, items or size, counter
+    benchmark(name, max_size)(setup)
+
+
+com_endpoint('GET /api/msproject-status', 'GET', '/api/msproject-status', max_size=100000, items=1)
+com_endpoint('GET /api/locate-milestones', 'GET', '/api/locate-milestones', max_size=100000)
+# Re-imports of the unchanged project with the same status date, as polling clients send
+com_endpoint('POST /api/import-from-msproject', 'POST', '/api/import-from-msproject',
+             {'status_date': STATUS_DATE.strftime('%Y-%m-%d')}, max_size=100000)
+
+
+def measure(func, repeat):
+    """Best wall time of ``repeat`` calls, then the peak traced memory of one more call"""
+    func()  # warm up caches and lazy imports
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def count_calls(func, counter):
+    """COM round trips recorded by ``counter`` during one call of ``func``"""
+    counter.reset()
+    func()
+    return counter.total
+
+
+def run(sizes, repeat, seed, only=None):
+    """Run the selected benchmarks at every size; returns the result rows"""
+    results = []
+    for name, setup, max_size in BENCHMARKS:
+        if only and not any(word in name for word in only):
+            continue
+        for size in sizes:
+            if max_size is not None and size > max_size:
+                continue
+            try:
+                func, items, *counter = setup(size, seed)
+            except SkipBenchmark as e:
+                print(f'{name:<34} skipped: {e}')
+                break
+            seconds, peak = measure(func, repeat)
+            row = {
+                'name': name,
+                'size': size,
+                'seconds': seconds,
+                'per_second': items / seconds if seconds else None,
+                'peak_mb': peak / 2 ** 20,
+                'com_calls': count_calls(func, counter[0]) if counter else None
+            }
+            results.append(row)
+            calls = f" {row['com_calls'] / items:>10.2f} calls/item" if counter else ''
+            print(f"{name:<34} {size:>9,} {seconds:>10.4f} s {row['per_second'] or 0:>14,.0f} /s "
+                  f"{row['peak_mb']:>9.1f} MB{calls}", flush=True)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print benchmarks slower than threshold x the baseline run; returns their number"""
+    previous = {(row['name'], row['size']): row['seconds'] for row in baseline}
+    regressions = 0
+    for row in results:
+        before = previous.get((row['name'], row['size']))
+        if not before:
+            continue
+        ratio = row['seconds'] / before
+        if ratio > threshold:
+            regressions += 1
+            print(f"REGRESSION {row['name']} at {row['size']:,}: {before:.4f} s -> {row['seconds']:.4f} s "
+                  f"({ratio:.2f}x)")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='comma-separated milestone counts (up to 1000000)')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per benchmark (best is reported)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the synthetic schedules')
+    parser.add_argument('--only', help='comma-separated substrings of the benchmarks to run')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--compare', help='results file of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=1.25, help='slowdown ratio reported as a regression')
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    only = [word for word in args.only.split(',') if word] if args.only else None
+    print(f"{'benchmark':<34} {'size':>9} {'best':>12} {'throughput':>17} {'peak':>12}")
+    results = run(sizes, args.repeat, args.seed, only)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            if compare(results, json.load(f), args.threshold):
+                return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,223 @@
+import logging
+
+from milestone_record import INPUT_FIELDS, RESULT_FIELDS
+
+# Views apply deltas touching up to this share of the milestones; larger ones are rebuilt with one sort
+REBUILD_SHARE = 0.2
+
+
+def applies_to(delta, version, tracker):
+    """Whether a view at ``version`` should apply a tracker delta in place rather than rebuild"""
+    if delta is None or delta['base_version'] != version:
+        return False
+    return len(delta['changed']) + len(delta['removed']) <= REBUILD_SHARE * max(len(tracker.order), 1)
+
+
+class MilestoneChangeTracker:
+    """Change-detection cache for imported milestones, keyed by UniqueID
+
+    Each import is compared against the previous one using a fingerprint of
+    the fields _extract_task_data reads (milestone_record.INPUT_FIELDS). Unchanged milestones keep their
+    record and calculated metrics; only new or changed milestones are
+    recomputed, plus every milestone with a baseline when the status date
+    or the ES context (baseline curve, earned value) moved, since those
+    results depend on it. An optional ``propagate`` callback carries
+    recomputed results on to other milestones (e.g. down a dependency
+    network); the milestones it updates count as changed in the same
+    version. Every change bumps a version number so clients can ask for
+    what changed since the version they last saw.
+    """
+
+    def __init__(self):
+        """Initialize an empty tracker"""
+        self.records = {}
+        self.order = []
+        self.version = 0
+        self.status_date = None
+        self.context = None
+        self._input_fingerprints = {}
+        self._result_fingerprints = {}
+        self._changed_at = {}
+        self._removed_at = {}
+        self.logger = logging.getLogger('MilestoneChangeTracker')
+
+    def milestones(self):
+        """Current milestone records in import order"""
+        return [self.records[uid] for uid in self.order]
+
+    def update(self, milestones, calculate, status_date, context=None, propagate=None):
+        """Merge a fresh import and recompute only the milestones that need it
+
+        ``calculate`` is called with the list of milestones to (re)compute and
+        must update them in place, e.g. EarnedScheduleCalculator.calculate_forecasts
+        with the status date bound. ``propagate`` is called with the IDs that
+        were recomputed and returns the IDs of the milestones it updated in
+        place. Returns the delta (see _delta).
+        """
+        base_version = self.version
+        records = {}
+        order = []
+        added, changed = [], []
+
+        for milestone in milestones:
+            uid = milestone.get('id')
+            if uid not in records:
+                order.append(uid)
+            fingerprint = self._fingerprint(milestone, INPUT_FIELDS)
+            previous = self.records.get(uid)
+            if previous is not None and self._input_fingerprints.get(uid) == fingerprint:
+                records[uid] = previous
+            else:
+                records[uid] = milestone
+                self._input_fingerprints[uid] = fingerprint
+                (changed if previous is not None else added).append(uid)
+
+        removed = [uid for uid in self.order if uid not in records]
+        for uid in removed:
+            self._input_fingerprints.pop(uid, None)
+            self._result_fingerprints.pop(uid, None)
+            self._changed_at.pop(uid, None)
+
+        self.records = records
+        self.order = order
+
+        dirty = self._status_dependent(status_date, context) | set(added) | set(changed)
+        result_changed = self._recompute(dirty, calculate, propagate)
+        self.status_date = status_date
+        self.context = context
+
+        changed_ids = set(added) | set(changed) | result_changed
+        if changed_ids or removed:
+            self.version += 1
+            for uid in changed_ids:
+                self._changed_at[uid] = self.version
+                self._removed_at.pop(uid, None)
+            for uid in removed:
+                self._removed_at[uid] = self.version
+
+        self.logger.info(
+            f"Import merged: {len(added)} added, {len(changed)} changed, {len(removed)} removed, "
+            f"{len(dirty)} of {len(records)} recomputed"
+        )
+        return self._delta(base_version, recomputed=len(dirty))
+
+    def refresh(self, calculate, status_date, context=None, propagate=None):
+        """Recompute for a new status date or ES context without a new import"""
+        base_version = self.version
+        dirty = self._status_dependent(status_date, context)
+        result_changed = self._recompute(dirty, calculate, propagate)
+        self.status_date = status_date
+        self.context = context
+
+        if result_changed:
+            self.version += 1
+            for uid in result_changed:
+                self._changed_at[uid] = self.version
+        return self._delta(base_version, recomputed=len(dirty))
+
+    def adopt(self, changed, order, status_date, context, version):
+        """Take over milestones calculated elsewhere (e.g. by another worker) as the given version
+
+        ``changed`` ({ID: record}) holds the milestones added or changed
+        since the version this tracker is at, ``order`` the IDs of all
+        current milestones; the others keep their record. Records whose
+        inputs did not change are kept and get the new results copied in,
+        so only milestones whose inputs or results differ count as changed.
+        Only the records passed in are fingerprinted. Returns the delta.
+        """
+        base_version = self.version
+        updated = set()
+
+        if order != self.order:
+            kept = set(order)
+            removed = [uid for uid in self.order if uid not in kept]
+            self.records = {uid: self.records[uid] if uid in self.records else changed[uid] for uid in order}
+            self.order = list(order)
+        else:
+            removed = []
+        for uid in removed:
+            self._input_fingerprints.pop(uid, None)
+            self._result_fingerprints.pop(uid, None)
+            self._changed_at.pop(uid, None)
+
+        records = self.records
+        for uid, milestone in changed.items():
+            if uid not in records:
+                continue
+            fingerprint = self._fingerprint(milestone, INPUT_FIELDS)
+            previous = records[uid]
+            if previous is not milestone and self._input_fingerprints.get(uid) == fingerprint:
+                for field in RESULT_FIELDS:
+                    if field in milestone:
+                        previous[field] = milestone[field]
+                milestone = previous
+            elif self._input_fingerprints.get(uid) != fingerprint:
+                self._input_fingerprints[uid] = fingerprint
+                updated.add(uid)
+            records[uid] = milestone
+            result_fingerprint = self._fingerprint(milestone, RESULT_FIELDS)
+            if self._result_fingerprints.get(uid) != result_fingerprint:
+                self._result_fingerprints[uid] = result_fingerprint
+                updated.add(uid)
+
+        self.status_date = status_date
+        self.context = context
+        self.version = version
+        for uid in updated:
+            self._changed_at[uid] = version
+            self._removed_at.pop(uid, None)
+        for uid in removed:
+            self._removed_at[uid] = version
+
+        self.logger.info(f"Adopted version {version}: {len(updated)} changed, {len(removed)} removed")
+        return self._delta(base_version)
+
+    def changes_since(self, version):
+        """Delta from a version the client already has to the current one
+
+        Returns None if the version is unknown (newer than the current one),
+        in which case the client needs the full list.
+        """
+        if version is None or version > self.version:
+            return None
+        return self._delta(version)
+
+    def _delta(self, base_version, recomputed=None):
+        """Build the delta of changes after base_version"""
+        delta = {
+            'base_version': base_version,
+            'version': self.version,
+            'changed': [self.records[uid] for uid in self.order if self._changed_at.get(uid, 0) > base_version],
+            'removed': [uid for uid, version in self._removed_at.items() if version > base_version]
+        }
+        if recomputed is not None:
+            delta['recomputed'] = recomputed
+        return delta
+
+    def _status_dependent(self, status_date, context):
+        """IDs whose results depend on the status date or ES context, if either moved"""
+        if status_date == self.status_date and context == self.context:
+            return set()
+        # Without a baseline the result is always 'No baseline'
+        return {uid for uid, milestone in self.records.items() if milestone.get('baseline_finish')}
+
+    def _recompute(self, dirty, calculate, propagate=None):
+        """Run the calculation for dirty milestones and return those whose results changed"""
+        if not dirty:
+            return set()
+        ordered = [uid for uid in self.order if uid in dirty]
+        calculate([self.records[uid] for uid in ordered])
+        if propagate is not None:
+            ordered.extend(set(propagate(ordered)).intersection(self.records).difference(dirty))
+
+        result_changed = set()
+        for uid in ordered:
+            fingerprint = self._fingerprint(self.records[uid], RESULT_FIELDS)
+            if self._result_fingerprints.get(uid) != fingerprint:
+                self._result_fingerprints[uid] = fingerprint
+                result_changed.add(uid)
+        return result_changed
+
+    def _fingerprint(self, milestone, fields):
+        """Hash of the given fields of a milestone"""
+        return hash(tuple(milestone.get(field) for field in fields))
@@ -0,0 +1,198 @@
+import logging
+import threading
+import time
+
+from instrumentation import metrics
+
+# ProgID of the MS Project application
+MSPROJECT_PROGID = 'MSProject.Application'
+
+
+class COMConnectionError(Exception):
+    """MS Project could not be reached or has no usable project open"""
+
+
+def _get_active_object(progid):
+    """Attach to a running COM server (win32com.client.GetActiveObject)"""
+    import win32com.client
+    return win32com.client.GetActiveObject(progid)
+
+
+def _dispatch(progid):
+    """Start a COM server (win32com.client.Dispatch)"""
+    import win32com.client
+    return win32com.client.Dispatch(progid)
+
+
+def _co_initialize():
+    """Initialize COM for the calling thread"""
+    import pythoncom
+    pythoncom.CoInitialize()
+
+
+def _co_uninitialize():
+    """Release COM for the calling thread"""
+    import pythoncom
+    pythoncom.CoUninitialize()
+
+
+class COMSessionManager:
+    """Keeps one MS Project COM connection alive per thread and reuses it
+
+    The first call on a thread initializes COM and attaches to the running
+    MS Project (or starts it). Later calls reuse that application object
+    after a one-round-trip health check (reading Application.Version) and
+    only reconnect when the check fails, e.g. because Project was closed.
+    COM objects belong to the apartment of the thread that created them,
+    so each thread gets its own connection; in the app all COM work runs on
+    the import worker thread, so there is one.
+
+    The COM entry points are injectable so the manager can run against
+    fake_com.FakeApplication. Connection reuse and latency counters are
+    available from stats().
+    """
+
+    def __init__(self, get_active_object=None, dispatch=None, co_initialize=None, co_uninitialize=None,
+                 launch_delay=2.0, progid=MSPROJECT_PROGID):
+        """Initialize the manager with COM entry points (default: win32com/pythoncom)"""
+        self.get_active_object = get_active_object or _get_active_object
+        self.dispatch = dispatch or _dispatch
+        self.co_initialize = co_initialize or _co_initialize
+        self.co_uninitialize = co_uninitialize or _co_uninitialize
+        self.launch_delay = launch_delay
+        self.progid = progid
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.counters = {
+            'connects': 0,
+            'reuses': 0,
+            'reconnects': 0,
+            'launches': 0,
+            'failures': 0,
+            'health_checks': 0,
+            'health_check_failures': 0
+        }
+        self.timings = {'connect_seconds': 0.0, 'last_connect_seconds': None, 'health_check_seconds': 0.0}
+        self.logger = logging.getLogger('COMSessionManager')
+
+    def application(self):
+        """The MS Project application object for this thread, connecting only when needed"""
+        app = getattr(self._local, 'app', None)
+        if app is not None:
+            if self._healthy(app):
+                self._count('reuses')
+                return app
+            self.logger.warning("MS Project connection lost, reconnecting")
+            self._local.app = None
+            self._count('reconnects')
+        return self._connect()
+
+    def project(self, name=None):
+        """A project of the connected application: by name, else the active or first open one
+
+        Raises COMConnectionError if there is no such project.
+        """
+        app = self.application()
+        if name:
+            try:
+                return app.Projects(name)
+            except Exception as e:
+                raise COMConnectionError(f"Project '{name}' is not open in MS Project.") from e
+
+        try:
+            active = app.ActiveProject
+        except Exception:
+            active = None
+        if active:
+            return active
+
+        try:
+            if app.Projects.Count > 0:
+                return app.Projects(1)
+        except Exception as e:
+            self.logger.error(f"Error checking for open projects: {str(e)}")
+            raise COMConnectionError(
+                "No active project found. Please open a project in MS Project and try again."
+            ) from e
+        raise COMConnectionError("No projects are open in MS Project. Please open a project file and try again.")
+
+    def close(self):
+        """Drop this thread's connection and release COM on it"""
+        if getattr(self._local, 'app', None) is not None:
+            self._local.app = None
+        if getattr(self._local, 'initialized', False):
+            self._local.initialized = False
+            try:
+                self.co_uninitialize()
+            except Exception as e:
+                self.logger.warning(f"Error releasing COM: {str(e)}")
+
+    def stats(self):
+        """Connection counters and latencies"""
+        with self._lock:
+            stats = dict(self.counters)
+            stats.update(self.timings)
+        calls = stats['reuses'] + stats['connects']
+        stats['reuse_ratio'] = round(stats['reuses'] / calls, 3) if calls else None
+        checks = stats['health_checks']
+        stats['avg_health_check_ms'] = round(stats['health_check_seconds'] * 1000 / checks, 3) if checks else None
+        stats['avg_connect_ms'] = (round(stats['connect_seconds'] * 1000 / stats['connects'], 3)
+                                   if stats['connects'] else None)
+        return stats
+
+    def _connect(self):
+        """Attach to (or start) MS Project on this thread"""
+        if not getattr(self._local, 'initialized', False):
+            self.co_initialize()
+            self._local.initialized = True
+
+        started = time.perf_counter()
+        self.logger.info("Attempting to connect to MS Project...")
+        try:
+            app = self.get_active_object(self.progid)
+            self.logger.info("Connected to existing MS Project instance")
+        except Exception as e:
+            self.logger.warning(f"No active MS Project instance found: {str(e)}")
+            try:
+                app = self.dispatch(self.progid)
+                app.Visible = True
+                self._count('launches')
+                self.logger.info("Created new MS Project instance")
+                # Give MS Project a moment to initialize
+                time.sleep(self.launch_delay)
+            except Exception as e2:
+                self._count('failures')
+                self.logger.error(f"Failed to create MS Project instance: {str(e2)}")
+                raise COMConnectionError(
+                    f"MS Project could not be started. Please ensure it's installed correctly. Error: {str(e2)}"
+                ) from e2
+
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.counters['connects'] += 1
+            self.timings['connect_seconds'] += elapsed
+            self.timings['last_connect_seconds'] = elapsed
+        self._local.app = app
+        return app
+
+    def _healthy(self, app):
+        """Cheap liveness check: one property read on the application"""
+        started = time.perf_counter()
+        metrics.count('com_calls_total')
+        try:
+            app.Version
+            healthy = True
+        except Exception:
+            healthy = False
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.counters['health_checks'] += 1
+            self.timings['health_check_seconds'] += elapsed
+            if not healthy:
+                self.counters['health_check_failures'] += 1
+        return healthy
+
+    def _count(self, counter):
+        """Increment a counter"""
+        with self._lock:
+            self.counters[counter] += 1
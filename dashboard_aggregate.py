@@ -0,0 +1,183 @@
+import logging
+import uuid
+
+from change_tracker import applies_to
+
+# Summary counters maintained by DashboardAggregate
+COUNTERS = ('completed', 'behind_schedule', 'on_schedule', 'high_risk', 'medium_risk', 'low_risk')
+
+# Risk level -> counter
+RISK_COUNTERS = {'High': 'high_risk', 'Medium': 'medium_risk', 'Low': 'low_risk'}
+
+
+def milestone_contribution(milestone):
+    """What one milestone adds to the dashboard: (counters, SPI(t), timeline entry)
+
+    Milestones whose SV(t) or percent complete is missing (None) count in
+    neither the behind nor the on-schedule total.
+    """
+    counters = []
+    percent_complete = milestone.get('percent_complete')
+    sv_t = milestone.get('sv_t', 0)
+    if percent_complete == 100:
+        counters.append('completed')
+    elif percent_complete is not None and sv_t is not None and percent_complete < 100:
+        counters.append('behind_schedule' if sv_t < 0 else 'on_schedule')
+
+    risk_counter = RISK_COUNTERS.get(milestone.get('risk'))
+    if risk_counter:
+        counters.append(risk_counter)
+
+    return tuple(counters), milestone.get('spi_t'), timeline_entry(milestone)
+
+
+def timeline_entry(milestone):
+    """Baseline vs forecast point of a milestone on the timeline chart (None without both dates)"""
+    if not milestone.get('baseline_finish') or not (milestone.get('forecast_finish') or milestone.get('actual_finish')):
+        return None
+    return {
+        'id': milestone.get('id'),
+        'name': milestone.get('name'),
+        'baseline': milestone.get('baseline_finish'),
+        'forecast': milestone.get('forecast_finish') or milestone.get('actual_finish'),
+        'variance_days': milestone.get('sv_t', 0),
+        'status': milestone.get('status'),
+        'risk': milestone.get('risk')
+    }
+
+
+class DashboardAggregate:
+    """Dashboard summary maintained incrementally as milestones change
+
+    Each milestone's contribution (counters, SPI(t), timeline entry) is kept
+    per key, so replacing or removing a milestone only undoes its old
+    contribution and adds the new one; the summary is then served from the
+    running totals without walking the list. ``version`` follows the
+    MilestoneChangeTracker version the totals reflect and is used as the
+    ETag of the dashboard response, which is built once per version.
+    """
+
+    def __init__(self):
+        """Initialize an empty aggregate"""
+        self.logger = logging.getLogger('DashboardAggregate')
+        # Distinguishes this aggregate's versions from those of earlier instances, without shared state
+        self.token = uuid.uuid4().hex[:12]
+        self.reset()
+
+    def reset(self):
+        """Forget all milestones"""
+        self.counts = dict.fromkeys(COUNTERS, 0)
+        self.spi_sum = 0.0
+        self.spi_count = 0
+        self.contributions = {}
+        self.version = None
+        self._data = None
+        self._data_version = None
+
+    @classmethod
+    def from_milestones(cls, milestones):
+        """Build an aggregate over a list of milestones, keyed by position"""
+        aggregate = cls()
+        for index, milestone in enumerate(milestones):
+            aggregate.update(index, milestone)
+        return aggregate
+
+    def update(self, key, milestone):
+        """Add a milestone, replacing the contribution previously stored under key"""
+        self.remove(key)
+        contribution = milestone_contribution(milestone)
+        counters, spi_t, _ = contribution
+        for counter in counters:
+            self.counts[counter] += 1
+        if spi_t is not None:
+            self.spi_sum += spi_t
+            self.spi_count += 1
+        self.contributions[key] = contribution
+
+    def remove(self, key):
+        """Undo the contribution stored under key, if any"""
+        contribution = self.contributions.pop(key, None)
+        if contribution is None:
+            return
+        counters, spi_t, _ = contribution
+        for counter in counters:
+            self.counts[counter] -= 1
+        if spi_t is not None:
+            self.spi_sum -= spi_t
+            self.spi_count -= 1
+            if not self.spi_count:
+                # Drop float residue left by subtracting
+                self.spi_sum = 0.0
+
+    def sync(self, tracker, delta=None):
+        """Bring the aggregate up to date with a MilestoneChangeTracker
+
+        Applies a tracker delta when it starts at the version the aggregate
+        reflects and is not too large (change_tracker.REBUILD_SHARE);
+        otherwise (or without a delta) rebuilds from the tracker.
+        """
+        if applies_to(delta, self.version, tracker):
+            for milestone in delta['changed']:
+                self.update(milestone.get('id'), milestone)
+            for uid in delta['removed']:
+                self.remove(uid)
+        elif self.version != tracker.version:
+            self.reset()
+            for uid in tracker.order:
+                self.update(uid, tracker.records[uid])
+            self.logger.info(f"Rebuilt dashboard aggregate for {len(tracker.order)} milestones")
+        self.version = tracker.version
+
+    def summary(self):
+        """Summary counters and average SPI(t)"""
+        counts = self.counts
+        return {
+            'total_milestones': len(self.contributions),
+            'completed': counts['completed'],
+            'behind_schedule': counts['behind_schedule'],
+            'on_schedule': counts['on_schedule'],
+            'avg_spi_t': round(self.spi_sum / self.spi_count, 2) if self.spi_count else 0,
+            'high_risk': counts['high_risk'],
+            'medium_risk': counts['medium_risk'],
+            'low_risk': counts['low_risk']
+        }
+
+    def dashboard_data(self, milestones, keys=None):
+        """Summary, timeline and milestones, built once per version
+
+        ``keys`` gives the key of each milestone in display order and
+        defaults to their position in the list.
+        """
+        if self._data is not None and self.version is not None and self._data_version == self.version:
+            return self._data
+
+        keys = range(len(milestones)) if keys is None else keys
+        timeline_data = []
+        for key in keys:
+            entry = self.contributions[key][2]
+            if entry is not None:
+                timeline_data.append(entry)
+
+        self._data = {
+            'summary': self.summary(),
+            'timeline': timeline_data,
+            'milestones': milestones
+        }
+        self._data_version = self.version
+        return self._data
+
+    def timeline_entry(self, key):
+        """Timeline entry of the milestone stored under key (None if it has none)"""
+        contribution = self.contributions.get(key)
+        return contribution[2] if contribution else None
+
+    def etag(self, generation=None):
+        """ETag of the current dashboard (None until synced with a tracker)
+
+        ``generation`` is the shared state generation the project was last
+        read from or saved as, which every worker serving the project
+        shares; without one, the aggregate's own token is used.
+        """
+        if self.version is None:
+            return None
+        return f"dashboard-{self.token if generation is None else f'g{generation}'}-{self.version}"
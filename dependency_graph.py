@@ -0,0 +1,327 @@
+import hashlib
+import heapq
+import logging
+import re
+
+import numpy as np
+
+from earned_schedule import MAX_DATETIME64, MAX_FORECAST_DAYS, MIN_DATETIME64, US_PER_DAY
+from milestone_record import to_datetime
+
+# Link types; MSPDI <Type> codes index this tuple
+LINK_TYPES = ('FF', 'FS', 'SF', 'SS')
+
+# Working minutes per day of lags given in minutes, hours or weeks (Project's default 8h day)
+MINUTES_PER_DAY = 480
+
+# Lag units of UniqueIDPredecessors text in days; an 'e' prefix marks elapsed time
+LAG_UNITS = {
+    'm': 1 / MINUTES_PER_DAY, 'min': 1 / MINUTES_PER_DAY, 'mins': 1 / MINUTES_PER_DAY,
+    'minute': 1 / MINUTES_PER_DAY, 'minutes': 1 / MINUTES_PER_DAY,
+    'h': 60 / MINUTES_PER_DAY, 'hr': 60 / MINUTES_PER_DAY, 'hrs': 60 / MINUTES_PER_DAY,
+    'hour': 60 / MINUTES_PER_DAY, 'hours': 60 / MINUTES_PER_DAY,
+    '': 1, 'd': 1, 'dy': 1, 'day': 1, 'days': 1,
+    'w': 5, 'wk': 5, 'week': 5, 'weeks': 5,
+    'mo': 20, 'mon': 20, 'month': 20, 'months': 20,
+    'em': 1 / 1440, 'emin': 1 / 1440, 'eh': 1 / 24, 'ehr': 1 / 24, 'ed': 1, 'eday': 1, 'edays': 1,
+    'ew': 7, 'ewk': 7, 'emo': 30, 'emon': 30
+}
+
+# One entry of a UniqueIDPredecessors list, e.g. 12, 15SS+2d or 7FF-1.5 edays
+PREDECESSOR_PATTERN = re.compile(
+    r'^\s*(?P<uid>\d+)\s*(?P<type>FS|SS|FF|SF)?\s*(?:(?P<sign>[+-])\s*(?P<lag>[\d.]+)\s*(?P<unit>[a-z%]*))?\s*$',
+    re.IGNORECASE
+)
+
+# MSPDI LagFormat codes of elapsed lags (plus their estimated variants)
+ELAPSED_LAG_FORMATS = {'4', '6', '8', '10', '12', '20', '36', '38', '40', '42', '44', '52'}
+
+# MSPDI LagFormat codes of percentage lags
+PERCENT_LAG_FORMATS = {'19', '20', '51', '52'}
+
+
+def parse_predecessors(text):
+    """(uid, link type, lag days) links of a UniqueIDPredecessors value such as '3,5SS+2d'
+
+    Entries that cannot be read (external links, unknown units) are
+    skipped; percentage lags are read as no lag.
+    """
+    links = []
+    for entry in re.split(r'[,;]', text or ''):
+        match = PREDECESSOR_PATTERN.match(entry)
+        if not match:
+            continue
+        lag = 0.0
+        if match['lag']:
+            unit = match['unit'].lower()
+            if unit != '%':
+                if unit not in LAG_UNITS:
+                    continue
+                lag = float(match['lag']) * LAG_UNITS[unit] * (-1 if match['sign'] == '-' else 1)
+        links.append((int(match['uid']), (match['type'] or 'FS').upper(), lag))
+    return links
+
+
+def source_key(tasks, calendar=None):
+    """Fingerprint of network task records and the calendar, to tell whether a network must be rebuilt"""
+    digest = hashlib.sha1(repr(calendar.key if calendar else None).encode())
+    for task in tasks:
+        digest.update(repr((task.get('id'), task.get('start'), task.get('finish'), task.get('actual_finish'),
+                            task.get('predecessors'))).encode())
+    return digest.hexdigest()
+
+
+def mspdi_link(values):
+    """(uid, link type, lag days) of the child values of an MSPDI <PredecessorLink>, None without a UID"""
+    try:
+        uid = int(values.get('PredecessorUID'))
+    except (TypeError, ValueError):
+        return None
+    try:
+        link_type = LINK_TYPES[int(values.get('Type') or 1)]
+    except (IndexError, ValueError):
+        link_type = 'FS'
+    lag_format = (values.get('LagFormat') or '7').strip()
+    lag = 0.0
+    if lag_format not in PERCENT_LAG_FORMATS:
+        # LinkLag is in tenths of a minute
+        minutes_per_day = 1440 if lag_format in ELAPSED_LAG_FORMATS else MINUTES_PER_DAY
+        try:
+            lag = float(values.get('LinkLag') or 0) / 10 / minutes_per_day
+        except ValueError:
+            lag = 0.0
+    return uid, link_type, lag
+
+
+class DependencyGraph:
+    """Predecessor network of a project's tasks, propagating forecast slips downstream
+
+    Built from the tasks of a schedule (milestones and the work between
+    them) as records {'id', 'start', 'finish', 'actual_finish',
+    'predecessors': [(uid, link type, lag days)]}. Times are kept as day
+    coordinates (working days of the WorkCalendar if there is one), and
+    the topological order is computed once, so each task's finish is the
+    later of its own finish and what its predecessors allow:
+
+    - FS: predecessor finish + lag + duration, SS: predecessor start + lag + duration,
+    - FF: predecessor finish + lag, SF: predecessor start + lag.
+
+    Finished tasks keep their actual finish. A task's own finish is its
+    scheduled finish, which Project already derived from its links;
+    milestones get their ES forecast instead through update(), which only
+    walks the downstream cone of the forecasts that moved and stops
+    wherever a finish does not change. Links closing a cycle or pointing
+    at unknown tasks are dropped.
+    """
+
+    def __init__(self, tasks, calendar=None):
+        """Build the network and its topological order, and propagate the scheduled finishes"""
+        self.calendar = calendar
+        self.logger = logging.getLogger('DependencyGraph')
+        self.source_key = source_key(tasks, calendar)
+        tasks = [task for task in tasks if task.get('id') is not None]
+        self.ids = []
+        self._index = {}
+        for task in tasks:
+            if task['id'] not in self._index:
+                self._index[task['id']] = len(self.ids)
+                self.ids.append(task['id'])
+        tasks = list({task['id']: task for task in tasks}.values())
+
+        start = self._coordinates([task.get('start') for task in tasks])
+        finish = self._coordinates([task.get('finish') for task in tasks])
+        actual = self._coordinates([task.get('actual_finish') for task in tasks])
+        self._complete = (~np.isnan(actual)).tolist()
+        self._scheduled = np.where(np.isnan(actual), finish, actual).tolist()
+        self._duration = np.nan_to_num(np.maximum(finish - start, 0.0)).tolist()
+        self._own = list(self._scheduled)
+
+        self.dropped_links = 0
+        predecessors = []
+        for task in tasks:
+            links = []
+            for uid, link_type, lag in task.get('predecessors') or ():
+                index = self._index.get(uid)
+                if index is None or uid == task['id']:
+                    self.dropped_links += 1
+                    continue
+                links.append((index, link_type, float(lag)))
+            predecessors.append(links)
+        self._sort(predecessors)
+
+        self.key = self._fingerprint()
+        self._finish = [np.nan] * len(self.ids)
+        self._driver = [-1] * len(self.ids)
+        for i in self.order:
+            self._finish[i], self._driver[i] = self._evaluate(i)
+        self.logger.info(
+            f"Built network of {len(self.ids)} tasks and {self.link_count} links "
+            f"({self.dropped_links} links dropped)"
+        )
+
+    @property
+    def link_count(self):
+        """Links kept in the network"""
+        return sum(len(links) for links in self._predecessors)
+
+    def update(self, forecasts):
+        """Set the own finish of tasks ({uid: datetime or None}) and propagate what moved
+
+        None (no forecast) falls back to the scheduled finish. Returns the
+        IDs of the tasks whose propagated finish or driving predecessor
+        changed.
+        """
+        uids = [uid for uid in forecasts if uid in self._index]
+        coordinates = self._coordinates([forecasts[uid] for uid in uids]).tolist()
+        queue = []
+        for uid, coordinate in zip(uids, coordinates):
+            i = self._index[uid]
+            if coordinate != coordinate:
+                coordinate = self._scheduled[i]
+            if self._complete[i] or self._same(coordinate, self._own[i]):
+                continue
+            self._own[i] = coordinate
+            queue.append((self._rank[i], i))
+        heapq.heapify(queue)
+
+        # Visit the cone in topological order, so each task is evaluated once
+        # after all of its changed predecessors
+        queued = {i for _, i in queue}
+        changed = []
+        while queue:
+            _, i = heapq.heappop(queue)
+            finish, driver = self._evaluate(i)
+            if self._same(finish, self._finish[i]) and driver == self._driver[i]:
+                continue
+            moved = not self._same(finish, self._finish[i])
+            self._finish[i], self._driver[i] = finish, driver
+            changed.append(self.ids[i])
+            if moved:
+                for successor in self._successors[i]:
+                    if successor not in queued:
+                        queued.add(successor)
+                        heapq.heappush(queue, (self._rank[successor], successor))
+        return changed
+
+    def finishes(self, uids):
+        """{uid: (propagated finish datetime or None, driving predecessor uid or None)} of known tasks"""
+        uids = [uid for uid in uids if uid in self._index]
+        indexes = [self._index[uid] for uid in uids]
+        dates = self._dates([self._finish[i] for i in indexes])
+        return {
+            uid: (date, self.ids[self._driver[i]] if self._driver[i] >= 0 else None)
+            for uid, i, date in zip(uids, indexes, dates)
+        }
+
+    def downstream(self, uid):
+        """IDs of every task that depends on a task, directly or through others"""
+        start = self._index.get(uid)
+        if start is None:
+            return []
+        seen = {start}
+        stack = [start]
+        while stack:
+            for successor in self._successors[stack.pop()]:
+                if successor not in seen:
+                    seen.add(successor)
+                    stack.append(successor)
+        seen.discard(start)
+        return [self.ids[i] for i in sorted(seen, key=self._rank.__getitem__)]
+
+    def to_dict(self):
+        """Description for the API"""
+        return {'tasks': len(self.ids), 'links': self.link_count, 'dropped_links': self.dropped_links}
+
+    def _fingerprint(self):
+        """Fingerprint of the tasks, links and scheduled dates, for context keys"""
+        digest = hashlib.sha1(repr(self.ids).encode())
+        digest.update(repr(self._predecessors).encode())
+        digest.update(np.array(self._scheduled).tobytes())
+        return digest.hexdigest()
+
+    def _sort(self, predecessors):
+        """Topological order (Kahn); links closing a cycle are dropped"""
+        count = len(predecessors)
+        successors = [[] for _ in range(count)]
+        indegree = [0] * count
+        for i, links in enumerate(predecessors):
+            for p, _, _ in links:
+                successors[p].append(i)
+                indegree[i] += 1
+
+        order = [i for i in range(count) if indegree[i] == 0]
+        position = 0
+        while position < len(order):
+            for successor in successors[order[position]]:
+                indegree[successor] -= 1
+                if indegree[successor] == 0:
+                    order.append(successor)
+            position += 1
+        cyclic = count - len(order)
+        if cyclic:
+            placed = set(order)
+            order.extend(i for i in range(count) if i not in placed)
+
+        rank = [0] * count
+        for position, i in enumerate(order):
+            rank[i] = position
+        self.order = order
+        self._rank = rank
+        self._predecessors = predecessors
+        self._successors = successors
+        if cyclic:
+            # Keep only links from earlier in the order
+            self._predecessors = []
+            self._successors = [[] for _ in range(count)]
+            for i, links in enumerate(predecessors):
+                kept = [link for link in links if rank[link[0]] < rank[i]]
+                self.dropped_links += len(links) - len(kept)
+                self._predecessors.append(kept)
+                for p, _, _ in kept:
+                    self._successors[p].append(i)
+            self.logger.warning(f"Dependency cycles leave {cyclic} tasks unordered; links closing them are dropped")
+
+    def _evaluate(self, i):
+        """Propagated finish and driving predecessor index (-1 for none) of a task"""
+        finish = self._own[i]
+        if self._complete[i]:
+            return finish, -1
+        driver = -1
+        duration = self._duration[i]
+        for p, link_type, lag in self._predecessors[i]:
+            bound = self._finish[p] + lag
+            if link_type in ('SS', 'SF'):
+                bound -= self._duration[p]
+            if link_type in ('FS', 'SS'):
+                bound += duration
+            # Tasks without dates (NaN) neither push nor get pushed past a bound
+            if bound > finish or (finish != finish and bound == bound):
+                finish, driver = bound, p
+        return finish, driver
+
+    def _same(self, a, b):
+        """Whether two coordinates are equal, treating NaN as equal to NaN"""
+        return a == b or (a != a and b != b)
+
+    def _coordinates(self, values):
+        """Day coordinates (working days with a calendar) of datetimes or date strings; NaN if missing"""
+        values = [to_datetime(value) for value in values]
+        values = np.array([np.datetime64('NaT') if value is None else value for value in values],
+                          dtype='datetime64[us]')
+        if self.calendar is not None:
+            return self.calendar.working_time(values)
+        return np.where(np.isnat(values), np.nan, values.astype('int64') / US_PER_DAY)
+
+    def _dates(self, coordinates):
+        """datetimes of day coordinates (None where missing or out of range)"""
+        coordinates = np.array(coordinates, dtype=float)
+        representable = np.isfinite(coordinates) & (np.abs(coordinates) < MAX_FORECAST_DAYS)
+        if self.calendar is not None:
+            dates = self.calendar.from_working_time(np.where(representable, coordinates, 0.0))
+        else:
+            dates = np.rint(np.where(representable, coordinates, 0.0) * US_PER_DAY).astype('int64').astype(
+                'datetime64[us]'
+            )
+        dates = np.where(representable & (dates >= MIN_DATETIME64) & (dates <= MAX_DATETIME64),
+                         dates, np.datetime64('NaT'))
+        return dates.astype(object).tolist()
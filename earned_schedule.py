@@ -1,9 +1,32 @@
 import datetime
-import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import logging
 
+from milestone_record import DATE_FORMAT
+from dashboard_aggregate import DashboardAggregate
+from instrumentation import metrics
+
+# Fallback project start used when a milestone has no baseline start
+DEFAULT_PROJECT_START = datetime(2024, 1, 1)
+
+# Microseconds per day, used to turn datetime64[us] differences into days
+US_PER_DAY = 86400 * 10**6
+
+# Representable range of Python datetime objects, as datetime64[us]
+MIN_DATETIME64 = np.datetime64(datetime.min, 'us')
+MAX_DATETIME64 = np.datetime64(datetime.max, 'us')
+
+# Status and risk labels of the batch engine, by the index np.select picks
+STATUS_LABELS = np.array(['No baseline', 'Complete', 'In Progress', 'Not Started'], dtype=object)
+RISK_LABELS = np.array([None, 'None', 'High', 'Medium', 'Low'], dtype=object)
+
+# Milestones x status dates evaluated at once by calculate_metrics_sweep
+SWEEP_CHUNK_ELEMENTS = 250000
+
+# Larger than the span of representable datetimes, small enough to stay in int64 microseconds
+MAX_FORECAST_DAYS = 3700000
+
 class EarnedScheduleCalculator:
     """Class to calculate Earned Schedule metrics for milestones"""
     
@@ -21,13 +44,20 @@ class EarnedScheduleCalculator:
         )
         self.logger = logging.getLogger('EarnedScheduleCalculator')
     
-    def calculate_milestone_metrics(self, milestone):
-        """Calculate ES metrics for a single milestone"""
+    def calculate_milestone_metrics(self, milestone, status_date=None, curve=None, earned_value=None,
+                                    calendar=None):
+        """Calculate ES metrics for a single milestone
+        
+        With a project PlannedValueCurve and the project's earned value, ES
+        comes from the time-phased baseline instead of the milestone's
+        percent complete. With a WorkCalendar, durations are working days and
+        forecasts skip non-working days.
+        """
         try:
             # Parse dates from strings to datetime objects
             baseline_finish = self._parse_date(milestone.get('baseline_finish'))
             actual_finish = self._parse_date(milestone.get('actual_finish'))
-            today = datetime.now()  # Status date (today)
+            today = status_date or datetime.now()  # Status date (today)
             
             # Skip if no baseline
             if not baseline_finish:
@@ -39,26 +69,39 @@ class EarnedScheduleCalculator:
                 return milestone
             
             # Get planned duration (from project start to baseline finish)
-            # For simplicity, we'll use a fixed project start date if not available
-            project_start = self._parse_date(milestone.get('baseline_start')) or datetime(2024, 1, 1)
-            planned_duration = (baseline_finish - project_start).days
+            # ES is measured on the project clock when a PV curve is available;
+            # otherwise use the milestone's baseline start or a fixed fallback
+            if curve is not None:
+                project_start = curve.start
+            else:
+                project_start = self._parse_date(milestone.get('baseline_start')) or DEFAULT_PROJECT_START
+            if calendar is not None:
+                days_between = calendar.working_days_between
+            else:
+                days_between = lambda start, end: (end - start).days
+            planned_duration = days_between(project_start, baseline_finish)
             
             # Calculate actual time (AT) - days from project start until today or completion
-            at_days = (today - project_start).days
+            at_days = days_between(project_start, today)
             
             # Calculate earned schedule (ES) based on completion status
             percent_complete = milestone.get('percent_complete', 0)
             
             if actual_finish:  # Milestone is complete
-                es_days = (actual_finish - project_start).days
+                es_days = days_between(project_start, actual_finish)
                 milestone['status'] = 'Complete'
             elif percent_complete == 100:  # Complete but no actual finish date
                 es_days = at_days
                 milestone['status'] = 'Complete'
             else:  # In progress or not started
-                # For milestones, ES is typically 0 until complete, but we can interpolate
-                # based on % complete of the milestone (assuming linear progress)
-                es_days = planned_duration * (percent_complete / 100)
+                project_es_days = self._project_es_days(curve, earned_value, calendar)
+                if project_es_days is not None:
+                    # Time-phased ES, capped at this milestone's planned duration
+                    es_days = min(project_es_days, planned_duration)
+                else:
+                    # For milestones, ES is typically 0 until complete, but we can interpolate
+                    # based on % complete of the milestone (assuming linear progress)
+                    es_days = planned_duration * (percent_complete / 100)
                 milestone['status'] = 'In Progress' if percent_complete > 0 else 'Not Started'
             
             # Calculate Schedule Variance in time terms - SV(t)
@@ -69,7 +112,7 @@ class EarnedScheduleCalculator:
             
             # Calculate To Complete Schedule Performance Index (TSPI)
             remaining_planned = planned_duration - es_days
-            remaining_time = (baseline_finish - today).days
+            remaining_time = days_between(today, baseline_finish)
             
             if remaining_planned > 0 and remaining_time > 0:
                 tspi = remaining_planned / remaining_time
@@ -85,16 +128,18 @@ class EarnedScheduleCalculator:
                 remaining_duration = ieac_t - es_days
                 
                 # Forecast finish date
-                forecast_finish = today + timedelta(days=remaining_duration)
-                forecast_finish_str = forecast_finish.strftime('%Y-%m-%d %H:%M:%S')
+                if calendar is not None:
+                    forecast_finish = calendar.add_working_days(today, remaining_duration)
+                else:
+                    forecast_finish = today + timedelta(days=remaining_duration)
             else:
-                forecast_finish_str = actual_finish.strftime('%Y-%m-%d %H:%M:%S') if actual_finish else None
+                forecast_finish = actual_finish
             
             # Update milestone with calculated metrics
             milestone['sv_t'] = round(sv_t, 1)  # days ahead/behind
             milestone['spi_t'] = round(spi_t, 2)
             milestone['tspi'] = round(tspi, 2) if tspi else None
-            milestone['forecast_finish'] = forecast_finish_str
+            milestone['forecast_finish'] = self._date_value(milestone, forecast_finish)
             
             # Add risk indicator based on SPI(t) and TSPI
             if percent_complete < 100:
@@ -114,72 +159,424 @@ class EarnedScheduleCalculator:
             milestone['error'] = str(e)
             return milestone
     
-    def calculate_forecasts(self, milestones):
-        """Calculate forecasts for all milestones"""
-        updated_milestones = []
+    def calculate_forecasts(self, milestones, status_date=None, curve=None, earned_value=None, calendar=None):
+        """Calculate forecasts for all milestones
+
+        Thin dict adapter over calculate_metrics_batch: the milestone dicts are
+        turned into columns, evaluated in one vectorized pass against a single
+        status date, and the results are written back into the same dicts.
+        Rows the batch engine cannot represent go through the scalar path.
+        ``calendar`` (a WorkCalendar) switches durations to working days.
+        """
+        if not milestones:
+            return list(milestones)
         
-        for milestone in milestones:
-            updated_milestone = self.calculate_milestone_metrics(milestone)
-            updated_milestones.append(updated_milestone)
+        today = status_date or datetime.now()
+        metrics.count('milestones_processed_total', len(milestones), stage='forecast')
+        with metrics.span('forecast.parse_dates'):
+            baseline_start, baseline_finish, actual_finish, percent_complete, usable = \
+                self.milestone_columns(milestones)
+        with metrics.span('forecast.batch'):
+            results = self.calculate_metrics_batch(
+                baseline_start, baseline_finish, actual_finish, percent_complete,
+                status_date=today, curve=curve, earned_value=earned_value, calendar=calendar
+            )
+        
+        with metrics.span('forecast.write_back'):
+            return self._write_results(milestones, results, usable, today, curve, earned_value, calendar)
+    
+    def _write_results(self, milestones, results, usable, today, curve, earned_value, calendar=None):
+        """Store batch results on the milestones, using the scalar path for rows the batch could not handle"""
+        # Plain lists are much cheaper to index than numpy scalars. Dict
+        # milestones get date strings, typed Milestone records datetimes
+        forecast_strings = forecast_datetimes = None
+        if any(isinstance(m, dict) for m in milestones):
+            forecast_strings = self._format_datetime64(results['forecast_finish'])
+        if not all(isinstance(m, dict) for m in milestones):
+            forecast_datetimes = results['forecast_finish'].astype(object).tolist()
+        valid = results['valid'].tolist()
+        status_column = results['status'].tolist()
+        risk_column = results['risk'].tolist()
+        sv_column = results['sv_t'].tolist()
+        spi_column = results['spi_t'].tolist()
+        tspi_column = results['tspi'].tolist()
+        whole_es = results['whole_es'].tolist()
+        
+        updated_milestones = []
+        for i, milestone in enumerate(milestones):
+            if not (usable[i] and valid[i]):
+                updated_milestones.append(self.calculate_milestone_metrics(
+                    milestone, status_date=today, curve=curve, earned_value=earned_value, calendar=calendar
+                ))
+                continue
+            
+            status = status_column[i]
+            milestone['status'] = status
+            if status == 'No baseline':
+                milestone['sv_t'] = None
+                milestone['spi_t'] = None
+                milestone['tspi'] = None
+                milestone['forecast_finish'] = None
+                updated_milestones.append(milestone)
+                continue
+            
+            tspi = tspi_column[i]
+            milestone['sv_t'] = int(sv_column[i]) if whole_es[i] else round(sv_column[i], 1)
+            milestone['spi_t'] = round(spi_column[i], 2)
+            milestone['tspi'] = round(tspi, 2) if tspi else None
+            milestone['forecast_finish'] = (
+                forecast_strings[i] if isinstance(milestone, dict) else forecast_datetimes[i]
+            )
+            milestone['risk'] = risk_column[i]
+            updated_milestones.append(milestone)
         
         return updated_milestones
     
-    def prepare_dashboard_data(self, milestones):
-        """Prepare data for dashboard visualizations"""
-        # Create summary stats
-        total_milestones = len(milestones)
-        completed = sum(1 for m in milestones if m.get('percent_complete') == 100)
-        behind_schedule = sum(1 for m in milestones if m.get('sv_t', 0) < 0 and m.get('percent_complete') < 100)
-        on_schedule = sum(1 for m in milestones if m.get('sv_t', 0) >= 0 and m.get('percent_complete') < 100)
-        
-        # Risk breakdown
-        high_risk = sum(1 for m in milestones if m.get('risk') == 'High')
-        medium_risk = sum(1 for m in milestones if m.get('risk') == 'Medium')
-        low_risk = sum(1 for m in milestones if m.get('risk') == 'Low')
-        
-        # Average SPI(t)
-        valid_spi = [m.get('spi_t') for m in milestones if m.get('spi_t') is not None]
-        avg_spi_t = sum(valid_spi) / len(valid_spi) if valid_spi else 0
-        
-        # Timeline data for visualization
-        timeline_data = []
-        for m in milestones:
-            if m.get('baseline_finish') and (m.get('forecast_finish') or m.get('actual_finish')):
-                baseline = self._parse_date(m.get('baseline_finish'))
-                forecast = self._parse_date(m.get('forecast_finish') or m.get('actual_finish'))
+    def milestone_columns(self, milestones):
+        """Input columns of calculate_metrics_batch for a list of milestones
+        
+        Returns baseline_start, baseline_finish, actual_finish (datetime64
+        arrays), percent_complete (float array) and usable, a list that is
+        False for rows the batch engine cannot represent.
+        """
+        # Parse each distinct date string only once
+        parsed_dates = {None: None, '': None}
+        count = len(milestones)
+        baseline_start = [None] * count
+        baseline_finish = [None] * count
+        actual_finish = [None] * count
+        percent_complete = [0] * count
+        usable = [True] * count
+        
+        for i, milestone in enumerate(milestones):
+            try:
+                pc = milestone.get('percent_complete', 0)
+                if pc is None or isinstance(pc, str):
+                    usable[i] = False
+                    continue
+                percent_complete[i] = pc
+                
+                value = milestone.get('baseline_start')
+                if value not in parsed_dates:
+                    parsed_dates[value] = self._parse_date(value)
+                baseline_start[i] = parsed_dates[value]
+                
+                value = milestone.get('baseline_finish')
+                if value not in parsed_dates:
+                    parsed_dates[value] = self._parse_date(value)
+                baseline_finish[i] = parsed_dates[value]
                 
-                timeline_data.append({
-                    'name': m.get('name'),
-                    'baseline': m.get('baseline_finish'),
-                    'forecast': m.get('forecast_finish') or m.get('actual_finish'),
-                    'variance_days': m.get('sv_t'),
-                    'status': m.get('status'),
-                    'risk': m.get('risk')
-                })
-        
-        # Prepare return data
-        dashboard_data = {
-            'summary': {
-                'total_milestones': total_milestones,
-                'completed': completed,
-                'behind_schedule': behind_schedule,
-                'on_schedule': on_schedule,
-                'avg_spi_t': round(avg_spi_t, 2),
-                'high_risk': high_risk,
-                'medium_risk': medium_risk,
-                'low_risk': low_risk
-            },
-            'timeline': timeline_data,
-            'milestones': milestones
+                value = milestone.get('actual_finish')
+                if value not in parsed_dates:
+                    parsed_dates[value] = self._parse_date(value)
+                actual_finish[i] = parsed_dates[value]
+            except Exception:
+                # Anything unusual (unhashable or non-string dates, odd numeric
+                # types) is left to the scalar path, which reports the error
+                usable[i] = False
+                baseline_start[i] = baseline_finish[i] = actual_finish[i] = None
+                percent_complete[i] = 0
+        
+        return (self._to_datetime64(baseline_start), self._to_datetime64(baseline_finish),
+                self._to_datetime64(actual_finish), np.array(percent_complete, dtype=float), usable)
+    
+    def calculate_metrics_batch(self, baseline_start, baseline_finish, actual_finish,
+                                percent_complete, status_date=None, curve=None, earned_value=None,
+                                calendar=None):
+        """Calculate ES metrics for columns of milestones in one vectorized pass
+        
+        Date columns are datetime64 arrays with NaT for missing values and
+        percent_complete is a float array. Every milestone is evaluated against
+        the same status date. Returns a dict of arrays aligned with the inputs:
+        sv_t, spi_t, tspi (NaN without a baseline), forecast_finish
+        (datetime64[us], NaT when there is none), status and risk (object
+        arrays, risk is None without a baseline) and valid, which is False where
+        the scalar path would raise (e.g. a forecast outside the datetime range).
+        planned_duration and es_days (days from the ES start) are included for
+        simulations built on the same inputs. curve and earned_value enable
+        time-phased ES as in the scalar path. With a WorkCalendar all day
+        counts are working days, looked up in its precompiled index for the
+        whole column at once, and forecasts are placed on working days.
+        status_date may also be a column of status dates (shape (dates, 1)),
+        which broadcasts against the milestone columns to give one row of
+        results per status date.
+        """
+        if isinstance(status_date, np.ndarray):
+            today = status_date.astype('datetime64[us]')
+        else:
+            today = np.datetime64(status_date or datetime.now(), 'us')
+        baseline_start = np.asarray(baseline_start, dtype='datetime64[us]')
+        baseline_finish = np.asarray(baseline_finish, dtype='datetime64[us]')
+        actual_finish = np.asarray(actual_finish, dtype='datetime64[us]')
+        percent_complete = np.asarray(percent_complete, dtype=float)
+        
+        has_baseline = ~np.isnat(baseline_finish)
+        has_actual = ~np.isnat(actual_finish)
+        if curve is not None:
+            project_start = np.datetime64(curve.start, 'us')
+        else:
+            project_start = np.where(
+                np.isnat(baseline_start), np.datetime64(DEFAULT_PROJECT_START, 'us'), baseline_start
+            )
+        project_es_days = self._project_es_days(curve, earned_value, calendar)
+        
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            # Whole days, floored like timedelta.days
+            if calendar is None:
+                planned_duration = self._whole_days(baseline_finish - project_start)
+                at_days = self._whole_days(today - project_start)
+                remaining_time = self._whole_days(baseline_finish - today)
+                actual_days = self._whole_days(actual_finish - project_start)
+            else:
+                start_time = calendar.working_time(project_start)
+                today_time = calendar.working_time(today)
+                finish_time = calendar.working_time(baseline_finish)
+                planned_duration = np.floor(finish_time - start_time)
+                at_days = np.floor(today_time - start_time)
+                remaining_time = np.floor(finish_time - today_time)
+                actual_days = np.floor(calendar.working_time(actual_finish) - start_time)
+            
+            is_complete = has_actual | (percent_complete == 100)
+            es_days = np.where(
+                has_actual,
+                actual_days,
+                np.where(
+                    percent_complete == 100,
+                    at_days,
+                    planned_duration * (percent_complete / 100) if project_es_days is None
+                    else np.minimum(project_es_days, planned_duration)
+                )
+            )
+            
+            # The scalar path keeps integer day counts when ES is a whole
+            # number of days: completed milestones and curve ES capped at
+            # the planned duration
+            whole_es = is_complete if project_es_days is None else (
+                is_complete | (planned_duration < project_es_days)
+            )
+            
+            sv_t = es_days - at_days
+            spi_t = np.where(at_days > 0, es_days / at_days, 1.0)
+            
+            remaining_planned = planned_duration - es_days
+            tspi = np.where(
+                (remaining_planned > 0) & (remaining_time > 0), remaining_planned / remaining_time, 1.0
+            )
+            
+            # Forecast finish = status date + (IEAC(t) - ES), converted to whole
+            # microseconds the same way timedelta(days=...) does
+            needs_forecast = has_baseline & (percent_complete < 100) & (spi_t > 0)
+            remaining_duration = np.where(needs_forecast, planned_duration / spi_t - es_days, 0.0)
+            # Anything beyond MAX_FORECAST_DAYS overflows datetime in the scalar path anyway
+            representable = np.isfinite(remaining_duration) & (np.abs(remaining_duration) < MAX_FORECAST_DAYS)
+            if calendar is None:
+                day_fraction, whole_days = np.modf(remaining_duration)
+                remaining_us = np.where(
+                    representable, whole_days * US_PER_DAY + np.rint(day_fraction * US_PER_DAY), 0.0
+                ).astype('int64')
+                projected = today + remaining_us.astype('timedelta64[us]')
+            else:
+                # Count the remaining working days on from the status date
+                projected = calendar.from_working_time(
+                    today_time + np.where(representable, remaining_duration, 0.0)
+                )
+            forecast_finish = np.where(needs_forecast, projected, actual_finish)
+        
+        forecast_in_range = (forecast_finish >= MIN_DATETIME64) & (forecast_finish <= MAX_DATETIME64)
+        valid = ~has_baseline | ~needs_forecast | (representable & forecast_in_range)
+        
+        forecast_finish = np.where(has_baseline & valid, forecast_finish, np.datetime64('NaT'))
+        sv_t = np.where(has_baseline, sv_t, np.nan)
+        spi_t = np.where(has_baseline, spi_t, np.nan)
+        tspi = np.where(has_baseline, tspi, np.nan)
+        
+        # Labels are picked by index so every cell shares the same string objects
+        status = STATUS_LABELS[np.select(
+            [~has_baseline, is_complete, percent_complete > 0], [0, 1, 2], default=3
+        )]
+        risk = RISK_LABELS[np.select(
+            [~has_baseline, percent_complete >= 100,
+             (spi_t < 0.85) | (tspi > 1.2), (spi_t < 0.95) | (tspi > 1.1)],
+            [0, 1, 2, 3],
+            default=4
+        )]
+        
+        return {
+            'sv_t': sv_t,
+            'spi_t': spi_t,
+            'tspi': tspi,
+            'forecast_finish': forecast_finish,
+            'status': status,
+            'risk': risk,
+            'valid': valid,
+            'whole_es': whole_es,
+            'planned_duration': planned_duration,
+            'es_days': es_days
         }
+    
+    def calculate_metrics_sweep(self, baseline_start, baseline_finish, actual_finish, percent_complete,
+                                status_dates, calendar=None, recorded_dates=None, recorded_progress=None):
+        """Metrics of every milestone as of every status date, as (dates x milestones) matrices
+        
+        Each status date is evaluated with the progress known on it, so
+        later progress never shows up at earlier dates. Milestones finished
+        by then keep their percent complete. Others use the percent complete
+        recorded as of that date: recorded_progress has one row per sorted
+        recorded_dates entry (NaN where a milestone has none), and a status
+        date takes the last row on or before it. Without a recorded value,
+        milestones finished later count as not started (percent complete
+        0), and milestones still open now are left out (NaN, NaT and not
+        counted). Without a record of the project's earned value at past
+        dates, ES comes from the milestones themselves (no PV curve). Blocks
+        of status dates go through calculate_metrics_batch as 2-D arrays, so
+        memory stays bounded. Returns sv_t, spi_t, tspi (NaN without a
+        baseline or where the batch engine cannot represent a result),
+        forecast_finish (NaT) and per-date counts: complete,
+        behind_schedule, high_risk and unknown_progress (milestones left
+        out).
+        """
+        status_dates = np.asarray(status_dates, dtype='datetime64[us]')
+        baseline_finish = np.asarray(baseline_finish, dtype='datetime64[us]')
+        actual_finish = np.asarray(actual_finish, dtype='datetime64[us]')
+        percent_complete = np.asarray(percent_complete, dtype=float)
+        shape = (len(status_dates), len(baseline_finish))
+        results = {
+            'sv_t': np.empty(shape),
+            'spi_t': np.empty(shape),
+            'tspi': np.empty(shape),
+            'forecast_finish': np.empty(shape, dtype='datetime64[us]'),
+            'complete': np.zeros(shape[0], dtype=np.int64),
+            'behind_schedule': np.zeros(shape[0], dtype=np.int64),
+            'high_risk': np.zeros(shape[0], dtype=np.int64),
+            'unknown_progress': np.zeros(shape[0], dtype=np.int64)
+        }
+        
+        rows = max(1, SWEEP_CHUNK_ELEMENTS // max(shape[1], 1))
+        for start in range(0, shape[0], rows):
+            stop = min(start + rows, shape[0])
+            today = status_dates[start:stop, None]
+            finished = actual_finish <= today
+            if recorded_progress is not None and len(recorded_dates):
+                row = np.searchsorted(recorded_dates, status_dates[start:stop], side='right') - 1
+                recorded = np.where((row >= 0)[:, None], recorded_progress[np.maximum(row, 0)], np.nan)
+            else:
+                recorded = np.full((stop - start, shape[1]), np.nan)
+            has_record = ~np.isnan(recorded)
+            known = finished | has_record | ~np.isnat(actual_finish)
+            chunk = self.calculate_metrics_batch(
+                baseline_start, baseline_finish,
+                np.where(finished, actual_finish, np.datetime64('NaT')),
+                np.where(finished, percent_complete, np.where(has_record, recorded, 0.0)),
+                status_date=today, calendar=calendar
+            )
+            valid = chunk['valid'] & known
+            for name in ('sv_t', 'spi_t', 'tspi'):
+                results[name][start:stop] = np.where(valid, chunk[name], np.nan)
+            results['forecast_finish'][start:stop] = np.where(known, chunk['forecast_finish'], np.datetime64('NaT'))
+            complete = known & (chunk['status'] == 'Complete')
+            open_milestones = known & ~complete
+            results['complete'][start:stop] = complete.sum(axis=1)
+            results['behind_schedule'][start:stop] = (open_milestones & (chunk['sv_t'] < 0)).sum(axis=1)
+            results['high_risk'][start:stop] = (known & (chunk['risk'] == 'High')).sum(axis=1)
+            results['unknown_progress'][start:stop] = (~known).sum(axis=1)
+        return results
+    
+    def prepare_dashboard_data(self, milestones):
+        """Prepare data for dashboard visualizations
+        
+        Walks the milestones once; the app keeps a DashboardAggregate up to
+        date instead of calling this on every request.
+        """
+        metrics.count('milestones_processed_total', len(milestones), stage='dashboard')
+        with metrics.span('dashboard.prepare'):
+            return DashboardAggregate.from_milestones(milestones).dashboard_data(milestones)
+    
+    def _project_es_days(self, curve, earned_value, calendar=None):
+        """Project ES in days (working days with a calendar) from the curve start, or None without a curve"""
+        if curve is None or earned_value is None:
+            return None
+        es_days = max(curve.earned_schedule_days(earned_value), 0.0)
+        if calendar is None:
+            return es_days
+        start = np.datetime64(curve.start, 'us')
+        es_date = start + np.timedelta64(int(round(es_days * US_PER_DAY)), 'us')
+        start_time, es_time = calendar.working_time(np.array([start, es_date])).tolist()
+        return es_time - start_time
+    
+    def _whole_days(self, delta):
+        """Convert a timedelta64[us] array to whole days, floored like timedelta.days"""
+        return (delta.astype('int64') // US_PER_DAY).astype(float)
+    
+    def _format_datetime64(self, values):
+        """Format a datetime64 array as '%Y-%m-%d %H:%M:%S' strings (None for NaT)
+        
+        Only the distinct days and times of day are formatted; the strings
+        are assembled from them in a fixed-width buffer, which is much
+        faster than formatting every value when columns run to millions.
+        """
+        missing = np.isnat(values)
+        seconds = np.where(missing, 0, values.astype('datetime64[s]').astype('int64'))
+        days, clock = np.divmod(seconds, 86400)
+        unique_days, day_index = self._distinct(days)
+        day_strings = np.datetime_as_string(unique_days.astype('datetime64[D]'))
+        if len(day_strings) and np.char.str_len(day_strings).max() > 10:
+            # Years outside 0000-9999 do not fit the fixed width
+            strings = np.datetime_as_string(values.astype('datetime64[s]'), unit='s').astype(object)
+            strings[missing] = None
+            return [None if s is None else s.replace('T', ' ') for s in strings.tolist()]
+        day_strings = day_strings.astype('U10')
+        unique_clock, clock_index = self._distinct(clock)
+        clock_strings = np.array([f'{c // 3600:02d}:{c // 60 % 60:02d}:{c % 60:02d}' for c in unique_clock.tolist()],
+                                 dtype='U8')
         
-        return dashboard_data
+        buffer = np.empty((len(values), 19), dtype=np.uint32)
+        buffer[:, :10] = day_strings.view(np.uint32).reshape(-1, 10)[day_index]
+        buffer[:, 10] = ord(' ')
+        buffer[:, 11:] = clock_strings.view(np.uint32).reshape(-1, 8)[clock_index]
+        strings = buffer.view('U19').ravel().astype(object)
+        strings[missing] = None
+        return strings.tolist()
+    
+    def _distinct(self, values):
+        """Distinct values of an int64 array and the index of each value into them
+        
+        Small spans are tabulated directly, which avoids sorting large arrays.
+        """
+        if not len(values):
+            return values, values
+        low = values.min()
+        span = values.max() - low + 1
+        if span <= len(values):
+            return np.arange(low, low + span), values - low
+        return np.unique(values, return_inverse=True)
+    
+    def _to_datetime64(self, values):
+        """Convert a list of datetimes (None for missing) to a datetime64[us] array"""
+        return np.array([np.datetime64('NaT') if v is None else v for v in values], dtype='datetime64[us]')
+    
+    def _date_value(self, milestone, value):
+        """Date to store on a milestone: a datetime on Milestone records, a string on dicts"""
+        if value is None or not isinstance(milestone, dict):
+            return value
+        return value.strftime(DATE_FORMAT)
     
     def _parse_date(self, date_str):
         """Parse date string to datetime object"""
         if not date_str:
             return None
         
+        # Typed Milestone records already hold datetimes
+        if isinstance(date_str, datetime):
+            return date_str
+        
+        # Fast path for the two fixed-width formats we write ourselves
+        if isinstance(date_str, str) and date_str[4:5] == date_str[7:8] == '-' and (
+                len(date_str) == 10 or (len(date_str) == 19 and date_str[10] == ' ')):
+            try:
+                return datetime.fromisoformat(date_str)
+            except ValueError:
+                pass
+        
         try:
             return datetime.strptime(date_str, '%Y-%m-%d %H:%M:%S')
         except ValueError:
@@ -187,4 +584,5 @@ class EarnedScheduleCalculator:
                 return datetime.strptime(date_str, '%Y-%m-%d')
             except ValueError:
                 self.logger.error(f"Could not parse date: {date_str}")
+                metrics.count('date_parse_failures_total', source='earned_schedule')
                 return None
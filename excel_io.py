@@ -0,0 +1,354 @@
+import logging
+import os
+from datetime import datetime
+
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill
+from openpyxl.utils import get_column_letter
+from openpyxl.utils.datetime import from_excel
+
+from instrumentation import metrics
+from milestone_record import Milestone, to_datetime
+
+# Sheet of the ES Calculator workbook the milestones are written to and read from
+SHEET_NAME = 'Milestone Forecast'
+
+# Exported columns: (field, heading as in the ES Calculator, units row entry, number format)
+# 'f_sv_t' is derived: baseline finish - forecast finish in days, negative when late
+COLUMNS = (
+    ('id', 'UniqueID', '', '0'),
+    ('wbs', 'WBS', '', 'General'),
+    ('name', 'Milestone', '', 'General'),
+    ('percent_complete', '% Complete', '%', '0'),
+    ('baseline_start', 'Baseline Start', 'mo/da/yr', 'mm-dd-yy'),
+    ('baseline_finish', 'Milstn Date', 'mo/da/yr', 'mm-dd-yy'),
+    ('actual_finish', 'Actual Finish', 'mo/da/yr', 'mm-dd-yy'),
+    ('forecast_finish', 'Forecast Date', 'mo/da/yr', 'mm-dd-yy'),
+    ('f_sv_t', 'F-SV(t)', 'days', '0'),
+    ('sv_t', 'SV(t)M', 'days', '0.0'),
+    ('spi_t', 'SPI(t)M', '', '0.0000'),
+    ('tspi', 'TSPIM', '', '0.000'),
+    ('status', 'Status', '', 'General'),
+    ('risk', 'Risk', '', 'General'),
+    ('notes', 'Notes', '', 'General')
+)
+
+# Headings recognised on import (lower case) -> milestone input field
+HEADINGS = {
+    'uniqueid': 'id', 'unique id': 'id', 'id': 'id',
+    'wbs': 'wbs',
+    'milestone': 'name', 'name': 'name', 'task name': 'name',
+    '% complete': 'percent_complete', 'percent complete': 'percent_complete',
+    'start': 'start_date', 'finish': 'finish_date',
+    'baseline start': 'baseline_start',
+    'milstn date': 'baseline_finish', 'baseline finish': 'baseline_finish',
+    'actual start': 'actual_start', 'actual finish': 'actual_finish',
+    'notes': 'notes'
+}
+
+# Rows searched for the heading row
+HEADER_SEARCH_ROWS = 10
+
+# Date formats of text cells, besides ISO dates (the workbook's mo/da/yr)
+TEXT_DATE_FORMATS = ('%m/%d/%Y', '%m/%d/%y', '%m-%d-%Y', '%m-%d-%y')
+
+# Entries of the units row under the headings
+UNITS = frozenset(units for _, _, units, _ in COLUMNS if units) | {'S or V', 'M, B, or W'}
+
+# Colors of the ES Calculator's heading and input cells
+HEADING_FILL = PatternFill('solid', fgColor='FF99FFCC')
+RESULT_FILL = PatternFill('solid', fgColor='FF99CCFF')
+
+# Widths of the exported columns (characters), 12 for the others
+COLUMN_WIDTHS = {'name': 40, 'wbs': 14, 'notes': 40}
+
+INSTRUCTIONS = (
+    'Milestone SV(t) Forecast export',
+    '',
+    'The Milestone Forecast sheet lists one milestone per row, starting at row 3;',
+    'row 2 gives the units. Terms follow the ES Calculator: Milstn Date is the baseline',
+    'finish, SPI(t)M and SV(t)M the milestone\'s schedule performance index and variance,',
+    'F-SV(t) the forecast schedule variance in days (negative: improvement is needed to',
+    'achieve the milestone) and TSPIM the performance needed to finish on the baseline date.',
+    '',
+    'The sheet can be edited and imported again as a milestone source. Only the input',
+    'columns (UniqueID to Actual Finish, Notes) are read; results are recalculated.'
+)
+
+
+def _cell_date(value):
+    """Date of an import cell: datetimes, Excel serial numbers, ISO or mo/da/yr text (None if not a date)"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, (int, float)):
+        try:
+            return from_excel(value)
+        except (ValueError, OverflowError):
+            pass
+    elif isinstance(value, str):
+        value = value.strip()
+        parsed = to_datetime(value)
+        if parsed is not None:
+            return parsed
+        for fmt in TEXT_DATE_FORMATS:
+            try:
+                return datetime.strptime(value, fmt)
+            except ValueError:
+                continue
+    metrics.count('date_parse_failures_total', source='excel')
+    return None
+
+
+def _cell_percent(value, number_format):
+    """Percent complete (0-100) of an import cell: numbers, '50%' text or percent-formatted fractions"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, str):
+        try:
+            return float(value.strip().rstrip('%'))
+        except ValueError:
+            return None
+    if '%' in (number_format or ''):
+        return value * 100
+    return value
+
+
+class ExcelExporter:
+    """Writes calculated milestones to the ES Calculator workbook layout
+
+    The workbook is created in openpyxl's write-only mode: every row is
+    serialised to a temporary file as soon as it is appended, so exporting
+    100k+ milestones takes the same memory as exporting ten. Headings and
+    the units row follow the calculator's Milestone Forecast sheet, with
+    one milestone per row instead of one milestone per workbook.
+    """
+
+    def __init__(self):
+        """Initialize the exporter"""
+        self.logger = logging.getLogger('ExcelExporter')
+
+    def export(self, milestones, target, project_name=None, status_date=None):
+        """Write the milestones to ``target`` (a path or binary file object); returns the row count"""
+        with metrics.span('excel_export.write'):
+            workbook = Workbook(write_only=True)
+            workbook.properties.title = project_name
+            workbook.properties.subject = 'Milestone SV(t) Forecast'
+
+            self._write_instructions(workbook.create_sheet('Instructions'), project_name, status_date)
+            sheet = workbook.create_sheet(SHEET_NAME)
+            count = self._write_milestones(sheet, milestones)
+            workbook.save(target)
+
+        metrics.count('milestones_processed_total', count, stage='excel_export')
+        self.logger.info(f"Exported {count} milestones of {project_name or 'project'} to Excel")
+        return count
+
+    def _write_instructions(self, sheet, project_name, status_date):
+        """Short description of the sheet, with the project and status date"""
+        sheet.column_dimensions['A'].width = 90
+        title = WriteOnlyCell(sheet, INSTRUCTIONS[0])
+        title.font = Font(bold=True)
+        sheet.append([title])
+        for line in INSTRUCTIONS[1:]:
+            sheet.append([line])
+        sheet.append([])
+        sheet.append([f'Project: {project_name or ""}'])
+        if status_date is not None:
+            date = WriteOnlyCell(sheet, status_date)
+            date.number_format = 'mm-dd-yy'
+            sheet.append(['Status Date:', date])
+
+    def _write_milestones(self, sheet, milestones):
+        """Heading and units rows, then one row per milestone from row 3"""
+        sheet.freeze_panes = 'A3'
+        for column, (field, _, _, _) in enumerate(COLUMNS, start=1):
+            sheet.column_dimensions[get_column_letter(column)].width = COLUMN_WIDTHS.get(field, 12)
+
+        headings = []
+        for field, heading, _, _ in COLUMNS:
+            cell = WriteOnlyCell(sheet, heading)
+            cell.font = Font(bold=True)
+            if field in ('baseline_finish', 'f_sv_t'):
+                cell.fill = HEADING_FILL if field == 'baseline_finish' else RESULT_FILL
+            headings.append(cell)
+        sheet.append(headings)
+        sheet.append([units or None for _, _, units, _ in COLUMNS])
+
+        # One styled cell per formatted column, reused for every row: append()
+        # serialises a row before returning, so only the value has to change
+        styled = {}
+        for field, _, _, fmt in COLUMNS:
+            if fmt != 'General':
+                styled[field] = WriteOnlyCell(sheet)
+                styled[field].number_format = fmt
+
+        count = 0
+        for milestone in milestones:
+            sheet.append(self._row(milestone, styled))
+            count += 1
+        return count
+
+    def _row(self, milestone, styled):
+        """Values and styled cells of one milestone row"""
+        baseline_finish = milestone.get('baseline_finish')
+        forecast_finish = milestone.get('forecast_finish')
+        row = []
+        for field, _, _, _ in COLUMNS:
+            if field == 'f_sv_t':
+                value = None
+                if isinstance(baseline_finish, datetime) and isinstance(forecast_finish, datetime):
+                    value = round((baseline_finish - forecast_finish).total_seconds() / 86400, 2)
+            else:
+                value = milestone.get(field)
+            cell = styled.get(field)
+            if value is None or value == '':
+                row.append(None)
+            elif cell is None or isinstance(value, str):
+                row.append(value)
+            else:
+                cell.value = value
+                row.append(cell)
+        return row
+
+
+class ExcelImporter:
+    """Reads milestones from a Milestone Forecast workbook without MS Project
+
+    The workbook is opened read-only, so rows are parsed from the file as
+    they are iterated instead of being loaded into memory. Any sheet with a
+    heading row naming at least the Milestone and Milstn Date (or Baseline
+    Finish) columns is accepted, which covers workbooks exported by
+    ExcelExporter and edited by hand. Result columns are ignored; the
+    milestones are recalculated like those of any other source. Returns the
+    same Milestone records as MSProjectIntegration._extract_task_data.
+    """
+
+    def __init__(self, source):
+        """Initialize the importer with a file path or binary file object"""
+        self.source = source
+        self.project_name = None
+        self.milestones = None
+        self.rows_scanned = 0
+        self.setup_logging()
+
+    def setup_logging(self):
+        """Set up logging"""
+        self.logger = logging.getLogger('ExcelImporter')
+
+    def read(self, progress=None):
+        """Read the milestone rows of the workbook
+
+        ``progress`` is called as progress(rows_scanned, None) every 1000 rows.
+        """
+        try:
+            workbook = load_workbook(self.source, read_only=True, data_only=True)
+        except Exception as e:
+            raise ValueError(f"Invalid Excel workbook: {str(e)}")
+
+        try:
+            with metrics.span('excel_import.parse'):
+                milestones = self._parse(workbook, progress)
+            self.project_name = workbook.properties.title or self._file_stem()
+        finally:
+            workbook.close()
+        metrics.count('milestones_processed_total', len(milestones), stage='excel_import')
+
+        self.milestones = milestones
+        self.logger.info(f"Read {len(milestones)} milestones from {self.rows_scanned} rows of Excel workbook")
+        return milestones
+
+    def _parse(self, workbook, progress):
+        """Find the milestone sheet and heading row, then read the rows below it"""
+        sheets = [workbook[SHEET_NAME]] if SHEET_NAME in workbook.sheetnames else []
+        sheets += [sheet for sheet in workbook.worksheets if sheet.title != SHEET_NAME]
+        for sheet in sheets:
+            rows = sheet.iter_rows()
+            for _ in range(HEADER_SEARCH_ROWS):
+                header = next(rows, None)
+                if header is None:
+                    break
+                columns = self._columns(header)
+                if columns is not None:
+                    return self._read_rows(rows, columns, progress)
+        raise ValueError('No milestone table found: expected a heading row with Milestone and '
+                         'Milstn Date (or Baseline Finish) columns')
+
+    def _columns(self, header):
+        """Column index of each recognised field, None unless this is the heading row"""
+        columns = {}
+        for index, cell in enumerate(header):
+            if isinstance(cell.value, str):
+                field = HEADINGS.get(cell.value.strip().lower())
+                if field and field not in columns:
+                    columns[field] = index
+        if 'name' in columns and 'baseline_finish' in columns:
+            return columns
+        return None
+
+    def _read_rows(self, rows, columns, progress):
+        """Milestone records of the rows below the heading row"""
+        milestones = []
+        for row in rows:
+            self.rows_scanned += 1
+            if progress and self.rows_scanned % 1000 == 0:
+                progress(self.rows_scanned, None)
+
+            values = {field: row[index].value if index < len(row) else None for field, index in columns.items()}
+            if all(value is None or value in UNITS for value in values.values()):
+                continue
+
+            fields = {'name': str(values['name']) if values['name'] is not None else ''}
+            try:
+                fields['id'] = int(values['id']) if values.get('id') not in (None, '') else self.rows_scanned
+            except (TypeError, ValueError):
+                fields['id'] = values['id']
+            if 'wbs' in values:
+                fields['wbs'] = '' if values['wbs'] is None else str(values['wbs'])
+            if 'notes' in values:
+                fields['notes'] = '' if values['notes'] is None else str(values['notes'])
+            if 'percent_complete' in values:
+                cell = row[columns['percent_complete']] if columns['percent_complete'] < len(row) else None
+                fields['percent_complete'] = _cell_percent(values['percent_complete'],
+                                                           getattr(cell, 'number_format', None))
+            for field in ('start_date', 'finish_date', 'baseline_start', 'baseline_finish',
+                          'actual_start', 'actual_finish'):
+                if field in values:
+                    fields[field] = _cell_date(values[field])
+
+            # Milestones are points in time: default the planned dates to the baseline
+            fields.setdefault('finish_date', fields.get('actual_finish') or fields['baseline_finish'])
+            fields.setdefault('start_date', fields['finish_date'])
+            milestones.append(Milestone(**fields))
+        return milestones
+
+    def _file_stem(self):
+        """File name without extension, if the source is a path"""
+        name = self.source if isinstance(self.source, str) else getattr(self.source, 'filename', None)
+        return os.path.splitext(os.path.basename(name))[0] if isinstance(name, str) else None
+
+    def extract_milestones(self, progress=None):
+        """Extract milestone records from the workbook"""
+        if self.milestones is None:
+            self.read(progress)
+        return self.milestones
+
+    def extract_schedule_tasks(self, baseline=True):
+        """The workbook has no work tasks or links; ES falls back to percent complete, milestones stand alone"""
+        return []
+
+    def get_project_name(self):
+        """Get the project name from the workbook properties or file name"""
+        if self.milestones is None:
+            self.read()
+        return self.project_name
+
+    def get_baseline_version(self):
+        """No time-phased baseline is read from workbooks"""
+        return None
+
+    def get_calendar(self):
+        """Workbooks carry no project calendar; durations stay in calendar days"""
+        return None
@@ -0,0 +1,366 @@
+import datetime
+import random
+from collections import Counter
+
+
+class CallCounter:
+    """Counts simulated COM round trips, per member and in total"""
+
+    def __init__(self):
+        """Initialize an empty counter"""
+        self.calls = Counter()
+
+    def record(self, member):
+        """Record one round trip to a COM member"""
+        self.calls[member] += 1
+
+    @property
+    def total(self):
+        """Total number of round trips recorded"""
+        return sum(self.calls.values())
+
+    def reset(self):
+        """Forget all recorded calls"""
+        self.calls.clear()
+
+
+class FakeCOMObject:
+    """In-process stand-in for a COM dispatch object
+
+    Every property read or method lookup that would cross the process
+    boundary on a real COM object is recorded in the shared CallCounter.
+    Properties are given as keyword arguments; unknown members raise
+    AttributeError like a dynamic dispatch object does.
+    """
+
+    _kind = 'Object'
+
+    def __init__(self, counter, **properties):
+        """Initialize the object with a counter and its COM properties"""
+        self.__dict__['_counter'] = counter
+        self.__dict__['_properties'] = properties
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        self._counter.record(f'{self._kind}.{name}')
+        try:
+            return self._properties[name]
+        except KeyError:
+            raise AttributeError(f'{self._kind}.{name}')
+
+    def __setattr__(self, name, value):
+        self._counter.record(f'{self._kind}.{name}=')
+        self._properties[name] = value
+
+
+class FakeTask(FakeCOMObject):
+    """Fake MS Project Task"""
+
+    _kind = 'Task'
+
+
+class FakeTasks(FakeCOMObject):
+    """Fake MS Project Tasks collection (1-based, may contain None rows)"""
+
+    _kind = 'Tasks'
+
+    def __init__(self, counter, tasks):
+        """Initialize the collection from a list of FakeTask (or None) rows"""
+        super().__init__(counter, Count=len(tasks))
+        self.__dict__['_tasks'] = list(tasks)
+
+    def __call__(self, index):
+        self._counter.record('Tasks.Item')
+        return self._tasks[index - 1]
+
+    def __iter__(self):
+        for task in self._tasks:
+            self._counter.record('Tasks.Next')
+            yield task
+
+    def __len__(self):
+        return len(self._tasks)
+
+
+class FakeCalendarItem(FakeCOMObject):
+    """Fake WeekDay, Exception or Shift of a project calendar"""
+
+    _kind = 'CalendarItem'
+
+
+class FakeExceptions(FakeCOMObject):
+    """Fake Calendar.Exceptions collection (1-based)"""
+
+    _kind = 'Exceptions'
+
+    def __init__(self, counter, exceptions):
+        """Initialize the collection from a list of FakeCalendarItem"""
+        super().__init__(counter, Count=len(exceptions))
+        self.__dict__['_exceptions'] = list(exceptions)
+
+    def __call__(self, index):
+        self._counter.record('Exceptions.Item')
+        return self._exceptions[index - 1]
+
+
+class FakeCalendar(FakeCOMObject):
+    """Fake project Calendar with working weekdays and non-working daily exceptions"""
+
+    _kind = 'Calendar'
+
+    def __init__(self, counter, name='Standard', working_weekdays=(True,) * 5 + (False,) * 2, holidays=()):
+        """Initialize the calendar; working_weekdays run Monday..Sunday, holidays are dates"""
+        # PjWeekday 1 is Sunday
+        weekdays = {(day + 1) % 7 + 1: FakeCalendarItem(counter, Working=working)
+                    for day, working in enumerate(working_weekdays)}
+        exceptions = [
+            FakeCalendarItem(
+                counter,
+                Start=datetime.datetime.combine(holiday, datetime.time()),
+                Finish=datetime.datetime.combine(holiday, datetime.time(23, 59)),
+                Type=1,
+                Shift1=FakeCalendarItem(counter, Start='NA')
+            )
+            for holiday in holidays
+        ]
+        super().__init__(
+            counter,
+            Name=name,
+            WeekDays=lambda index: weekdays[index],
+            Exceptions=FakeExceptions(counter, exceptions)
+        )
+
+
+class FakeProject(FakeCOMObject):
+    """Fake MS Project Project with a Tasks collection and a calendar"""
+
+    _kind = 'Project'
+
+    def __init__(self, counter, name, tasks, baseline_saved=None, full_name=None, calendar=None):
+        """Initialize the project with its task rows"""
+        super().__init__(
+            counter,
+            Name=name,
+            FullName=full_name or f'C:\\Projects\\{name}.mpp',
+            Tasks=FakeTasks(counter, tasks),
+            Calendar=calendar or FakeCalendar(counter),
+            CurrentFilter='All Tasks',
+            BaselineSavedDate=lambda number=0: baseline_saved or 'NA'
+        )
+
+
+class FakeProjects(FakeCOMObject):
+    """Fake Application.Projects collection"""
+
+    _kind = 'Projects'
+
+    def __init__(self, counter, projects):
+        """Initialize the collection from a list of FakeProject"""
+        super().__init__(counter, Count=len(projects))
+        self.__dict__['_projects'] = list(projects)
+
+    def __call__(self, index):
+        self._counter.record('Projects.Item')
+        if isinstance(index, str):
+            for project in self._projects:
+                if project._properties['Name'] == index:
+                    return project
+            raise KeyError(index)
+        return self._projects[index - 1]
+
+
+class FakeSelection(FakeCOMObject):
+    """Fake Application.ActiveSelection"""
+
+    _kind = 'Selection'
+
+
+class FakeApplication(FakeCOMObject):
+    """Fake MSProject.Application supporting task filters and selection
+
+    Filters defined with FilterEdit are evaluated in process so COMTaskSource's
+    'filter' strategy can be exercised; 'equals' and 'contains' tests joined
+    by 'Or'/'And' are supported.
+    """
+
+    _kind = 'Application'
+
+    def __init__(self, counter, projects, version='16.0'):
+        """Initialize the application with its open projects"""
+        super().__init__(
+            counter,
+            Visible=True,
+            Version=version,
+            Projects=FakeProjects(counter, projects),
+            ActiveProject=projects[0] if projects else None,
+            FilterEdit=self._filter_edit,
+            FilterApply=self._filter_apply,
+            SelectAll=self._select_all,
+            ActiveSelection=None
+        )
+        self.__dict__['_filters'] = {}
+        self.__dict__['_applied_filter'] = 'All Tasks'
+
+    def _filter_edit(self, Name, TaskFilter=True, Create=False, OverwriteExisting=False, FieldName=None,
+                     NewFieldName=None, Test=None, Value=None, Operation=None, ShowInMenu=True,
+                     ShowSummaryTasks=False, **kwargs):
+        if Create:
+            self._filters[Name] = {'criteria': [], 'show_summary': ShowSummaryTasks}
+        self._filters[Name]['criteria'].append((FieldName or NewFieldName, Test, Value, Operation or 'And'))
+
+    def _filter_apply(self, Name):
+        if Name != 'All Tasks' and Name not in self._filters:
+            raise ValueError(f'Unknown filter: {Name}')
+        self.__dict__['_applied_filter'] = Name
+        project = self._properties['ActiveProject']
+        if project is not None:
+            project._properties['CurrentFilter'] = Name
+
+    def _select_all(self):
+        project = self._properties['ActiveProject']
+        rows = [t for t in project._properties['Tasks']._tasks if t is not None]
+        if self._applied_filter != 'All Tasks':
+            rows = [t for t in rows if self._matches(t, self._filters[self._applied_filter])]
+        self._properties['ActiveSelection'] = FakeSelection(self._counter, Tasks=FakeTasks(self._counter, rows))
+
+    def _matches(self, task, definition):
+        fields = task._properties
+        if fields.get('Summary') and not definition['show_summary']:
+            return False
+        result = None
+        for field, test, value, operation in definition['criteria']:
+            actual = fields.get(field)
+            if test == 'contains':
+                hit = str(value).lower() in str(actual or '').lower()
+            elif isinstance(actual, bool):
+                hit = actual == (value == 'Yes')
+            else:
+                hit = str(actual) == str(value)
+            if result is None:
+                result = hit
+            elif operation == 'Or':
+                result = result or hit
+            else:
+                result = result and hit
+        return bool(result)
+
+
+def make_fake_task(counter, unique_id, name, milestone=False, summary=False, duration=480,
+                   percent_complete=0, wbs='', start=None, finish=None, baseline_start=None,
+                   baseline_finish=None, actual_start=None, actual_finish=None, notes='', predecessors='',
+                   **extra):
+    """Create a FakeTask with the fields MSProjectIntegration reads
+
+    Missing dates are reported as 'NA', which is what Project returns.
+    ``predecessors`` is the UniqueIDPredecessors text, e.g. '3,5SS+2d'.
+    """
+    return FakeTask(
+        counter,
+        UniqueID=unique_id,
+        ID=unique_id,
+        Name=name,
+        Milestone=milestone,
+        Summary=summary,
+        Duration=duration,
+        PercentComplete=percent_complete,
+        WBS=wbs,
+        Start=start or 'NA',
+        Finish=finish or 'NA',
+        BaselineStart=baseline_start or 'NA',
+        BaselineFinish=baseline_finish or 'NA',
+        ActualStart=actual_start or 'NA',
+        ActualFinish=actual_finish or 'NA',
+        Notes=notes,
+        UniqueIDPredecessors=predecessors,
+        **extra
+    )
+
+
+def make_fake_session(task_count=1000, seed=0, **options):
+    """COMSessionManager attached to a FakeApplication instead of MS Project
+
+    Used by the 'fake' backend so the whole app runs without MS Project or
+    pywin32. Options are passed to make_fake_application; the call counter
+    is available as session.call_counter.
+    """
+    from com_session import COMSessionManager
+
+    app, counter = make_fake_application(task_count, seed=seed, **options)
+    session = COMSessionManager(
+        get_active_object=lambda progid: app,
+        dispatch=lambda progid: app,
+        co_initialize=lambda: None,
+        co_uninitialize=lambda: None,
+        launch_delay=0
+    )
+    session.call_counter = counter
+    return session
+
+
+def make_fake_application(task_count=1000, milestone_ratio=0.05, blank_ratio=0.005, seed=0,
+                          project_name='Fake Project', counter=None):
+    """Build a FakeApplication with one synthetic project
+
+    Roughly ``milestone_ratio`` of the tasks are milestones (by flag, zero
+    duration or name), one in fifty rows is a summary task and about
+    ``blank_ratio`` of the rows are blank, as in real task sheets. Returns
+    (application, counter).
+    """
+    counter = counter or CallCounter()
+    rng = random.Random(seed)
+    origin = datetime.datetime(2024, 1, 1, 8, 0, 0)
+    tasks = []
+    for i in range(1, task_count + 1):
+        if rng.random() < blank_ratio:
+            tasks.append(None)
+            continue
+
+        baseline_start = origin + datetime.timedelta(days=rng.randint(0, 600))
+        baseline_finish = baseline_start + datetime.timedelta(days=rng.randint(0, 60))
+        slip = datetime.timedelta(days=rng.randint(-10, 40))
+        percent_complete = rng.choice([0, 0, 25, 50, 100])
+        kind = rng.random()
+        is_milestone = kind < milestone_ratio
+        summary = not is_milestone and i % 50 == 0
+        name = f'Task {i}'
+        duration = 480 * max((baseline_finish - baseline_start).days, 1)
+        milestone_flag = False
+        if is_milestone:
+            baseline_finish = baseline_start
+            style = rng.random()
+            if style < 0.6:
+                milestone_flag, duration = True, 0
+            elif style < 0.8:
+                duration = 0
+            else:
+                name = f'Milestone {i}'
+
+        predecessors = [str(i - 1)] if i % 100 != 1 else []
+        if is_milestone and i > 100:
+            predecessors.append(f'{i - 100}FS+2d')
+
+        tasks.append(make_fake_task(
+            counter, i, name,
+            milestone=milestone_flag,
+            summary=summary,
+            duration=duration,
+            percent_complete=percent_complete,
+            wbs=f'1.{i // 100 + 1}.{i % 100 + 1}',
+            start=baseline_start + slip,
+            finish=baseline_finish + slip,
+            baseline_start=baseline_start,
+            baseline_finish=baseline_finish,
+            actual_start=baseline_start + slip if percent_complete > 0 else None,
+            actual_finish=baseline_finish + slip if percent_complete == 100 else None,
+            predecessors=','.join(predecessors),
+            BaselineCost=float(rng.randint(1, 50) * 1000),
+            BaselineWork=float(duration)
+        ))
+
+    holidays = [datetime.date(year, month, day) for year in (2024, 2025, 2026) for month, day in ((1, 1), (12, 25))]
+    project = FakeProject(counter, project_name, tasks, baseline_saved=origin,
+                          calendar=FakeCalendar(counter, holidays=holidays))
+    app = FakeApplication(counter, [project])
+    counter.reset()
+    return app, counter
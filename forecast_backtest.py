@@ -0,0 +1,259 @@
+import logging
+from datetime import timedelta
+
+import numpy as np
+
+from earned_schedule import US_PER_DAY
+from instrumentation import metrics
+
+DEFAULT_STEP_DAYS = 7
+
+# Largest number of status dates per request (ten years of weekly dates)
+MAX_STATUS_DATES = 520
+
+# Matrices a sweep can return
+SWEEP_METRICS = ('sv_t', 'spi_t', 'tspi', 'forecast_finish')
+
+# Decimals of the rounded metrics, as in the scalar path
+METRIC_DECIMALS = {'sv_t': 1, 'spi_t': 2, 'tspi': 2}
+
+# Forecasts count as accurate within this many days of the actual finish
+DEFAULT_TOLERANCE_DAYS = 7
+
+# Forecast horizons (days from the status date to the actual finish) scored separately
+HORIZON_BUCKETS = ((0, 30), (31, 90), (91, 180), (181, None))
+
+BACKTEST_SOURCES = ('sweep', 'snapshots')
+
+
+def status_date_range(start, end, step_days=DEFAULT_STEP_DAYS):
+    """Status dates from start to end (inclusive) every step_days; raises ValueError for invalid ranges"""
+    if step_days < 1:
+        raise ValueError('step_days must be at least 1')
+    if end < start:
+        raise ValueError('The end of the status date range is before its start')
+    count = (end - start).days // step_days + 1
+    if count > MAX_STATUS_DATES:
+        raise ValueError(f'At most {MAX_STATUS_DATES} status dates can be evaluated at once, got {count}')
+    return [start + timedelta(days=step_days * i) for i in range(count)]
+
+
+class ForecastBacktester:
+    """ES metrics over a range of status dates, and how well past forecasts held up
+
+    A sweep evaluates every milestone as of every status date with the
+    calculator's batch engine, as (status dates x milestones) matrices in
+    one vectorized pass per block of dates. A backtest compares forecast
+    finish dates with the actual finishes that followed: for each status
+    date, only milestones still open then and finished since are scored.
+    Forecasts are either recomputed by a sweep, from the progress recorded
+    as of each status date, or read from the snapshot history, and are
+    scored against the naive forecast that the baseline
+    finish holds (skill = 1 - MAE / baseline MAE).
+    """
+
+    def __init__(self, calculator):
+        """Initialize the backtester with an EarnedScheduleCalculator"""
+        self.calculator = calculator
+        self.logger = logging.getLogger('ForecastBacktester')
+
+    def prepare(self, milestones, status_dates, calendar=None, current_date=None, progress_history=()):
+        """Input columns of a sweep or backtest, independent of the milestone records
+
+        The milestones' percent complete is the progress as of
+        ``current_date`` (their status date); ``progress_history`` holds the
+        (status_date, uid, percent_complete) rows recorded before it
+        (SnapshotStore.progress_history). Earlier status dates only see that
+        recorded progress.
+        """
+        if not status_dates:
+            raise ValueError('At least one status date is needed')
+        if len(status_dates) > MAX_STATUS_DATES:
+            raise ValueError(f'At most {MAX_STATUS_DATES} status dates can be evaluated at once')
+        baseline_start, baseline_finish, actual_finish, percent_complete, usable = \
+            self.calculator.milestone_columns(milestones)
+        ids = [m.get('id') for m in milestones]
+        recorded_dates, recorded_progress = self._progress_matrix(ids, percent_complete, current_date,
+                                                                  progress_history)
+        return {
+            'ids': ids,
+            'names': [m.get('name') for m in milestones],
+            'status_dates': np.array(sorted(status_dates), dtype='datetime64[us]'),
+            # Rows the batch engine cannot read are left out like milestones without a baseline
+            'baseline_start': baseline_start,
+            'baseline_finish': np.where(usable, baseline_finish, np.datetime64('NaT')),
+            'actual_finish': actual_finish,
+            'percent_complete': percent_complete,
+            'recorded_dates': recorded_dates,
+            'recorded_progress': recorded_progress,
+            'calendar': calendar
+        }
+
+    def sweep(self, job, fields=None):
+        """Metric matrices (one row per status date) and per-date totals of a prepared job"""
+        fields = list(fields or SWEEP_METRICS)
+        unknown = [field for field in fields if field not in SWEEP_METRICS]
+        if unknown:
+            raise ValueError(f"Unknown metrics: {', '.join(unknown)}. Use {', '.join(SWEEP_METRICS)}")
+
+        results = self._run(job)
+        payload = {
+            'status_dates': job['status_dates'].astype(object).tolist(),
+            'milestones': [{'id': uid, 'name': name} for uid, name in zip(job['ids'], job['names'])]
+        }
+        for field in fields:
+            if field == 'forecast_finish':
+                payload[field] = self._date_rows(results[field])
+            else:
+                payload[field] = self._float_rows(results[field], METRIC_DECIMALS[field])
+        payload['summary'] = self._summary(results)
+        return payload
+
+    def backtest(self, job, tolerance_days=DEFAULT_TOLERANCE_DAYS, history=None):
+        """Forecast errors against actual finishes, per status date, overall and by horizon
+
+        ``history`` holds saved (status_date, uid, forecast_finish) rows
+        (SnapshotStore.forecast_history); without it the forecasts are
+        recomputed by a sweep over the job's status dates. Errors are
+        forecast minus actual finish in days, so a positive bias means
+        forecasts were late.
+        """
+        if not tolerance_days >= 0:
+            raise ValueError('tolerance_days must not be negative')
+        if history is None:
+            status_dates = job['status_dates']
+            forecasts = self._run(job)['forecast_finish']
+            source = 'sweep'
+        else:
+            status_dates, forecasts = self._history_matrix(job, history)
+            source = 'snapshots'
+
+        with metrics.span('backtest.score'):
+            today = status_dates[:, None]
+            actual = job['actual_finish']
+            scored = (actual > today) & ~np.isnat(forecasts) & ~np.isnat(job['baseline_finish'])
+            errors = self._days(forecasts - actual)
+            naive_errors = self._days(job['baseline_finish'] - actual)
+            horizon = self._days(actual - today)
+
+            by_horizon = []
+            for low, high in HORIZON_BUCKETS:
+                bucket = scored & (horizon >= low) & (horizon < (high + 1 if high is not None else np.inf))
+                by_horizon.append(dict(
+                    {'horizon_days': f'{low}-{high}' if high is not None else f'{low}+'},
+                    **self._stats(errors, naive_errors, bucket, tolerance_days)[0]
+                ))
+            per_date = self._stats(errors, naive_errors, scored, tolerance_days, axis=1)
+
+        self.logger.info(f"Scored {int(scored.sum())} forecasts over {len(status_dates)} status dates ({source})")
+        return {
+            'source': source,
+            'tolerance_days': tolerance_days,
+            'overall': self._stats(errors, naive_errors, scored, tolerance_days)[0],
+            'by_horizon': by_horizon,
+            'by_status_date': [
+                dict({'status_date': status_date}, **stats)
+                for status_date, stats in zip(status_dates.astype(object).tolist(), per_date)
+            ]
+        }
+
+    def _run(self, job):
+        """Sweep a prepared job through the batch engine"""
+        metrics.count('milestones_processed_total', len(job['ids']) * len(job['status_dates']), stage='sweep')
+        with metrics.span('sweep.batch'):
+            return self.calculator.calculate_metrics_sweep(
+                job['baseline_start'], job['baseline_finish'], job['actual_finish'], job['percent_complete'],
+                job['status_dates'], calendar=job['calendar'], recorded_dates=job['recorded_dates'],
+                recorded_progress=job['recorded_progress']
+            )
+
+    def _progress_matrix(self, ids, percent_complete, current_date, progress_history):
+        """Sorted dates and (dates x milestones) percent complete known as of each, NaN where never recorded
+
+        Recorded rows on or after current_date are replaced by the current
+        percent complete. Each milestone's last recorded value carries
+        forward to later dates.
+        """
+        current = np.datetime64(current_date, 'us') if current_date is not None else None
+        columns = {uid: i for i, uid in enumerate(ids)}
+        rows = [(np.datetime64(status_date, 'us'), columns[uid], value)
+                for status_date, uid, value in progress_history if uid in columns and value is not None]
+        if current is not None:
+            rows = [row for row in rows if row[0] < current]
+        if not rows and current is None:
+            return None, None
+        dates = np.array([row[0] for row in rows] + ([current] if current is not None else []),
+                         dtype='datetime64[us]')
+        recorded_dates, date_index = np.unique(dates, return_inverse=True)
+        matrix = np.full((len(recorded_dates), len(ids)), np.nan)
+        if rows:
+            matrix[date_index[:len(rows)], [row[1] for row in rows]] = [row[2] for row in rows]
+        if current is not None:
+            matrix[-1] = percent_complete
+        # Carry each milestone's last recorded value forward
+        present = np.where(np.isnan(matrix), 0, np.arange(len(recorded_dates))[:, None])
+        np.maximum.accumulate(present, axis=0, out=present)
+        return recorded_dates, matrix[present, np.arange(len(ids))]
+
+    def _history_matrix(self, job, history):
+        """Status dates and (dates x milestones) forecast matrix of saved snapshot rows"""
+        columns = {uid: i for i, uid in enumerate(job['ids'])}
+        rows = [(status_date, columns[uid], forecast) for status_date, uid, forecast in history if uid in columns]
+        if not rows:
+            raise ValueError('No saved forecasts of these milestones in the snapshot history')
+        dates, milestone_index, forecasts = zip(*rows)
+        status_dates, date_index = np.unique(np.array(dates, dtype='datetime64[us]'), return_inverse=True)
+        matrix = np.full((len(status_dates), len(job['ids'])), np.datetime64('NaT'), dtype='datetime64[us]')
+        matrix[date_index, np.array(milestone_index)] = np.array(forecasts, dtype='datetime64[us]')
+        return status_dates, matrix
+
+    def _days(self, delta):
+        """timedelta64[us] array as float days (NaN for NaT)"""
+        return np.where(np.isnat(delta), np.nan, delta.astype('int64') / US_PER_DAY)
+
+    def _stats(self, errors, naive_errors, scored, tolerance_days, axis=None):
+        """Error statistics of the scored cells, as a list of dicts (one per row with axis=1)"""
+        count = scored.sum(axis=axis)
+        errors = np.where(scored, errors, 0.0)
+        absolute = np.abs(errors)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            bias = errors.sum(axis=axis) / count
+            mae = absolute.sum(axis=axis) / count
+            rmse = np.sqrt((errors ** 2).sum(axis=axis) / count)
+            within = (scored & (absolute <= tolerance_days)).sum(axis=axis) / count
+            naive_mae = np.where(scored, np.abs(naive_errors), 0.0).sum(axis=axis) / count
+            skill = 1 - mae / naive_mae
+
+        stats = []
+        for values in zip(*(np.atleast_1d(column).tolist()
+                            for column in (count, bias, mae, rmse, within, naive_mae, skill))):
+            count_value, *measures = values
+            measures = [round(v, 2) if count_value and np.isfinite(v) else None for v in measures]
+            stats.append(dict(zip(('count', 'bias_days', 'mae_days', 'rmse_days', 'within_tolerance',
+                                   'baseline_mae_days', 'skill'), [count_value] + measures)))
+        return stats
+
+    def _summary(self, results):
+        """Per status date totals and average SV(t)/SPI(t)"""
+        summary = {name: results[name].tolist()
+                   for name in ('complete', 'behind_schedule', 'high_risk', 'unknown_progress')}
+        for name in ('sv_t', 'spi_t'):
+            values = results[name]
+            present = ~np.isnan(values)
+            count = present.sum(axis=1)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                average = np.where(present, values, 0.0).sum(axis=1) / count
+            summary[f'avg_{name}'] = [round(v, 2) if n else None for v, n in zip(average.tolist(), count.tolist())]
+        return summary
+
+    def _float_rows(self, matrix, decimals):
+        """Rounded matrix as nested lists, None for NaN"""
+        values = np.round(matrix, decimals).astype(object)
+        values[np.isnan(matrix)] = None
+        return values.tolist()
+
+    def _date_rows(self, matrix):
+        """datetime64 matrix as nested lists of date strings, None for NaT"""
+        strings = self.calculator._format_datetime64(matrix.ravel())
+        width = matrix.shape[1]
+        return [strings[i:i + width] for i in range(0, len(strings), width)]
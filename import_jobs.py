@@ -0,0 +1,242 @@
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from datetime import datetime
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+# Seconds between saves of a running job's progress to the shared store
+PROGRESS_SAVE_INTERVAL = 1.0
+
+
+class ImportJob:
+    """One background import: its state, progress and result"""
+
+    def __init__(self, key, func, description=''):
+        """Initialize a queued job that will call func(progress)"""
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.func = func
+        self.description = description
+        self.status = QUEUED
+        self.scanned = 0
+        self.total = None
+        self.result = None
+        self.error = None
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self.done = threading.Event()
+
+    @property
+    def active(self):
+        """Whether the job is still queued or running"""
+        return self.status in (QUEUED, RUNNING)
+
+    def report_progress(self, scanned, total=None):
+        """Progress callback handed to the import: tasks scanned so far and total (if known)"""
+        self.scanned = scanned
+        self.total = total
+
+    def to_dict(self):
+        """Job state for the status endpoint"""
+        return {
+            'id': self.id,
+            'description': self.description,
+            'status': self.status,
+            'progress': {'scanned': self.scanned, 'total': self.total},
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+
+
+class ImportJobManager:
+    """Runs imports and other COM work on one long-lived worker thread
+
+    COM objects from MS Project live in the apartment of the thread that
+    created them, and Project serves one caller at a time anyway, so all COM
+    work is queued to a single worker thread that initializes COM once
+    (``initializer``) and keeps it for its lifetime. HTTP threads only
+    enqueue work and poll the job. Submitting an import for a key (e.g. a
+    project and the import options) that already has a queued or running
+    job returns that job instead of starting a second one.
+
+    With a SharedStateStore (``store``), every job's state is saved there as
+    it changes (progress at most every PROGRESS_SAVE_INTERVAL seconds), so
+    the other worker processes of a deployment can report it too. Jobs are
+    still run, and coalesced, by the worker that accepted them.
+    """
+
+    def __init__(self, initializer=None, finalizer=None, max_finished=100, store=None):
+        """Initialize the manager; the worker thread starts with the first job"""
+        self.initializer = initializer
+        self.finalizer = finalizer
+        self.max_finished = max_finished
+        self.store = store
+        self.jobs = OrderedDict()
+        self._active = {}
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self.logger = logging.getLogger('ImportJobManager')
+
+    def submit(self, key, func, description=''):
+        """Queue func(progress) as a job, or join the active job for the same key
+
+        Returns (job, created).
+        """
+        with self._lock:
+            job = self._active.get(key)
+            if job is not None and job.active:
+                self.logger.info(f"Coalesced import of {key} into job {job.id}")
+                return job, False
+
+            job = ImportJob(key, func, description)
+            self.jobs[job.id] = job
+            self._active[key] = job
+            self._prune()
+            self._ensure_worker()
+        self._save(job)
+        self._queue.put(job)
+        self.logger.info(f"Queued job {job.id} for {key}")
+        return job, True
+
+    def get(self, job_id):
+        """Job by id, None if unknown or pruned"""
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def list_jobs(self):
+        """All retained jobs, oldest first"""
+        with self._lock:
+            return list(self.jobs.values())
+
+    def job_state(self, job_id):
+        """State of a job of this process or, with a store, of any worker; None if unknown"""
+        job = self.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        return self.store.load_job(job_id) if self.store is not None else None
+
+    def job_states(self):
+        """States of all retained jobs (of every worker, with a store), oldest first"""
+        if self.store is None:
+            return [job.to_dict() for job in self.list_jobs()]
+        local = {job.id: job.to_dict() for job in self.list_jobs()}
+        states = [local.pop(state['id'], state) for state in self.store.list_jobs()]
+        return sorted(states + list(local.values()), key=lambda state: state['created_at'])
+
+    def call(self, func, timeout=None):
+        """Run func() on the worker thread and wait for its result
+
+        For short COM calls (e.g. connection status) that must not race
+        with running imports. If the result does not arrive within timeout,
+        the call is cancelled (it is skipped if the worker has not started
+        it yet) and the TimeoutError is raised.
+        """
+        future = Future()
+
+        def run():
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(func())
+                except Exception as e:
+                    future.set_exception(e)
+
+        with self._lock:
+            self._ensure_worker()
+        self._queue.put(run)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+
+    def shutdown(self, wait=True):
+        """Stop the worker after the queued work is done"""
+        with self._lock:
+            worker = self._worker
+            self._worker = None
+        if worker is not None:
+            self._queue.put(None)
+            if wait:
+                worker.join()
+
+    def _ensure_worker(self):
+        """Start the worker thread if it is not running (lock held)"""
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name='com-worker', daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        """Worker loop: run queued jobs and calls one at a time"""
+        if self.initializer:
+            self.initializer()
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                if isinstance(item, ImportJob):
+                    self._run_job(item)
+                else:
+                    item()
+        finally:
+            if self.finalizer:
+                self.finalizer()
+
+    def _run_job(self, job):
+        """Run one job, recording its result or error"""
+        job.status = RUNNING
+        job.started_at = datetime.now()
+        self._save(job)
+        saved_at = [time.monotonic()]
+
+        def progress(scanned, total=None):
+            job.report_progress(scanned, total)
+            if self.store is not None and time.monotonic() - saved_at[0] >= PROGRESS_SAVE_INTERVAL:
+                saved_at[0] = time.monotonic()
+                self._save(job)
+
+        try:
+            job.result = job.func(progress)
+            job.status = SUCCEEDED
+        except Exception as e:
+            self.logger.error(f"Job {job.id} ({job.key}) failed: {str(e)}")
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished_at = datetime.now()
+            job.func = None
+            with self._lock:
+                if self._active.get(job.key) is job:
+                    del self._active[job.key]
+            self._save(job)
+            job.done.set()
+        self.logger.info(f"Job {job.id} {job.status} in {(job.finished_at - job.started_at).total_seconds():.1f}s")
+
+    def _save(self, job):
+        """Save a job's state to the shared store, if there is one"""
+        if self.store is None:
+            return
+        try:
+            self.store.save_job(job.id, job.created_at, job.to_dict(), self.max_finished)
+        except Exception as e:
+            self.logger.error(f"Could not save job {job.id} to the shared state: {str(e)}")
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond max_finished (lock held)"""
+        finished = [job_id for job_id, job in self.jobs.items() if not job.active]
+        for job_id in finished[:max(len(finished) - self.max_finished, 0)]:
+            del self.jobs[job_id]
@@ -0,0 +1,157 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from functools import wraps
+
+# Prefix of every exported metric name
+METRIC_PREFIX = 'es_forecast_'
+
+# Upper bounds (seconds) of the duration histogram buckets
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Counters: name -> help text
+COUNTERS = {
+    'com_calls_total': 'COM property reads and method calls made to MS Project',
+    'milestones_processed_total': 'Milestones processed, by stage',
+    'date_parse_failures_total': 'Date values that could not be parsed, by source'
+}
+
+# Duration histograms: name -> help text
+HISTOGRAMS = {
+    'stage_duration_seconds': 'Time spent in instrumented stages of imports and calculations',
+    'http_request_duration_seconds': 'Time to handle HTTP requests, by route, method and status'
+}
+
+# Returned by span() when disabled; reusable and free to enter
+_NOOP_SPAN = nullcontext()
+
+
+class _Span:
+    """Times a block and records it in a duration histogram"""
+
+    __slots__ = ('metrics', 'labels', 'started')
+
+    def __init__(self, metrics, labels):
+        self.metrics = metrics
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics._observe('stage_duration_seconds', self.labels, time.perf_counter() - self.started)
+        return False
+
+
+class Metrics:
+    """Process-wide counters and duration histograms in Prometheus text format
+
+    Code on the hot paths calls count() and span(); when the registry is
+    disabled both return immediately (span() hands out one shared no-op
+    context manager), so instrumentation costs one attribute check.
+    """
+
+    def __init__(self, enabled=True, buckets=DEFAULT_BUCKETS):
+        """Initialize an empty registry"""
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget all recorded values"""
+        with self._lock:
+            self._counters = {name: {} for name in COUNTERS}
+            # labels -> [per-bucket counts (+Inf last), sum, count]
+            self._histograms = {name: {} for name in HISTOGRAMS}
+
+    def count(self, name, amount=1, **labels):
+        """Add to a counter"""
+        if not self.enabled:
+            return
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            values = self._counters[name]
+            values[key] = values.get(key, 0) + amount
+
+    def span(self, stage):
+        """Context manager timing a stage into stage_duration_seconds"""
+        if not self.enabled:
+            return _NOOP_SPAN
+        return _Span(self, (('stage', stage),))
+
+    def timed(self, stage):
+        """Decorator timing every call of a function as a stage"""
+        def decorate(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(stage):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def observe(self, name, seconds, **labels):
+        """Record a duration in a histogram"""
+        if not self.enabled:
+            return
+        self._observe(name, tuple(sorted(labels.items())), seconds)
+
+    def value(self, name, **labels):
+        """Current value of a counter (for tests and status endpoints)"""
+        with self._lock:
+            return self._counters[name].get(tuple(sorted(labels.items())), 0)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name, help_text in COUNTERS.items():
+                full_name = METRIC_PREFIX + name
+                lines.append(f'# HELP {full_name} {help_text}')
+                lines.append(f'# TYPE {full_name} counter')
+                for labels, value in sorted(self._counters[name].items()):
+                    lines.append(f'{full_name}{_format_labels(labels)} {value}')
+
+            for name, help_text in HISTOGRAMS.items():
+                full_name = METRIC_PREFIX + name
+                lines.append(f'# HELP {full_name} {help_text}')
+                lines.append(f'# TYPE {full_name} histogram')
+                for labels, (buckets, total, count) in sorted(self._histograms[name].items()):
+                    cumulative = 0
+                    for bound, bucket_count in zip(self.buckets + (None,), buckets):
+                        cumulative += bucket_count
+                        le = '+Inf' if bound is None else repr(bound)
+                        lines.append(f'{full_name}_bucket{_format_labels(labels + (("le", le),))} {cumulative}')
+                    lines.append(f'{full_name}_sum{_format_labels(labels)} {total}')
+                    lines.append(f'{full_name}_count{_format_labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def _observe(self, name, labels, seconds):
+        """Record a duration under already-built labels"""
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            entry = self._histograms[name].get(labels)
+            if entry is None:
+                entry = self._histograms[name][labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += seconds
+            entry[2] += 1
+
+
+def _format_labels(labels):
+    """{name="value",...} for a label tuple, empty without labels"""
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def _escape(value):
+    """Escape a label value for the text format"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Registry shared by the whole process; METRICS_ENABLED=0 turns instrumentation off
+metrics = Metrics(enabled=os.getenv('METRICS_ENABLED', '1').lower() not in ('0', 'false', 'no'))
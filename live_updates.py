@@ -0,0 +1,148 @@
+import json
+import logging
+import queue
+import threading
+import uuid
+from collections import deque
+
+# Comment line sent to keep idle connections (and proxies) open
+HEARTBEAT = ': keep-alive\n\n'
+
+
+class Subscription:
+    """One connected client: its event queue and optional project filter"""
+
+    def __init__(self, project=None, max_queued=1000):
+        """Initialize the subscription"""
+        self.project = project
+        self.queue = queue.Queue(maxsize=max_queued)
+        self.overflowed = False
+
+    def wants(self, project):
+        """Whether an event of the given project is sent to this client"""
+        return self.project is None or project is None or project == self.project
+
+
+class EventBroker:
+    """Fans out versioned change events to Server-Sent Events clients
+
+    Events are encoded once when published and the same text is queued to
+    every subscriber, so the cost of a change does not grow with the number
+    of browsers watching. The last ``history`` events are kept so a client
+    that reconnects with Last-Event-ID gets what it missed; a client that
+    fell further behind (or whose queue overflowed) gets a 'reset' event and
+    reloads the full state.
+
+    Event ids are the broker's stream id and a sequence number, so the id
+    a client saw in another worker process (or before a restart) is not
+    mistaken for one of this stream's: such a client gets a 'reset' too.
+    """
+
+    def __init__(self, encode=json.dumps, history=256, max_queued=1000, heartbeat=15.0):
+        """Initialize the broker with the JSON encoder used for event data"""
+        self.encode = encode
+        self.max_queued = max_queued
+        self.heartbeat = heartbeat
+        self.stream_id = uuid.uuid4().hex[:12]
+        self.last_id = 0
+        self._history = deque(maxlen=history)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger('EventBroker')
+
+    def publish(self, event, data, project=None):
+        """Send an event to all subscribers interested in the project; returns the event id (see event_id)"""
+        payload = self.encode(data)
+        with self._lock:
+            self.last_id += 1
+            message = self._format(self.last_id, event, payload)
+            self._history.append((self.last_id, project, message))
+            subscribers = [s for s in self._subscribers if s.wants(project)]
+            event_id = self.event_id(self.last_id)
+        for subscription in subscribers:
+            self._offer(subscription, message)
+        return event_id
+
+    def event_id(self, sequence):
+        """Id of this stream's event with the given sequence number"""
+        return f'{self.stream_id}-{sequence}'
+
+    def subscribe(self, last_event_id=None, project=None):
+        """Register a client, replaying the events after last_event_id if still available
+
+        A last_event_id that is not one of this stream's, or newer than its
+        last event, gets a 'reset' event.
+        """
+        subscription = Subscription(project, self.max_queued)
+        with self._lock:
+            self._subscribers.add(subscription)
+            sequence = self._sequence(last_event_id)
+            if last_event_id is not None and (sequence is None or sequence > self.last_id):
+                self._offer(subscription, self._format(self.last_id, 'reset', '{}'))
+            elif sequence is not None and sequence < self.last_id:
+                oldest = self._history[0][0] if self._history else self.last_id + 1
+                if sequence + 1 < oldest:
+                    self._offer(subscription, self._format(self.last_id, 'reset', '{}'))
+                else:
+                    for event_id, project_name, message in self._history:
+                        if event_id > sequence and subscription.wants(project_name):
+                            self._offer(subscription, message)
+        self.logger.info(f"Client subscribed ({len(self._subscribers)} connected)")
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Remove a client"""
+        with self._lock:
+            self._subscribers.discard(subscription)
+        self.logger.info(f"Client unsubscribed ({len(self._subscribers)} connected)")
+
+    @property
+    def subscriber_count(self):
+        """Number of connected clients"""
+        with self._lock:
+            return len(self._subscribers)
+
+    def stream(self, subscription):
+        """Generate the text/event-stream body for a subscription until the client leaves"""
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                try:
+                    message = subscription.queue.get(timeout=self.heartbeat)
+                except queue.Empty:
+                    yield HEARTBEAT
+                    continue
+                if subscription.overflowed:
+                    # Queued deltas are incomplete; tell the client to reload instead
+                    subscription.overflowed = False
+                    self._drain(subscription)
+                    message = self._format(self.last_id, 'reset', '{}')
+                yield message
+        finally:
+            self.unsubscribe(subscription)
+
+    def _offer(self, subscription, message):
+        """Queue a message for a subscriber, flagging it if its queue is full"""
+        try:
+            subscription.queue.put_nowait(message)
+        except queue.Full:
+            subscription.overflowed = True
+
+    def _drain(self, subscription):
+        """Discard everything queued for a subscriber"""
+        try:
+            while True:
+                subscription.queue.get_nowait()
+        except queue.Empty:
+            pass
+
+    def _sequence(self, event_id):
+        """Sequence number of one of this stream's event ids, None for any other id"""
+        stream_id, _, sequence = (event_id or '').rpartition('-')
+        if stream_id != self.stream_id or not sequence.isdigit():
+            return None
+        return int(sequence)
+
+    def _format(self, sequence, event, payload):
+        """One SSE message"""
+        return f'id: {self.event_id(sequence)}\nevent: {event}\ndata: {payload}\n\n'
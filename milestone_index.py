@@ -0,0 +1,358 @@
+import base64
+import json
+import logging
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime
+
+from change_tracker import applies_to
+from milestone_record import to_datetime
+
+# Sortable fields -> how their values are turned into sort keys
+RISK_RANK = {'None': 0, 'Low': 1, 'Medium': 2, 'High': 3}
+SORT_FIELDS = ('sv_t', 'spi_t', 'forecast_finish', 'risk')
+
+# Fields with an exact-match filter index
+FILTER_FIELDS = ('risk', 'status')
+
+# Sort key of milestones without a value: after every real value
+MISSING = (1,)
+
+# Default and largest page size
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+# Deepest row a page number may start at; pages are skipped to by walking the
+# matches, so deeper pages are read with cursors
+MAX_PAGE_OFFSET = 10000
+
+# Filter combinations whose matches and totals are kept until the index changes
+MAX_CACHED_FILTERS = 32
+
+
+def _sort_value(field, milestone):
+    """Comparable value of a sort field (None if missing)"""
+    value = milestone.get(field)
+    if value is None:
+        return None
+    if field == 'risk':
+        return RISK_RANK.get(value, -1)
+    if field == 'forecast_finish':
+        return to_datetime(value)
+    return float(value)
+
+
+def _sort_key(value):
+    """Index key: (0, value), or MISSING so missing values sort last"""
+    return MISSING if value is None else (0, value)
+
+
+def encode_cursor(field, descending, key, uid):
+    """Opaque cursor pointing just after (key, uid) in a sort order
+
+    ``field`` None is import order, with the milestone's position as key.
+    """
+    value = None if key == MISSING else key[1]
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([field, descending, value, uid]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(field, descending, key, uid) of a cursor; raises ValueError if malformed
+
+    Every part is checked, so a cursor decodes to a key that compares with
+    the index entries of its sort field.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        field, descending, value, uid = json.loads(raw)
+        if field is not None and field not in SORT_FIELDS:
+            raise ValueError(field)
+        value = _cursor_value(field, value)
+    except Exception:
+        raise ValueError(f'Invalid cursor: {cursor}')
+    if not isinstance(descending, bool) or isinstance(uid, bool) or not isinstance(uid, (int, str)):
+        raise ValueError(f'Invalid cursor: {cursor}')
+    return field, descending, _sort_key(value), uid
+
+
+def _cursor_value(field, value):
+    """Sort value of a decoded cursor, checked against the type of its field's keys"""
+    if isinstance(value, bool):
+        raise ValueError(value)
+    if field is None:
+        # Import order: the position, which every milestone has
+        if not isinstance(value, int) or value < 0:
+            raise ValueError(value)
+        return value
+    if value is None:
+        return None
+    if field == 'forecast_finish':
+        value = datetime.fromisoformat(value)
+        if value.tzinfo is not None:
+            raise ValueError(value)
+        return value
+    if not isinstance(value, int if field == 'risk' else (int, float)):
+        raise ValueError(value)
+    return value
+
+
+class MilestoneIndex:
+    """Sorted and filter indexes over a project's milestones, kept up to date from tracker deltas
+
+    Each sort field has a list of (key, uid) pairs kept in order with
+    bisect (an update moves list entries, O(n) memmoves), so a page is read
+    by seeking to the cursor and walking forward instead of sorting the list
+    per request. Risk and status have hash indexes, and WBS codes a sorted
+    list searched by prefix; a query starts from the smallest matching set.
+
+    A page costs O(log n) plus the entries walked until it is full: the
+    page itself for unfiltered queries, more when filters match few of the
+    entries walked. Name substring matching scans the remaining candidates
+    once per filter combination and index version to count them; the
+    matches and totals are then reused by every page. ``page`` numbers are
+    skipped to by walking, so they are limited to MAX_PAGE_OFFSET rows and
+    deeper pages are read with cursors, which every order supports.
+    """
+
+    def __init__(self):
+        """Initialize empty indexes"""
+        self.logger = logging.getLogger('MilestoneIndex')
+        self.reset()
+
+    def reset(self):
+        """Forget all milestones"""
+        self.records = {}
+        self.order = []
+        self.version = None
+        self._keys = {field: {} for field in SORT_FIELDS}
+        self._sorted = {field: [] for field in SORT_FIELDS}
+        self._values = {field: {} for field in FILTER_FIELDS}
+        self._buckets = {field: {} for field in FILTER_FIELDS}
+        self._wbs = {}
+        self._wbs_sorted = []
+        self._filtered = {}
+        self._positions = None
+        self._positions_of = None
+
+    def sync(self, tracker, delta=None):
+        """Bring the indexes up to date with a MilestoneChangeTracker (see DashboardAggregate.sync)"""
+        if applies_to(delta, self.version, tracker):
+            for milestone in delta['changed']:
+                self.update(milestone.get('id'), milestone)
+            for uid in delta['removed']:
+                self.remove(uid)
+        elif self.version != tracker.version:
+            self.reset()
+            for uid in tracker.order:
+                self._add(uid, tracker.records[uid], list.append)
+            # One sort per index instead of an insort per milestone
+            for entries in self._sorted.values():
+                entries.sort()
+            self._wbs_sorted.sort()
+            self.logger.info(f"Rebuilt milestone index for {len(tracker.order)} milestones")
+        self.order = tracker.order
+        self.version = tracker.version
+
+    def update(self, uid, milestone):
+        """Index a milestone, replacing its previous entries"""
+        if uid in self.records:
+            self.remove(uid)
+        self._add(uid, milestone, insort)
+        self._filtered.clear()
+
+    def _add(self, uid, milestone, place):
+        """Store a milestone's entries, putting sort entries in their lists with place (insort or append)"""
+        self.records[uid] = milestone
+        for field in SORT_FIELDS:
+            key = _sort_key(_sort_value(field, milestone))
+            self._keys[field][uid] = key
+            place(self._sorted[field], (key, uid))
+        for field in FILTER_FIELDS:
+            value = milestone.get(field)
+            self._values[field][uid] = value
+            self._buckets[field].setdefault(value, set()).add(uid)
+        wbs = milestone.get('wbs') or ''
+        self._wbs[uid] = wbs
+        place(self._wbs_sorted, (wbs, uid))
+
+    def remove(self, uid):
+        """Drop a milestone from the indexes"""
+        if self.records.pop(uid, None) is None:
+            return
+        self._filtered.clear()
+        for field in SORT_FIELDS:
+            entry = (self._keys[field].pop(uid), uid)
+            entries = self._sorted[field]
+            del entries[bisect_left(entries, entry)]
+        for field in FILTER_FIELDS:
+            value = self._values[field].pop(uid)
+            bucket = self._buckets[field][value]
+            bucket.discard(uid)
+            if not bucket:
+                del self._buckets[field][value]
+        entry = (self._wbs.pop(uid), uid)
+        del self._wbs_sorted[bisect_left(self._wbs_sorted, entry)]
+
+    def query(self, sort=None, descending=False, cursor=None, page=None, limit=DEFAULT_LIMIT,
+              risk=None, status=None, wbs=None, name=None):
+        """One page of milestones matching the filters, in the requested order
+
+        ``sort`` is one of SORT_FIELDS (default: import order; milestones
+        without a value come last either way). ``risk`` and ``status`` accept
+        a value or a list of values, ``wbs`` is a WBS prefix and ``name`` a
+        case-insensitive substring. Pages are addressed by ``cursor`` (from
+        the previous page's next_cursor) or by 1-based ``page`` number, up
+        to MAX_PAGE_OFFSET rows deep.
+        """
+        if sort is not None and sort not in SORT_FIELDS:
+            raise ValueError(f"Invalid sort field: {sort}. Use one of {', '.join(SORT_FIELDS)}")
+        limit = max(1, min(int(limit or DEFAULT_LIMIT), MAX_LIMIT))
+        after = None
+        if cursor:
+            cursor_field, descending, key, uid = decode_cursor(cursor)
+            if cursor_field != sort:
+                raise ValueError('Cursor does not match the sort field')
+            if self.records and type(uid) is not type(next(iter(self.records))):
+                raise ValueError(f'Invalid cursor: {cursor}')
+            after = (key, uid)
+        offset = (max(int(page), 1) - 1) * limit if page and not cursor else 0
+        if offset > MAX_PAGE_OFFSET:
+            raise ValueError(f'Pages start at most {MAX_PAGE_OFFSET} milestones deep. '
+                             'Use the next_cursor of the previous page instead')
+
+        candidates = self._matching(risk, status, wbs, name.lower() if name else None)
+
+        items = []
+        last = None
+        has_more = False
+        skipped = 0
+        for entry in self._ordered(sort, descending, after, candidates):
+            uid = entry[1]
+            if candidates is not None and uid not in candidates:
+                continue
+            if skipped < offset:
+                skipped += 1
+                continue
+            if len(items) == limit:
+                has_more = True
+                break
+            items.append(self.records[uid])
+            last = entry
+
+        total = len(candidates) if candidates is not None else len(self.records)
+
+        next_cursor = None
+        if has_more:
+            next_cursor = encode_cursor(sort, descending, last[0], last[1])
+        return {
+            'version': self.version,
+            'total': total,
+            'limit': limit,
+            'page': page if page and not cursor else None,
+            'next_cursor': next_cursor,
+            'has_more': has_more,
+            'items': items
+        }
+
+    def _matching(self, risk, status, wbs, needle):
+        """UIDs matching all filters (None if none were given), cached per filters until the index changes"""
+        if risk is None and status is None and not wbs and needle is None:
+            return None
+        cache_key = tuple(
+            frozenset(wanted) if isinstance(wanted, (list, tuple, set)) else wanted
+            for wanted in (risk, status, wbs, needle)
+        )
+        matched = self._filtered.get(cache_key)
+        if matched is None:
+            matched = self._candidates(risk, status, wbs)
+            if needle is not None:
+                pool = matched if matched is not None else self.records
+                matched = {uid for uid in pool if needle in (self.records[uid].get('name') or '').lower()}
+            if len(self._filtered) >= MAX_CACHED_FILTERS:
+                self._filtered.clear()
+            self._filtered[cache_key] = matched
+        return matched
+
+    def _candidates(self, risk, status, wbs):
+        """UIDs allowed by the indexed filters (None if none were given), smallest set first"""
+        sets = []
+        for field, wanted in (('risk', risk), ('status', status)):
+            if wanted is None:
+                continue
+            values = wanted if isinstance(wanted, (list, tuple, set)) else [wanted]
+            matched = set()
+            for value in values:
+                matched |= self._buckets[field].get(value, set())
+            sets.append(matched)
+        if wbs:
+            start = bisect_left(self._wbs_sorted, (wbs,))
+            end = bisect_left(self._wbs_sorted, (wbs + '\uffff',))
+            sets.append({uid for _, uid in self._wbs_sorted[start:end]})
+        if not sets:
+            return None
+        sets.sort(key=len)
+        return set.intersection(*sets)
+
+    def _ordered(self, sort, descending, after, candidates):
+        """Iterate (key, uid) entries in the requested order, starting after a cursor position"""
+        if sort is None:
+            return self._ordered_by_position(descending, after, candidates)
+
+        entries = self._sorted[sort]
+        if candidates is not None and len(candidates) * 8 < len(entries):
+            # Few candidates: sorting them is cheaper than walking the index
+            keys = self._keys[sort]
+            entries = sorted((keys[uid], uid) for uid in candidates)
+
+        split = bisect_left(entries, (MISSING,))
+        if not descending:
+            start = bisect_right(entries, after) if after is not None else 0
+            return (entries[i] for i in range(start, len(entries)))
+
+        # Descending: values high to low, then the missing ones in ascending uid order
+        def walk():
+            if after is None or after[0] != MISSING:
+                start = bisect_left(entries, after, 0, split) - 1 if after is not None else split - 1
+                for i in range(start, -1, -1):
+                    yield entries[i]
+                missing_start = split
+            else:
+                missing_start = bisect_right(entries, after, split)
+            for i in range(missing_start, len(entries)):
+                yield entries[i]
+        return walk()
+
+    def _ordered_by_position(self, descending, after, candidates):
+        """Iterate ((0, position), uid) entries in import order, starting after a cursor position"""
+        order = self.order
+        if candidates is not None and len(candidates) * 8 < len(order) or after is not None:
+            positions = self._order_positions()
+        if candidates is not None and len(candidates) * 8 < len(order):
+            # Few candidates: sorting them by position is cheaper than walking the order
+            entries = sorted(((0, positions[uid]), uid) for uid in candidates)
+            if after is not None:
+                after = ((0, positions.get(after[1], after[0][1])), after[1])
+            if not descending:
+                start = bisect_right(entries, after) if after is not None else 0
+                return (entries[i] for i in range(start, len(entries)))
+            start = bisect_left(entries, after) - 1 if after is not None else len(entries) - 1
+            return (entries[i] for i in range(start, -1, -1))
+
+        if after is None:
+            start = len(order) - 1 if descending else 0
+        elif after[1] in positions:
+            start = positions[after[1]] + (-1 if descending else 1)
+        else:
+            # The cursor's milestone was removed: continue from its old position
+            start = min(after[0][1], len(order)) - 1 if descending else after[0][1]
+        indices = range(start, -1, -1) if descending else range(start, len(order))
+        return (((0, i), order[i]) for i in indices)
+
+    def _order_positions(self):
+        """Position of each UID in import order, rebuilt when the order changes"""
+        if self._positions_of is not self.order:
+            self._positions = {uid: i for i, uid in enumerate(self.order)}
+            self._positions_of = self.order
+        return self._positions
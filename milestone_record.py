@@ -0,0 +1,126 @@
+from datetime import datetime
+
+# Date format used for milestone dates at the JSON boundary
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Fields read from the schedule source
+INPUT_FIELDS = (
+    'id', 'wbs', 'name', 'percent_complete',
+    'start_date', 'finish_date', 'baseline_start', 'baseline_finish',
+    'actual_start', 'actual_finish', 'notes'
+)
+
+# Fields written by EarnedScheduleCalculator, and by dependency propagation (propagated_finish, driving_predecessor)
+RESULT_FIELDS = (
+    'sv_t', 'spi_t', 'tspi', 'forecast_finish', 'status', 'risk', 'error',
+    'propagated_finish', 'driving_predecessor'
+)
+
+# Every field a record can hold
+FIELD_SET = frozenset(INPUT_FIELDS + RESULT_FIELDS)
+
+# Fields holding native datetimes
+DATE_FIELDS = frozenset((
+    'start_date', 'finish_date', 'baseline_start', 'baseline_finish',
+    'actual_start', 'actual_finish', 'forecast_finish', 'propagated_finish'
+))
+
+# (field, holds a date) of every field, in record order
+_FIELD_KINDS = tuple((field, field in DATE_FIELDS) for field in INPUT_FIELDS + RESULT_FIELDS)
+
+# Marks result fields that were never set
+_UNSET = object()
+
+
+def to_datetime(value):
+    """Convert a date string or datetime to a naive datetime (None if not a date)"""
+    if value is None or isinstance(value, datetime):
+        return value
+    if isinstance(value, str) and value[4:5] == '-':
+        # Fast path for the two fixed-width formats, as in EarnedScheduleCalculator._parse_date
+        if value[7:8] == '-' and (len(value) == 10 or (len(value) == 19 and value[10] == ' ')):
+            try:
+                return datetime.fromisoformat(value)
+            except ValueError:
+                pass
+        for fmt in (DATE_FORMAT, '%Y-%m-%d'):
+            try:
+                return datetime.strptime(value, fmt)
+            except ValueError:
+                continue
+    return None
+
+
+def format_date(value):
+    """Format a datetime for JSON, passing other values through"""
+    if isinstance(value, datetime):
+        # isoformat() writes DATE_FORMAT for whole seconds, about three times faster than strftime()
+        return value.isoformat(' ') if not value.microsecond and value.tzinfo is None else value.strftime(DATE_FORMAT)
+    return value
+
+
+class Milestone:
+    """Compact milestone record with native dates and numbers
+
+    Dates are stored once as datetime objects and only turned into strings
+    by to_dict() at the JSON boundary, so calculations never re-parse them.
+    The record supports the dict-style access (get, [], in) the calculator
+    and the rest of the app use; result fields that were never set behave
+    like missing keys, as they do in a plain dict.
+    """
+
+    __slots__ = INPUT_FIELDS + RESULT_FIELDS
+
+    def __init__(self, id=None, wbs='', name='', percent_complete=0, start_date=None, finish_date=None,
+                 baseline_start=None, baseline_finish=None, actual_start=None, actual_finish=None, notes=''):
+        """Initialize the record from source values; dates may be datetimes or strings"""
+        self.id = id
+        self.wbs = wbs
+        self.name = name
+        self.percent_complete = percent_complete
+        self.start_date = to_datetime(start_date)
+        self.finish_date = to_datetime(finish_date)
+        self.baseline_start = to_datetime(baseline_start)
+        self.baseline_finish = to_datetime(baseline_finish)
+        self.actual_start = to_datetime(actual_start)
+        self.actual_finish = to_datetime(actual_finish)
+        self.notes = notes
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a record from a milestone dict (e.g. a JSON payload or backup)"""
+        milestone = cls(**{field: data[field] for field in INPUT_FIELDS if field in data})
+        for field in RESULT_FIELDS:
+            if field in data:
+                milestone[field] = data[field]
+        return milestone
+
+    def to_dict(self):
+        """Milestone as a JSON-ready dict with formatted dates"""
+        data = {}
+        for field, is_date in _FIELD_KINDS:
+            value = getattr(self, field, _UNSET)
+            if value is not _UNSET:
+                data[field] = format_date(value) if is_date else value
+        return data
+
+    def get(self, key, default=None):
+        return getattr(self, key, default) if key in FIELD_SET else default
+
+    def __getitem__(self, key):
+        if key not in FIELD_SET or not hasattr(self, key):
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in FIELD_SET:
+            raise KeyError(key)
+        if key in DATE_FIELDS and not (value is None or isinstance(value, datetime)):
+            value = to_datetime(value)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in FIELD_SET and hasattr(self, key)
+
+    def __repr__(self):
+        return f'Milestone(id={self.id!r}, name={self.name!r})'
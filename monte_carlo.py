@@ -0,0 +1,321 @@
+import logging
+import math
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+import numpy as np
+
+from earned_schedule import MAX_DATETIME64, MAX_FORECAST_DAYS, MIN_DATETIME64, US_PER_DAY
+
+DEFAULT_TRIALS = 10000
+DEFAULT_PERCENTILES = (50, 80, 95)
+
+# Largest number of trials per request
+MAX_TRIALS = 100000
+
+# Samples per chunk (milestones x trials), ~16 MB per float32 matrix
+CHUNK_ELEMENTS = 4000000
+
+# Sampled SPI(t) values are clipped here so IEAC(t) stays finite
+MIN_SPI = 0.05
+
+# SPI(t) observations needed to fit a distribution
+MIN_OBSERVATIONS = 3
+
+# Used when there is neither history nor enough current SPI(t) values
+DEFAULT_SPREAD = 0.1
+DEFAULT_CORRELATION = 0.5
+
+
+class SPIDistribution:
+    """Distribution future SPI(t) values are drawn from
+
+    ``lognormal``: median ``center`` and standard deviation ``spread`` of
+    log SPI(t); ``normal``: mean ``center`` and standard deviation
+    ``spread``. ``correlation`` is the correlation between the draws of
+    any two milestones in a trial, through a factor they all share:
+    performance tends to be project-wide, and independent draws would make
+    the percentiles too narrow.
+    """
+
+    KINDS = ('lognormal', 'normal')
+
+    def __init__(self, kind='lognormal', center=1.0, spread=DEFAULT_SPREAD, correlation=DEFAULT_CORRELATION,
+                 source='default'):
+        """Initialize the distribution; raises ValueError for invalid parameters"""
+        if kind not in self.KINDS:
+            raise ValueError(f"Invalid distribution: {kind}. Use one of {', '.join(self.KINDS)}")
+        if not center > 0:
+            raise ValueError('SPI(t) distribution center must be positive')
+        if not spread >= 0:
+            raise ValueError('SPI(t) distribution spread must not be negative')
+        if not 0 <= correlation <= 1:
+            raise ValueError('Correlation must be between 0 and 1')
+        self.kind = kind
+        self.center = float(center)
+        self.spread = float(spread)
+        self.correlation = float(correlation)
+        self.source = source
+
+    @classmethod
+    def fit(cls, values, kind='lognormal', correlation=DEFAULT_CORRELATION, source='history'):
+        """Fit to observed SPI(t) values; raises ValueError if there are too few"""
+        values = np.array([v for v in values if v is not None and v > 0], dtype=float)
+        if len(values) < MIN_OBSERVATIONS:
+            raise ValueError(f'At least {MIN_OBSERVATIONS} SPI(t) observations are needed, got {len(values)}')
+        if kind == 'lognormal':
+            logs = np.log(values)
+            center, spread = math.exp(logs.mean()), logs.std(ddof=1)
+        else:
+            center, spread = values.mean(), values.std(ddof=1)
+        return cls(kind, center, float(spread), correlation, source)
+
+    @classmethod
+    def from_dict(cls, options):
+        """Configured distribution: {type, median|mean, sigma|std, correlation}"""
+        kind = options.get('type', 'lognormal')
+        center = options.get('median' if kind == 'lognormal' else 'mean', options.get('center', 1.0))
+        spread = options.get('sigma' if kind == 'lognormal' else 'std', options.get('spread', DEFAULT_SPREAD))
+        try:
+            center = float(center)
+            spread = float(spread)
+            correlation = float(options.get('correlation', DEFAULT_CORRELATION))
+        except (TypeError, ValueError):
+            raise ValueError('Distribution parameters must be numbers')
+        return cls(kind, center, spread, correlation, source='configured')
+
+    def sample(self, rng, common, rows):
+        """rows x trials float32 matrix of SPI(t) samples sharing the per-trial factor ``common``
+
+        Each draw loads sqrt(correlation) on the shared factor and
+        sqrt(1 - correlation) on its own, so draws keep unit variance and
+        two milestones' draws correlate by ``correlation``.
+        """
+        z = rng.standard_normal((rows, len(common)), dtype=np.float32)
+        if self.correlation:
+            z *= math.sqrt(1 - self.correlation)
+            z += np.float32(math.sqrt(self.correlation)) * common
+        z *= np.float32(self.spread)
+        if self.kind == 'lognormal':
+            np.exp(z, out=z)
+            z *= np.float32(self.center)
+        else:
+            z += np.float32(self.center)
+        return np.maximum(z, np.float32(MIN_SPI), out=z)
+
+    def to_dict(self):
+        """Parameters for the API response"""
+        return {
+            'type': self.kind,
+            'center': round(self.center, 4),
+            'spread': round(self.spread, 4),
+            'correlation': self.correlation,
+            'source': self.source
+        }
+
+
+def fit_spi_distribution(history=(), current=(), kind='lognormal', correlation=DEFAULT_CORRELATION):
+    """Distribution fitted to SPI(t) history, else to current SPI(t) values, else the default"""
+    for values, source in ((history, 'history'), (current, 'milestones')):
+        try:
+            return SPIDistribution.fit(values, kind, correlation, source)
+        except ValueError:
+            continue
+    return SPIDistribution(kind, correlation=correlation)
+
+
+def simulate_remaining_days(planned_duration, es_days, time_left, distribution, trials, percentiles, seed=None):
+    """Percentiles of the remaining duration of each milestone, and its chance to finish on time
+
+    IEAC(t) = PD / SPI(t) is evaluated for milestones x trials sampled
+    SPI(t) values, a chunk of milestones at a time so memory stays bounded.
+    Returns (len(milestones) x len(percentiles) days, on-time probabilities).
+    Module-level so it can run in a worker process.
+    """
+    rng = np.random.default_rng(seed)
+    count = len(planned_duration)
+    days = np.empty((count, len(percentiles)))
+    on_time = np.empty(count)
+    common = rng.standard_normal(trials, dtype=np.float32)
+    rows = max(1, CHUNK_ELEMENTS // trials)
+    for start in range(0, count, rows):
+        stop = min(start + rows, count)
+        remaining = distribution.sample(rng, common, stop - start)
+        np.divide(planned_duration[start:stop, None].astype(np.float32), remaining, out=remaining)
+        remaining -= es_days[start:stop, None].astype(np.float32)
+        days[start:stop] = np.percentile(remaining, percentiles, axis=1).T
+        on_time[start:stop] = (remaining <= time_left[start:stop, None]).mean(axis=1)
+    return days, on_time
+
+
+def _simulate(job):
+    """Run simulate_remaining_days on a prepared job (ProcessPoolExecutor entry point)"""
+    return simulate_remaining_days(job['planned_duration'], job['es_days'], job['time_left'],
+                                   job['distribution'], job['trials'], job['percentiles'], job['seed'])
+
+
+class MonteCarloForecaster:
+    """Probabilistic milestone finish dates from sampled SPI(t)
+
+    The deterministic forecast divides planned duration by one point
+    SPI(t). Here SPI(t) is drawn from a distribution (fitted to the
+    project's history or configured), the finish date is computed for every
+    milestone and trial as one NumPy matrix operation, and each milestone
+    gets finish dates at the requested confidence levels plus the share of
+    trials finishing by its baseline. Inputs come from the calculator's
+    batch engine, so ES and planned duration match the deterministic path.
+    Several projects are simulated in a process pool, started with the
+    first such request and kept for the later ones.
+    """
+
+    def __init__(self, calculator, trials=DEFAULT_TRIALS, percentiles=DEFAULT_PERCENTILES, max_workers=None):
+        """Initialize the forecaster with an EarnedScheduleCalculator"""
+        self.calculator = calculator
+        self.trials = trials
+        self.percentiles = tuple(percentiles)
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger('MonteCarloForecaster')
+
+    def prepare(self, milestones, distribution, status_date=None, curve=None, earned_value=None,
+                trials=None, percentiles=None, seed=None, calendar=None):
+        """Arrays and parameters of one simulation (picklable, independent of the milestone records)
+
+        With a WorkCalendar, durations are working days and the simulated
+        finish dates are placed on working days.
+        """
+        trials = self.trials if trials is None else int(trials)
+        if not 1 <= trials <= MAX_TRIALS:
+            raise ValueError(f'Trials must be between 1 and {MAX_TRIALS}')
+        percentiles = tuple(percentiles or self.percentiles)
+        if not all(0 < p < 100 for p in percentiles):
+            raise ValueError('Percentiles must be between 0 and 100')
+
+        today = status_date or datetime.now()
+        baseline_start, baseline_finish, actual_finish, percent_complete, usable = \
+            self.calculator.milestone_columns(milestones)
+        results = self.calculator.calculate_metrics_batch(
+            baseline_start, baseline_finish, actual_finish, percent_complete,
+            status_date=today, curve=curve, earned_value=earned_value, calendar=calendar
+        )
+        has_baseline = ~np.isnat(baseline_finish)
+        complete = (results['status'] == 'Complete') & has_baseline
+        simulated = has_baseline & ~complete & results['valid'] & np.array(usable, dtype=bool)
+        today64 = np.datetime64(today, 'us')
+        if calendar is None:
+            time_left = (baseline_finish[simulated] - today64).astype('int64') / US_PER_DAY
+        else:
+            time_left = calendar.working_time(baseline_finish[simulated]) - calendar.working_time(today64)
+        return {
+            'ids': [m.get('id') for m in milestones],
+            'names': [m.get('name') for m in milestones],
+            'today': today64,
+            'baseline_finish': baseline_finish,
+            'actual_finish': np.where(complete, results['forecast_finish'], np.datetime64('NaT')),
+            'simulated': simulated,
+            'planned_duration': results['planned_duration'][simulated],
+            'es_days': results['es_days'][simulated],
+            'time_left': time_left,
+            'distribution': distribution,
+            'trials': trials,
+            'percentiles': percentiles,
+            'seed': seed,
+            'calendar': calendar
+        }
+
+    def forecast(self, milestones, distribution, status_date=None, curve=None, earned_value=None,
+                 trials=None, percentiles=None, seed=None, calendar=None):
+        """Percentile finish dates of a list of milestones"""
+        job = self.prepare(milestones, distribution, status_date, curve, earned_value, trials, percentiles, seed,
+                           calendar)
+        return self.result(job, _simulate(job))
+
+    def run(self, jobs):
+        """Simulate prepared jobs ({key: job}), in a process pool when there are several"""
+        if not jobs:
+            return {}
+        seeds = np.random.SeedSequence(next(iter(jobs.values()))['seed']).spawn(len(jobs))
+        for job, seed in zip(jobs.values(), seeds):
+            job['seed'] = seed
+        if len(jobs) == 1 or self.max_workers == 1:
+            return {key: self.result(job, _simulate(job)) for key, job in jobs.items()}
+
+        executor = self._get_executor()
+        try:
+            outputs = list(executor.map(_simulate, jobs.values()))
+        except BrokenProcessPool:
+            # A worker process died (e.g. killed for memory); start a new pool for later requests
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            raise
+        results = {key: self.result(job, output) for (key, job), output in zip(jobs.items(), outputs)}
+        self.logger.info(f"Simulated {len(results)} projects in a process pool")
+        return results
+
+    def shutdown(self):
+        """Stop the simulation process pool"""
+        with self._lock:
+            executor = self._executor
+            self._executor = None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _get_executor(self):
+        """Process pool used by run, created on first use"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    def result(self, job, output):
+        """Response payload of a simulation: one entry per milestone"""
+        days, on_time = output
+        count = len(job['ids'])
+        percentiles = job['percentiles']
+        columns = {p: [None] * count for p in percentiles}
+        probability = [None] * count
+
+        rows = np.flatnonzero(job['simulated'])
+        for column, p in enumerate(percentiles):
+            values = self._to_dates(job['today'], days[:, column], job['calendar']).tolist()
+            for row, value in zip(rows.tolist(), values):
+                columns[p][row] = value
+        for row, value in zip(rows.tolist(), on_time.tolist()):
+            probability[row] = round(value, 4)
+
+        # Completed milestones finish on their actual date in every trial
+        for row in np.flatnonzero(~np.isnat(job['actual_finish'])).tolist():
+            finish = job['actual_finish'][row]
+            for p in percentiles:
+                columns[p][row] = finish.item()
+            probability[row] = 1.0 if finish <= job['baseline_finish'][row] else 0.0
+
+        milestones = []
+        for row in range(count):
+            entry = {'id': job['ids'][row], 'name': job['names'][row]}
+            for p in percentiles:
+                entry[f'p{p:g}'] = columns[p][row]
+            entry['probability_on_time'] = probability[row]
+            milestones.append(entry)
+        return {
+            'trials': job['trials'],
+            'percentiles': list(percentiles),
+            'distribution': job['distribution'].to_dict(),
+            'milestones': milestones
+        }
+
+    def _to_dates(self, today, days, calendar=None):
+        """status date + days (working days with a calendar) as datetimes (None outside the datetime range)"""
+        representable = np.isfinite(days) & (np.abs(days) < MAX_FORECAST_DAYS)
+        if calendar is None:
+            offsets = np.where(representable, np.rint(days * US_PER_DAY), 0).astype('int64')
+            dates = today + offsets.astype('timedelta64[us]')
+        else:
+            dates = calendar.from_working_time(calendar.working_time(today) + np.where(representable, days, 0.0))
+        dates = np.where(representable & (dates >= MIN_DATETIME64) & (dates <= MAX_DATETIME64),
+                         dates, np.datetime64('NaT'))
+        return dates.astype(object)
@@ -0,0 +1,292 @@
+import hashlib
+import logging
+import re
+import xml.etree.ElementTree as ET
+from datetime import datetime
+
+from instrumentation import metrics
+from milestone_record import Milestone
+from work_calendar import WorkCalendar
+from dependency_graph import mspdi_link
+
+# Collection elements whose children are discarded as soon as they are read
+STREAMED_ELEMENTS = {'Task', 'Resource', 'Assignment', 'Calendar'}
+
+# Baseline record fields that identify a baseline version (progress excluded)
+BASELINE_KEYS = ('id', 'baseline_start', 'baseline_finish', 'baseline_cost', 'baseline_work')
+
+# Working flags Monday..Sunday of base calendars that do not list a day
+DEFAULT_WORKING_WEEKDAYS = (True, True, True, True, True, False, False)
+
+# Exception recurrence type read as a plain date range (daily); other recurrences are skipped
+DAILY_EXCEPTION = '1'
+
+# ISO 8601 durations as written by Project, e.g. PT8H0M0S or P1DT4H0M0S
+DURATION_PATTERN = re.compile(
+    r'^-?P(?:(?P<days>[\d.]+)D)?(?:T(?:(?P<hours>[\d.]+)H)?(?:(?P<minutes>[\d.]+)M)?(?:(?P<seconds>[\d.]+)S)?)?$'
+)
+
+
+def _local_name(tag):
+    """Strip the XML namespace from a tag"""
+    return tag.rsplit('}', 1)[-1]
+
+
+def _duration_minutes(value):
+    """Convert an MSPDI duration to minutes (None if it cannot be parsed)"""
+    if not value:
+        return None
+    match = DURATION_PATTERN.match(value.strip())
+    if not match:
+        return None
+    parts = {k: float(v) if v else 0.0 for k, v in match.groupdict().items()}
+    minutes = parts['days'] * 1440 + parts['hours'] * 60 + parts['minutes'] + parts['seconds'] / 60
+    return -minutes if value.strip().startswith('-') else minutes
+
+
+def _parse_date(value):
+    """Parse an MSPDI date (2024-01-15T08:00:00) to a datetime (None if missing or invalid)"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.strip()).replace(tzinfo=None)
+    except ValueError:
+        metrics.count('date_parse_failures_total', source='mspdi')
+        return None
+
+
+class MSPDIImporter:
+    """Reads milestones from an MS Project XML (MSPDI) export without COM
+
+    The file is parsed incrementally: each <Task> is turned into a small
+    record as soon as its end tag is seen and then discarded, together with
+    resources, assignments and calendars, so memory stays flat no matter
+    how large the export is. Milestones are classified like the COM import
+    (Milestone flag, zero duration or 'milestone' in the name, skipping
+    summary tasks) and returned as the same Milestone records as
+    MSProjectIntegration._extract_task_data. Baseline records for the
+    planned value curve and the dates and predecessor links of the
+    dependency network are collected in the same pass.
+    """
+
+    def __init__(self, source):
+        """Initialize the importer with a file path or binary file object"""
+        self.source = source
+        self.project_name = None
+        self.milestones = None
+        self.schedule_tasks = None
+        self.tasks_scanned = 0
+        self.calendar = None
+        self._calendars = {}
+        self._calendar_uid = None
+        self._baseline_digest = hashlib.sha1()
+        self.setup_logging()
+
+    def setup_logging(self):
+        """Set up logging"""
+        self.logger = logging.getLogger('MSPDIImporter')
+
+    def read(self, progress=None):
+        """Parse the whole file once, collecting milestones and schedule tasks
+
+        ``progress`` is called as progress(tasks_scanned, None) every 1000 tasks.
+        """
+        milestones = []
+        schedule_tasks = []
+
+        try:
+            with metrics.span('mspdi_import.parse'):
+                self._parse(milestones, schedule_tasks, progress)
+        except ET.ParseError as e:
+            raise ValueError(f"Invalid MS Project XML: {str(e)}")
+        metrics.count('milestones_processed_total', len(milestones), stage='mspdi_import')
+
+        self.milestones = milestones
+        self.schedule_tasks = schedule_tasks
+        self.calendar = self._project_calendar()
+        self.logger.info(f"Read {len(milestones)} milestones from {self.tasks_scanned} tasks in MSPDI file")
+        return milestones, schedule_tasks
+
+    def _parse(self, milestones, schedule_tasks, progress):
+        """Stream the file, reading each task as its end tag is seen"""
+        parents = []
+        for event, elem in ET.iterparse(self.source, events=('start', 'end')):
+            name = _local_name(elem.tag)
+            if event == 'start':
+                parents.append(elem)
+                continue
+
+            parents.pop()
+            depth = len(parents)
+            if depth == 1 and name in ('Name', 'Title') and self.project_name is None:
+                self.project_name = (elem.text or '').strip() or None
+            elif depth == 1 and name == 'CalendarUID':
+                self._calendar_uid = (elem.text or '').strip() or None
+            elif name == 'Calendar' and depth == 2:
+                self._read_calendar(elem)
+            elif name == 'Task' and depth == 2:
+                self._read_task(elem, milestones, schedule_tasks)
+                if progress and self.tasks_scanned % 1000 == 0:
+                    progress(self.tasks_scanned, None)
+
+            # Drop processed records so the tree never grows
+            if name in STREAMED_ELEMENTS and depth == 2:
+                parents[-1].clear()
+
+    def extract_milestones(self, progress=None):
+        """Extract milestone records from the file"""
+        if self.milestones is None:
+            self.read(progress)
+        return self.milestones
+
+    def extract_schedule_tasks(self, baseline=True):
+        """Extract progress, baseline, dates and predecessor links of all work tasks (all read either way)"""
+        if self.schedule_tasks is None:
+            self.read()
+        return self.schedule_tasks
+
+    def get_project_name(self):
+        """Get the project name from the file"""
+        if self.milestones is None:
+            self.read()
+        return self.project_name
+
+    def get_baseline_version(self):
+        """Fingerprint of the baseline data read from the file"""
+        if self.schedule_tasks is None:
+            self.read()
+        return self._baseline_digest.hexdigest()
+
+    def get_calendar(self):
+        """WorkCalendar of the project calendar, or None if the file has no calendars"""
+        if self.milestones is None:
+            self.read()
+        return self.calendar
+
+    def _read_calendar(self, elem):
+        """Keep the working weekdays and non-working exceptions of one <Calendar>"""
+        calendar = {'weekdays': {}, 'exceptions': []}
+        for child in elem:
+            name = _local_name(child.tag)
+            if name in ('UID', 'Name', 'BaseCalendarUID', 'IsBaseCalendar'):
+                calendar[name] = (child.text or '').strip()
+            elif name == 'WeekDays':
+                for day in child:
+                    values = self._calendar_values(day)
+                    if values.get('DayType') == '0':
+                        # Exceptions as written by Project 2003 and earlier
+                        if values.get('DayWorking') == '0':
+                            calendar['exceptions'].append(values['period'])
+                    elif values.get('DayType'):
+                        # DayType 1 is Sunday; the WorkCalendar weekmask starts on Monday
+                        calendar['weekdays'][(int(values['DayType']) - 2) % 7] = values.get('DayWorking') == '1'
+            elif name == 'Exceptions':
+                for exception in child:
+                    values = self._calendar_values(exception)
+                    if values.get('DayWorking') == '0' and values.get('Type', DAILY_EXCEPTION) == DAILY_EXCEPTION:
+                        calendar['exceptions'].append(values['period'])
+        if calendar.get('UID'):
+            self._calendars[calendar['UID']] = calendar
+
+    def _calendar_values(self, elem):
+        """Child values of a <WeekDay> or <Exception>, with its <TimePeriod> as 'period'"""
+        values = {'period': (None, None)}
+        for child in elem:
+            name = _local_name(child.tag)
+            if name == 'TimePeriod':
+                period = {_local_name(c.tag): c.text for c in child}
+                values['period'] = (_parse_date(period.get('FromDate')), _parse_date(period.get('ToDate')))
+            else:
+                values[name] = (child.text or '').strip()
+        return values
+
+    def _project_calendar(self):
+        """Resolve the project calendar (with its base calendar) into a WorkCalendar"""
+        if not self._calendars:
+            return None
+        uid = self._calendar_uid
+        if uid not in self._calendars:
+            base_calendars = [c['UID'] for c in self._calendars.values() if c.get('IsBaseCalendar') == '1']
+            uid = (base_calendars or list(self._calendars))[0]
+
+        weekdays = list(DEFAULT_WORKING_WEEKDAYS)
+        exceptions = []
+        chain = []
+        while uid in self._calendars and uid not in chain:
+            chain.append(uid)
+            uid = self._calendars[uid].get('BaseCalendarUID')
+        # Base calendars first, so derived calendars override their weekdays
+        for uid in reversed(chain):
+            calendar = self._calendars[uid]
+            for day, working in calendar['weekdays'].items():
+                weekdays[day] = working
+            exceptions.extend(period for period in calendar['exceptions'] if period[0] is not None)
+
+        try:
+            return WorkCalendar.from_exceptions(weekdays, exceptions, name=self._calendars[chain[0]].get('Name'))
+        except ValueError as e:
+            self.logger.warning(f"Ignoring project calendar: {str(e)}")
+            return None
+
+    def _read_task(self, elem, milestones, schedule_tasks):
+        """Turn one <Task> element into milestone and schedule task records"""
+        fields = {}
+        baseline = {}
+        predecessors = []
+        for child in elem:
+            name = _local_name(child.tag)
+            if name == 'Baseline':
+                values = {_local_name(c.tag): c.text for c in child}
+                if values.get('Number', '0') == '0':
+                    baseline = values
+            elif name == 'PredecessorLink':
+                link = mspdi_link({_local_name(c.tag): c.text for c in child})
+                if link is not None:
+                    predecessors.append(link)
+            elif name not in fields:
+                fields[name] = child.text
+
+        self.tasks_scanned += 1
+        if fields.get('IsNull') == '1' or fields.get('UID') is None:
+            return
+
+        summary = fields.get('Summary') == '1'
+        milestone_flag = fields.get('Milestone') == '1'
+        task_name = fields.get('Name') or ''
+        percent_complete = int(float(fields.get('PercentComplete') or 0))
+
+        if not summary:
+            record = {
+                'id': int(fields['UID']),
+                'baseline_start': _parse_date(baseline.get('Start')),
+                'baseline_finish': _parse_date(baseline.get('Finish')),
+                'baseline_cost': float(baseline.get('Cost') or 0),
+                'baseline_work': _duration_minutes(baseline.get('Work')) or 0,
+                'percent_complete': percent_complete,
+                'start': _parse_date(fields.get('Start')),
+                'finish': _parse_date(fields.get('Finish')),
+                'actual_finish': _parse_date(fields.get('ActualFinish')),
+                'predecessors': predecessors
+            }
+            schedule_tasks.append(record)
+            self._baseline_digest.update(repr([record[k] for k in BASELINE_KEYS]).encode())
+
+        if summary and not milestone_flag:
+            return
+        if not (milestone_flag or _duration_minutes(fields.get('Duration')) == 0
+                or 'milestone' in task_name.lower()):
+            return
+
+        milestones.append(Milestone(
+            id=int(fields['UID']),
+            wbs=fields.get('WBS') or '',
+            name=task_name,
+            percent_complete=percent_complete,
+            start_date=_parse_date(fields.get('Start')),
+            finish_date=_parse_date(fields.get('Finish')),
+            baseline_start=_parse_date(baseline.get('Start')),
+            baseline_finish=_parse_date(baseline.get('Finish')),
+            actual_start=_parse_date(fields.get('ActualStart')),
+            actual_finish=_parse_date(fields.get('ActualFinish')),
+            notes=fields.get('Notes') or ''
+        ))
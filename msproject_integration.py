@@ -1,20 +1,34 @@
-import win32com.client
-import pythoncom
 import datetime
 import logging
 import json
-import os
-import sys
-import time
-from win32com.client import constants
+
+from task_sources import BASELINE_FIELDS, COMTaskSource, MILESTONE_FIELDS, SCHEDULE_FIELDS
+from com_session import COMSessionManager, COMConnectionError
+from milestone_record import Milestone
+from instrumentation import metrics
+from work_calendar import WorkCalendar
+from dependency_graph import parse_predecessors
+
+# PjExceptionType of exceptions that cover every day of their date range
+PJ_DAILY = 1
 
 class MSProjectIntegration:
     """Class to handle integration with MS Project via COM"""
     
-    def __init__(self):
-        """Initialize the MS Project integration"""
+    def __init__(self, task_strategy='auto', project_name=None, session=None):
+        """Initialize the MS Project integration
+        
+        task_strategy selects how milestone tasks are located, see
+        task_sources.COMTaskSource ('auto', 'filter' or 'scan').
+        project_name selects one of the open projects by name instead of
+        the active project. session is the COMSessionManager holding the
+        connection; integrations sharing one reuse the same connection.
+        """
         self.app = None
         self.project = None
+        self.task_strategy = task_strategy
+        self.project_name = project_name
+        self.session = session or COMSessionManager()
         self.setup_logging()
     
     def setup_logging(self):
@@ -28,120 +42,61 @@ class MSProjectIntegration:
         self.logger = logging.getLogger('MSProjectIntegration')
     
     def connect_to_msproject(self):
-        """Connect to MS Project application via COM"""
+        """Connect to MS Project application via COM
+        
+        The connection is kept by the COM session manager and reused across
+        calls; it is only re-established when MS Project stopped responding.
+        """
         try:
-            # Initialize COM for this thread (important for multi-threaded apps)
-            pythoncom.CoInitialize()
-            
-            # Try to get active instance first with increased timeout and error handling
-            self.logger.info("Attempting to connect to MS Project...")
-            try:
-                # Try to connect to existing MS Project instance
-                self.app = win32com.client.GetActiveObject("MSProject.Application")
-                self.logger.info("Connected to existing MS Project instance")
-            except Exception as e:
-                self.logger.warning(f"No active MS Project instance found: {str(e)}")
-                # Try different approach - create new instance
-                try:
-                    # Create new MS Project instance without the problematic parameter
-                    self.app = win32com.client.Dispatch("MSProject.Application")
-                    self.app.Visible = True
-                    self.logger.info("Created new MS Project instance")
-                    # Give MS Project a moment to initialize
-                    time.sleep(2)
-                except Exception as e2:
-                    self.logger.error(f"Failed to create MS Project instance: {str(e2)}")
-                    return False, f"MS Project could not be started. Please ensure it's installed correctly. Error: {str(e2)}"
-            
-            # Check if there's an active project
-            if not self.app.ActiveProject:
-                # Try to check if there are any open projects
-                try:
-                    # Try to get all open projects in Project
-                    project_count = self.app.Projects.Count
-                    if project_count > 0:
-                        self.project = self.app.Projects(1)  # Get the first project
-                        self.logger.info(f"Selected project: {self.project.Name}")
-                    else:
-                        # No projects open, suggest opening one
-                        return False, "No projects are open in MS Project. Please open a project file and try again."
-                except Exception as e:
-                    self.logger.error(f"Error checking for open projects: {str(e)}")
-                    return False, "No active project found. Please open a project in MS Project and try again."
-            else:
-                self.project = self.app.ActiveProject
-                project_name = self.project.Name
-                self.logger.info(f"Connected to active project: {project_name}")
-            
+            self.app = self.session.application()
+            self.project = self.session.project(self.project_name)
+            self.logger.info(f"Connected to project: {self.project.Name}")
             return True, f"Connected to MS Project: {self.project.Name}"
         
+        except COMConnectionError as e:
+            self.logger.error(str(e))
+            return False, str(e)
         except Exception as e:
             error_message = f"Error connecting to MS Project: {str(e)}"
             self.logger.error(error_message)
             return False, error_message
         
-    def extract_milestones(self):
-        """Extract milestone tasks from the active project"""
+    def extract_milestones(self, progress=None):
+        """Extract milestone tasks from the active project
+        
+        ``progress`` is called as progress(tasks_scanned, total) while tasks are read.
+        """
         milestones = []
         
         # First, connect to MS Project
-        success, message = self.connect_to_msproject()
+        with metrics.span('com_import.connect'):
+            success, message = self.connect_to_msproject()
         if not success:
             raise Exception(message)
         
         try:
-            # Get all tasks from the active project
-            tasks = self.project.Tasks
-            task_count = tasks.Count
-            
-            self.logger.info(f"Found {task_count} tasks in the project")
-            
-            # Use multiple methods to identify milestones
-            for i in range(1, task_count + 1):
-                task = tasks(i)  # 1-based indexing in COM
-                
-                # Skip summary tasks if needed
-                if hasattr(task, 'Summary') and task.Summary and not task.Milestone:
-                    continue
-                
-                # Multiple checks for milestones
-                is_milestone = False
-                
-                # Method 1: Check explicit Milestone flag
-                if hasattr(task, 'Milestone') and task.Milestone:
-                    is_milestone = True
-                    self.logger.info(f"Found milestone by flag: {task.Name}")
-                
-                # Method 2: Check if duration is zero (common milestone indicator)
-                elif hasattr(task, 'Duration') and task.Duration == 0:
-                    is_milestone = True
-                    self.logger.info(f"Found milestone by zero duration: {task.Name}")
-                
-                # Method 3: Check for milestone in name (optional)
-                elif 'milestone' in task.Name.lower():
-                    is_milestone = True
-                    self.logger.info(f"Found milestone by name: {task.Name}")
-                
-                if is_milestone:
-                    # Extract all relevant fields
-                    milestone_data = self._extract_task_data(task)
-                    milestones.append(milestone_data)
+            # Read only milestone tasks and only the fields we need; every
+            # property access is a cross-process COM round trip
+            # Task filters act on the active window, so other projects are scanned
+            with metrics.span('com_import.read_tasks'):
+                filter_app = self.app if self._is_active_project() else None
+                source = COMTaskSource(self.project, filter_app, strategy=self.task_strategy, logger=self.logger)
+                for fields in source.iter_milestones(progress=progress):
+                    milestones.append(self._milestone_from_fields(fields))
+            metrics.count('milestones_processed_total', len(milestones), stage='com_import')
             
-            self.logger.info(f"Extracted {len(milestones)} milestones")
+            self.logger.info(
+                f"Extracted {len(milestones)} milestones from {source.tasks_scanned} tasks "
+                f"(matched by {source.match_counts})"
+            )
             
             # If no milestones found, create a helpful message
             if len(milestones) == 0:
-                self.logger.warning("No milestones found in the project")
-                # Get project stats to help debugging
-                try:
-                    total_tasks = task_count
-                    completed_tasks = sum(1 for i in range(1, task_count + 1) if tasks(i).PercentComplete == 100)
-                    self.logger.info(f"Project contains {total_tasks} total tasks, {completed_tasks} completed tasks")
-                except:
-                    pass
+                self.logger.warning(f"No milestones found in the project ({source.task_count} tasks)")
             
             # Save to file as a backup
-            self._save_milestones_to_file(milestones)
+            with metrics.span('com_import.save_backup'):
+                self._save_milestones_to_file(milestones)
             
             return milestones
         
@@ -149,48 +104,201 @@ class MSProjectIntegration:
             error_message = f"Error extracting milestones: {str(e)}"
             self.logger.error(error_message)
             raise Exception(error_message)
+    
+    def extract_schedule_tasks(self, baseline=True):
+        """Extract progress, dates and predecessor links of all work tasks, and their baselines
+        
+        The records give the project's earned value and build its
+        dependency network (see dependency_graph.DependencyGraph); with
+        ``baseline`` they also feed its cumulative planned value curve (see
+        baseline_curve.PlannedValueCurve), so the baseline fields are only
+        read when the curve has to be built. All fields are read in one pass
+        over the tasks; summary tasks are skipped so their budgets are not
+        counted twice.
+        """
+        success, message = self.connect_to_msproject()
+        if not success:
+            raise Exception(message)
         
-        finally:
-            # Clean up COM resources
-            try:
-                pythoncom.CoUninitialize()
-            except:
-                pass
+        try:
+            source = COMTaskSource(self.project, logger=self.logger)
+            fields = SCHEDULE_FIELDS + (BASELINE_FIELDS if baseline else ())
+            schedule_tasks = []
+            for task, values in source.iter_tasks(fields):
+                # Project only has an actual finish for finished tasks
+                if (values['PercentComplete'] or 0) >= 100:
+                    values = source.read_fields(task, ('ActualFinish',), values)
+                schedule_tasks.append(self._schedule_task(values))
+            
+            self.logger.info(f"Extracted {len(schedule_tasks)} schedule tasks (baseline {baseline})")
+            return schedule_tasks
+        
+        except Exception as e:
+            error_message = f"Error extracting schedule tasks: {str(e)}"
+            self.logger.error(error_message)
+            raise Exception(error_message)
+    
+    def get_project_name(self):
+        """Get the name of the connected project, or None"""
+        return self.project.Name if self.project else None
+    
+    def get_baseline_version(self):
+        """Get the date Baseline 0 of the active project was last saved
+        
+        The saved date changes whenever the baseline is re-set, so it is used
+        as the version key for cached planned value curves. Returns None if
+        it cannot be read.
+        """
+        success, message = self.connect_to_msproject()
+        if not success:
+            return None
+        
+        try:
+            return self._format_date(self.project.BaselineSavedDate(0))  # pjBaseline
+        except Exception as e:
+            self.logger.warning(f"Could not read baseline saved date: {str(e)}")
+            return None
+    
+    def get_calendar(self):
+        """WorkCalendar of the project's calendar: working weekdays and non-working exceptions
+        
+        Only daily exceptions without working shifts are read (recurring
+        yearly or monthly exceptions are skipped). Returns None if the
+        calendar cannot be read.
+        """
+        success, message = self.connect_to_msproject()
+        if not success:
+            return None
+        
+        try:
+            calendar = self.project.Calendar
+            metrics.count('com_calls_total')
+            # PjWeekday 1 is Sunday; the WorkCalendar weekmask starts on Monday
+            working_weekdays = []
+            for day in range(7):
+                weekday = calendar.WeekDays((day + 1) % 7 + 1)
+                metrics.count('com_calls_total')
+                working_weekdays.append(bool(self._safe_get_property(weekday, 'Working', False)))
+            
+            exceptions = []
+            items = calendar.Exceptions
+            metrics.count('com_calls_total', 2)
+            for i in range(1, items.Count + 1):
+                exception = items(i)
+                metrics.count('com_calls_total')
+                if self._safe_get_property(exception, 'Type', PJ_DAILY) != PJ_DAILY:
+                    continue
+                shift = self._safe_get_property(exception, 'Shift1', None)
+                if shift is not None and self._to_datetime(self._safe_get_property(shift, 'Start', None)):
+                    continue  # working exception
+                exceptions.append((
+                    self._to_datetime(self._safe_get_property(exception, 'Start', None)),
+                    self._to_datetime(self._safe_get_property(exception, 'Finish', None))
+                ))
+            
+            name = self._safe_get_property(calendar, 'Name', None)
+            return WorkCalendar.from_exceptions(
+                working_weekdays, [period for period in exceptions if period[0] is not None], name=name
+            )
+        except Exception as e:
+            self.logger.warning(f"Could not read project calendar: {str(e)}")
+            return None
+    
+    def _is_active_project(self):
+        """Whether the connected project is the one shown in the active window"""
+        if not self.project_name:
+            return True
+        try:
+            active = self.app.ActiveProject
+            return active is not None and active.Name == self.project_name
+        except Exception:
+            return False
     
     def _extract_task_data(self, task):
         """Extract relevant data fields from a task"""
-        milestone_data = {
-            'id': task.UniqueID,
-            'wbs': self._safe_get_property(task, 'WBS', ''),
-            'name': task.Name,
-            'percent_complete': self._safe_get_property(task, 'PercentComplete', 0),
+        source = COMTaskSource(self.project, logger=self.logger)
+        return self._milestone_from_fields(source.read_fields(task, MILESTONE_FIELDS))
+    
+    def _milestone_from_fields(self, fields):
+        """Build a typed milestone record from raw task field values"""
+        return Milestone(
+            id=fields['UniqueID'],
+            wbs=fields['WBS'],
+            name=fields['Name'],
+            percent_complete=fields['PercentComplete'],
             
-            # Handle dates - convert to string representations
-            'start_date': self._format_date(self._safe_get_property(task, 'Start', None)),
-            'finish_date': self._format_date(self._safe_get_property(task, 'Finish', None)),
+            # Dates are kept as datetimes; they become strings only in JSON
+            start_date=self._to_datetime(fields['Start']),
+            finish_date=self._to_datetime(fields['Finish']),
             
             # Baseline dates
-            'baseline_start': self._format_date(self._safe_get_property(task, 'BaselineStart', None)),
-            'baseline_finish': self._format_date(self._safe_get_property(task, 'BaselineFinish', None)),
+            baseline_start=self._to_datetime(fields['BaselineStart']),
+            baseline_finish=self._to_datetime(fields['BaselineFinish']),
             
             # Actual dates
-            'actual_start': self._format_date(self._safe_get_property(task, 'ActualStart', None)),
-            'actual_finish': self._format_date(self._safe_get_property(task, 'ActualFinish', None)),
+            actual_start=self._to_datetime(fields['ActualStart']),
+            actual_finish=self._to_datetime(fields['ActualFinish']),
             
             # Notes
-            'notes': self._safe_get_property(task, 'Notes', '')
+            notes=fields['Notes']
+        )
+    
+    def _schedule_task(self, fields):
+        """Build a schedule task record from raw task field values"""
+        task = {
+            'id': fields['UniqueID'],
+            'percent_complete': fields['PercentComplete'],
+            'start': self._to_datetime(fields['Start']),
+            'finish': self._to_datetime(fields['Finish']),
+            'actual_finish': self._to_datetime(fields.get('ActualFinish')),
+            'predecessors': parse_predecessors(fields['UniqueIDPredecessors'])
         }
-        
-        return milestone_data
+        if 'BaselineStart' in fields:
+            task.update(
+                baseline_start=self._to_datetime(fields['BaselineStart']),
+                baseline_finish=self._to_datetime(fields['BaselineFinish']),
+                baseline_cost=fields['BaselineCost'],
+                baseline_work=fields['BaselineWork']
+            )
+        return task
     
     def _safe_get_property(self, obj, property_name, default_value):
         """Safely get a property or return default value if not available"""
+        metrics.count('com_calls_total')
         try:
             return getattr(obj, property_name)
         except Exception as e:
             self.logger.warning(f"Could not get property {property_name}: {str(e)}")
             return default_value
     
+    def _to_datetime(self, date_value):
+        """Convert a date value from MS Project to a naive datetime
+        
+        Project reports unset dates as the string 'NA'; those and anything else
+        that is not a date become None.
+        """
+        if date_value is None or isinstance(date_value, str):
+            return None
+        
+        try:
+            # pywintypes datetimes are timezone-aware datetime subclasses
+            return datetime.datetime(
+                date_value.year, date_value.month, date_value.day,
+                date_value.hour, date_value.minute, date_value.second
+            )
+        except AttributeError:
+            pass
+        
+        try:
+            return datetime.datetime(
+                date_value.Year, date_value.Month, date_value.Day,
+                getattr(date_value, 'Hour', 0), getattr(date_value, 'Minute', 0), getattr(date_value, 'Second', 0)
+            )
+        except Exception as e:
+            self.logger.warning(f"Error converting date: {str(e)}")
+            metrics.count('date_parse_failures_total', source='com')
+            return None
+    
     def _format_date(self, date_value):
         """Format a date value from MS Project"""
         if date_value is None:
@@ -227,7 +335,7 @@ class MSProjectIntegration:
         """Save milestone data to a backup JSON file"""
         try:
             with open('milestones_backup.json', 'w') as f:
-                json.dump(milestones, f, indent=2)
+                json.dump([m.to_dict() for m in milestones], f, indent=2)
             
             self.logger.info("Saved milestones backup to milestones_backup.json")
         except Exception as e:
@@ -239,7 +347,7 @@ class MSProjectIntegration:
             # Release COM objects
             self.project = None
             self.app = None
-            pythoncom.CoUninitialize()
+            self.session.close()
             self.logger.info("Disconnected from MS Project")
         except Exception as e:
             self.logger.error(f"Error disconnecting from MS Project: {str(e)}")
@@ -266,9 +374,3 @@ class MSProjectIntegration:
         except Exception as e:
             self.logger.error(f"Error getting open projects: {str(e)}")
             return projects_list
-        finally:
-            # Clean up COM resources
-            try:
-                pythoncom.CoUninitialize()
-            except:
-                pass
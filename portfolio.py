@@ -0,0 +1,598 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+
+from baseline_curve import BaselineCurveCache
+from change_tracker import MilestoneChangeTracker
+from dashboard_aggregate import COUNTERS, DashboardAggregate
+from dependency_graph import DependencyGraph, source_key
+from forecast_backtest import BACKTEST_SOURCES, DEFAULT_TOLERANCE_DAYS
+from milestone_index import MilestoneIndex
+from milestone_record import format_date
+from monte_carlo import fit_spi_distribution
+from response_encoding import milestone_columns
+from timeline_index import TimelineIndex
+from wbs_rollup import WBSRollup
+
+
+# ProjectState attributes saved with the shared project state, besides the milestone order and status date
+SHARED_FIELDS = ('earned_value', 'baseline_key', 'loaded_at')
+
+# ProjectState attributes saved to the shared state as parts of their own, only when they were replaced
+SHARED_PARTS = ('curve', 'calendar', 'network')
+
+
+class ProjectState:
+    """Milestones, ES context, dashboard, query, timeline and WBS indexes of one project in the portfolio"""
+
+    def __init__(self, name):
+        """Initialize an empty project"""
+        self.name = name
+        self.tracker = MilestoneChangeTracker()
+        self.dashboard = DashboardAggregate()
+        self.index = MilestoneIndex()
+        self.timeline = TimelineIndex()
+        self.wbs = WBSRollup()
+        self.curve = None
+        self.earned_value = None
+        self.baseline_key = None
+        self.calendar = None
+        self.network = None
+        self.network_synced = False
+        self.loaded_at = None
+        # Generation of the shared state this project was last read from or saved as, what was saved
+        # and the parts as they were last saved or read
+        self.shared_generation = None
+        self.shared_saved = None
+        self.shared_parts = {}
+        # (tracker version, milestones as columns) of the last columnar response
+        self._columns = None
+        self.lock = threading.RLock()
+
+    def context(self):
+        """Inputs besides the status date that the project's forecasts depend on"""
+        return (self.baseline_key, self.earned_value, self.calendar.key if self.calendar else None,
+                self.network.key if self.network else None)
+
+    def milestones(self):
+        """Current milestone records in import order"""
+        return self.tracker.milestones()
+
+    def milestone_columns(self):
+        """Current milestone records as columns (see response_encoding.milestone_columns), built once per version"""
+        with self.lock:
+            if self._columns is None or self._columns[0] != self.tracker.version:
+                self._columns = (self.tracker.version, milestone_columns(self.milestones()))
+            return self._columns[1]
+
+
+class PortfolioStore:
+    """Thread-safe store of imported projects, keyed by project name
+
+    Each project keeps its own change tracker, dashboard aggregate, query,
+    timeline and WBS indexes and planned value curve, guarded by its own
+    lock, so projects can be imported and forecast concurrently. forecast_all
+    runs the projects on a thread pool: the batch engine spends its time in
+    NumPy, which releases the GIL, and records are updated in place without
+    being copied to a worker process. Portfolio summaries are added up from the per-project
+    running totals rather than from the milestone lists. With a
+    SnapshotStore, every import and forecast is also saved to the history;
+    with an EventBroker, its changes are pushed to live clients.
+
+    With a SharedStateStore, several worker processes serve the same
+    portfolio: imports, forecasts and removals hold the store's write lock,
+    first take over what other workers saved and then save what they
+    changed, so tracker versions stay the same in every worker. sync_shared
+    takes over other workers' changes between writes.
+    """
+
+    def __init__(self, calculator, curve_cache=None, max_workers=None, snapshots=None, events=None, shared=None):
+        """Initialize the store with an EarnedScheduleCalculator"""
+        self.calculator = calculator
+        self.curve_cache = curve_cache or BaselineCurveCache()
+        self.snapshots = snapshots
+        self.events = events
+        self.shared = shared
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.projects = {}
+        self.active = None
+        self._lock = threading.RLock()
+        self._executor = None
+        self.logger = logging.getLogger('PortfolioStore')
+
+    def project(self, name=None, create=False):
+        """The project with the given name (default: the active one), None if unknown"""
+        with self._lock:
+            name = self.active if name is None else name
+            state = self.projects.get(name)
+            if state is None and create:
+                state = self.projects[name] = ProjectState(name)
+            return state
+
+    def names(self):
+        """Names of the loaded projects"""
+        with self._lock:
+            return list(self.projects)
+
+    def remove(self, name):
+        """Drop a project from the portfolio, returning whether it was loaded"""
+        with self.shared_write([name]):
+            removed = self._drop(name)
+            if removed and self.shared is not None:
+                self.shared.remove(name)
+        return removed
+
+    def _drop(self, name):
+        """Forget a project in this process"""
+        with self._lock:
+            state = self.projects.pop(name, None)
+            if self.active == name:
+                self.active = next(iter(self.projects), None)
+        if state is not None:
+            self.curve_cache.invalidate(name)
+            if self.events is not None:
+                self.events.publish('project_removed', {'project': name}, project=name)
+        return state is not None
+
+    def load(self, name, milestones, status_date, source=None):
+        """Import milestones into a project and make it the active one
+
+        ``source`` (MSProjectIntegration or MSPDIImporter) provides the
+        baseline for the planned value curve, the project calendar and the
+        dependency network. They are read before any lock is taken, so COM
+        calls and file parsing do not hold up readers of the project or
+        writers in other workers; the locks only cover applying them.
+        Returns the tracker delta.
+        """
+        loaded = self.read_source(name, source) if source is not None else None
+        with self.shared_write([name]):
+            state = self.project(name, create=True)
+            with state.lock:
+                if loaded is not None:
+                    self.apply_source(state, loaded)
+                delta = state.tracker.update(milestones, self.forecast_callback(state, status_date),
+                                             status_date, context=state.context(),
+                                             propagate=self.propagation_callback(state))
+                self.sync_views(state, delta)
+                state.loaded_at = datetime.now()
+                self.save_snapshot(state, status_date, 'import')
+                self.publish_changes(state, delta)
+            with self._lock:
+                self.active = name
+            if self.shared is not None:
+                self.shared.set_active(name)
+        return delta
+
+    def sync_views(self, state, delta):
+        """Apply a tracker delta to a project's dashboard aggregate and indexes"""
+        state.dashboard.sync(state.tracker, delta)
+        state.index.sync(state.tracker, delta)
+        state.timeline.sync(state.tracker, delta)
+        state.wbs.sync(state.tracker, delta)
+
+    def read_source(self, name, source):
+        """Baseline curve, earned value, calendar and dependency network of a project, read from its source"""
+        curve, earned_value, baseline_key, schedule_tasks = self.read_baseline(name, source)
+        calendar = self.read_calendar(name, source)
+        return {
+            'curve': curve,
+            'earned_value': earned_value,
+            'baseline_key': baseline_key,
+            'calendar': calendar,
+            'network': self.read_network(name, source, calendar, schedule_tasks)
+        }
+
+    def apply_source(self, state, loaded):
+        """Give a project what read_source read (project lock held)"""
+        state.curve = loaded['curve']
+        state.earned_value = loaded['earned_value']
+        state.baseline_key = loaded['baseline_key']
+        state.calendar = loaded['calendar']
+        if loaded['network'] is not state.network:
+            state.network = loaded['network']
+            state.network_synced = False
+
+    def read_baseline(self, name, source):
+        """PV curve and earned value of a project from its source
+
+        The curve is only rebuilt when the project's baseline changed, and
+        only then are the tasks' baseline fields read; otherwise only their
+        progress, dates and links are. Falls back to percent-complete ES (no
+        curve) if baseline data is missing. Returns (curve, earned value,
+        baseline key, schedule tasks), the tasks for the dependency network
+        (None if they could not be read).
+        """
+        schedule_tasks = None
+        try:
+            baseline_version = source.get_baseline_version()
+
+            def build():
+                nonlocal schedule_tasks
+                schedule_tasks = source.extract_schedule_tasks(baseline=True)
+                return schedule_tasks
+
+            curve = self.curve_cache.get_curve(name, baseline_version, build)
+            if schedule_tasks is None:
+                schedule_tasks = source.extract_schedule_tasks(baseline=False)
+            earned_value = curve.earned_value(schedule_tasks) if curve else None
+            return curve, earned_value, (name, baseline_version), schedule_tasks
+        except Exception as e:
+            self.logger.warning(f"Could not load time-phased baseline for {name}, "
+                                f"using percent complete for ES: {str(e)}")
+            return None, None, None, schedule_tasks
+
+    def read_calendar(self, name, source):
+        """The project's working calendar; without one (None), durations are calendar days"""
+        try:
+            return source.get_calendar()
+        except Exception as e:
+            self.logger.warning(f"Could not load the calendar of {name}, using calendar days: {str(e)}")
+            return None
+
+    def read_network(self, name, source, calendar, schedule_tasks=None):
+        """The project's dependency network; without one (None), milestones are forecast on their own
+
+        Built from the schedule tasks read_baseline read (read here if it
+        could not). The project's current network is returned, with its
+        propagated forecasts, when its tasks, dates, links and calendar did
+        not change since the last import.
+        """
+        try:
+            if schedule_tasks is None:
+                schedule_tasks = source.extract_schedule_tasks(baseline=False)
+            state = self.project(name)
+            network = state.network if state is not None else None
+            if network is not None and network.source_key == source_key(schedule_tasks, calendar):
+                return network
+            return DependencyGraph(schedule_tasks, calendar) if schedule_tasks else None
+        except Exception as e:
+            self.logger.warning(f"Could not load the dependency network of {name}, "
+                                f"forecasting milestones on their own: {str(e)}")
+            return None
+
+    def forecast_callback(self, state, status_date):
+        """Callback computing ES metrics for a list of the project's milestones in place"""
+        return lambda milestones: self.calculator.calculate_forecasts(
+            milestones, status_date=status_date, curve=state.curve, earned_value=state.earned_value,
+            calendar=state.calendar
+        )
+
+    def propagation_callback(self, state):
+        """Callback carrying recomputed forecasts down the project's dependency network (None without one)
+
+        Each milestone gets the finish its predecessors allow
+        (propagated_finish) and the predecessor driving it, if any. Only the
+        downstream cone of forecasts that moved is walked; a newly loaded
+        network first takes the forecasts of all milestones.
+        """
+        network = state.network
+        if network is None:
+            return None
+
+        def propagate(uids):
+            records = state.tracker.records
+            if not state.network_synced:
+                # A new network starts from the scheduled finishes; give it every forecast
+                uids = list(records)
+            moved = network.update({uid: records[uid].get('forecast_finish') for uid in uids})
+            if state.network_synced:
+                updated = set(uids).union(moved).intersection(records)
+            else:
+                updated = set(records)
+                state.network_synced = True
+            for uid, (finish, driver) in network.finishes(updated).items():
+                record = records[uid]
+                record['propagated_finish'] = format_date(finish) if isinstance(record, dict) else finish
+                record['driving_predecessor'] = driver
+            return updated
+        return propagate
+
+    def forecast(self, name, status_date):
+        """Recompute one project's forecasts for a status date, returning the tracker delta"""
+        with self.shared_write([name]):
+            return self._forecast(name, status_date)
+
+    def _forecast(self, name, status_date):
+        """Recompute one project's forecasts in this process"""
+        state = self.project(name)
+        if state is None:
+            raise KeyError(name)
+        with state.lock:
+            delta = state.tracker.refresh(self.forecast_callback(state, status_date), status_date,
+                                          context=state.context(), propagate=self.propagation_callback(state))
+            self.sync_views(state, delta)
+            self.save_snapshot(state, status_date, 'forecast')
+            self.publish_changes(state, delta)
+        return delta
+
+    def save_snapshot(self, state, status_date, kind):
+        """Save a project's current milestones to the snapshot history, if one is kept"""
+        if self.snapshots is None:
+            return
+        try:
+            self.snapshots.save(state.name, status_date, state.milestones(), kind=kind,
+                                version=state.tracker.version)
+        except Exception as e:
+            self.logger.error(f"Could not save {kind} snapshot for {state.name}: {str(e)}")
+
+    def publish_changes(self, state, delta):
+        """Push a project's milestone delta and new summary to live clients"""
+        if self.events is None or not (delta['changed'] or delta['removed']):
+            return
+        try:
+            self.events.publish('milestones', dict(delta, project=state.name), project=state.name)
+            keys = [m.get('id') for m in delta['changed']] + list(delta['removed'])
+            self.events.publish('summary', {
+                'project': state.name,
+                'version': delta['version'],
+                'summary': state.dashboard.summary(),
+                'timeline': {key: state.dashboard.timeline_entry(key) for key in keys}
+            }, project=state.name)
+        except Exception as e:
+            self.logger.error(f"Could not publish changes for {state.name}: {str(e)}")
+
+    @contextmanager
+    def shared_write(self, names=None):
+        """Run a change of some projects (default: all) under the shared state's write lock
+
+        Takes over what other workers saved before the change and saves the
+        changed projects after it; without a SharedStateStore, just runs it.
+        """
+        if self.shared is None:
+            yield
+            return
+        with self.shared.transaction():
+            generations = self.shared.generations()
+            for name in (set(self.names()).union(generations) if names is None else names):
+                self._take_over(name, generations.get(name))
+            self._take_over_active(self.shared.get_active())
+            try:
+                yield
+                for name in (self.names() if names is None else names):
+                    state = self.project(name)
+                    if state is not None:
+                        self._save_shared(state)
+            except BaseException:
+                # Nothing is saved: read these projects again on the next sync
+                for name in (self.names() if names is None else names):
+                    state = self.project(name)
+                    if state is not None:
+                        state.shared_generation = state.shared_saved = None
+                raise
+
+    def sync_shared(self):
+        """Take over the projects other workers saved, changed or removed since the last call"""
+        if self.shared is None:
+            return
+        try:
+            published = self.shared.poll()
+            if published is None:
+                return
+            generations, active = published
+            for name in set(self.names()).union(generations):
+                self._take_over(name, generations.get(name))
+            self._take_over_active(active)
+        except Exception as e:
+            self.logger.error(f"Could not read the shared state: {str(e)}")
+
+    def _take_over(self, name, generation):
+        """Bring one project in line with its shared generation (None: not shared, or removed)"""
+        state = self.project(name)
+        if generation is None:
+            # Projects this worker has not saved yet are not removed
+            if state is not None and state.shared_generation is not None:
+                self._drop(name)
+            return
+        if state is not None and state.shared_generation == generation:
+            return
+
+        stored = self.shared.load(name, state.shared_generation if state is not None else None)
+        if stored is None:
+            return
+        generation, version, saved, records, parts, whole = stored
+        if whole and state is not None:
+            # Its versions may have been used by another import of the project: start over
+            self._drop(name)
+        state = self.project(name, create=True)
+        with state.lock:
+            for field in SHARED_FIELDS:
+                setattr(state, field, saved[field])
+            for part, value in parts.items():
+                setattr(state, part, value)
+            state.shared_parts.update(parts)
+            if 'network' in parts:
+                state.network_synced = saved['network_synced']
+            elif records:
+                # The network still holds the forecasts it was read with: give it all of them before propagating
+                state.network_synced = False
+            delta = state.tracker.adopt(records, saved['order'], saved['status_date'], state.context(), version)
+            self.sync_views(state, delta)
+            state.shared_generation = generation
+            state.shared_saved = (version, saved['status_date'], state.tracker.context)
+            self.publish_changes(state, delta)
+        self.logger.info(f"Took over {name} generation {generation} (version {version}, "
+                         f"{len(records)} milestones read)")
+
+    def _take_over_active(self, active):
+        """Make the project another worker imported last the active one, once it is loaded here"""
+        with self._lock:
+            if active in self.projects:
+                self.active = active
+
+    def _save_shared(self, state):
+        """Save what changed in a project since it was last saved or read to the shared state
+
+        Only the milestones the tracker changed or removed since then and
+        the context parts that were replaced are written; the first save,
+        or the first after a failed write, replaces the whole project.
+        """
+        with state.lock:
+            tracker = state.tracker
+            saved = (tracker.version, tracker.status_date, tracker.context)
+            if saved == state.shared_saved:
+                return
+            replace = state.shared_saved is None
+            if replace:
+                records, removed = tracker.milestones(), ()
+            else:
+                delta = tracker.changes_since(state.shared_saved[0])
+                records, removed = delta['changed'], delta['removed']
+            parts = {part: getattr(state, part) for part in SHARED_PARTS
+                     if replace or part not in state.shared_parts
+                     or getattr(state, part) is not state.shared_parts[part]}
+            shared = {field: getattr(state, field) for field in SHARED_FIELDS}
+            shared.update(order=tracker.order, status_date=tracker.status_date, network_synced=state.network_synced)
+            state.shared_generation = self.shared.save(state.name, tracker.version, shared, records, removed,
+                                                       parts, replace=replace)
+            state.shared_saved = saved
+            state.shared_parts.update(parts)
+
+    def forecast_all(self, status_date, names=None):
+        """Recompute the forecasts of several projects (default: all) in parallel
+
+        Returns {project name: tracker delta}.
+        """
+        with self.shared_write(names):
+            names = self.names() if names is None else list(names)
+            if len(names) <= 1:
+                return {name: self._forecast(name, status_date) for name in names}
+
+            futures = {name: self._get_executor().submit(self._forecast, name, status_date) for name in names}
+            results = {name: future.result() for name, future in futures.items()}
+            self.logger.info(f"Forecast {len(results)} projects for {status_date}")
+            return results
+
+    def monte_carlo(self, forecaster, status_date, names=None, distribution=None, trials=None,
+                    percentiles=None, seed=None):
+        """Probabilistic finish dates of several projects (default: the active one)
+
+        Without a configured SPIDistribution, each project's is fitted to its
+        snapshot history (or current SPI(t) values). Inputs are prepared under
+        the project locks; the simulation itself runs without them, in a
+        process pool when there are several projects. Returns {name: result}.
+        """
+        if names is None:
+            names = [self.active] if self.active is not None else []
+        jobs = {}
+        for name in names:
+            state = self.project(name)
+            if state is None:
+                raise KeyError(name)
+            history = self.snapshots.spi_history(name) if self.snapshots is not None and not distribution else ()
+            with state.lock:
+                project_distribution = distribution or fit_spi_distribution(
+                    history, [m.get('spi_t') for m in state.milestones() if m.get('status') == 'In Progress']
+                )
+                jobs[name] = forecaster.prepare(state.milestones(), project_distribution, status_date,
+                                                state.curve, state.earned_value, trials, percentiles, seed,
+                                                calendar=state.calendar)
+        return forecaster.run(jobs)
+
+    def status_sweep(self, backtester, name, status_dates, fields=None):
+        """ES metric matrices of a project over a range of status dates
+
+        Past status dates use the progress recorded in the snapshot history.
+        The milestone columns are read under the project lock; the sweep
+        runs without it.
+        """
+        state = self.project(name)
+        if state is None:
+            raise KeyError(name)
+        progress = self.progress_history(name, status_dates)
+        with state.lock:
+            job = backtester.prepare(state.milestones(), status_dates, state.calendar,
+                                     state.tracker.status_date, progress)
+        return dict(backtester.sweep(job, fields), project=name)
+
+    def backtest(self, backtester, name, status_dates, tolerance_days=DEFAULT_TOLERANCE_DAYS, source='sweep'):
+        """Accuracy of a project's forecasts over a range of status dates
+
+        ``source`` 'sweep' recomputes the forecasts as of each status date;
+        'snapshots' scores the forecasts saved in the snapshot history
+        within the range.
+        """
+        state = self.project(name)
+        if state is None:
+            raise KeyError(name)
+        history = None
+        if source == 'snapshots':
+            if self.snapshots is None:
+                raise ValueError('No snapshot history is kept')
+            history = self.snapshots.forecast_history(name, since=min(status_dates), until=max(status_dates))
+        elif source not in BACKTEST_SOURCES:
+            raise ValueError(f"Invalid source: {source}. Use one of {', '.join(BACKTEST_SOURCES)}")
+        progress = self.progress_history(name, status_dates) if history is None else ()
+        with state.lock:
+            job = backtester.prepare(state.milestones(), status_dates, state.calendar,
+                                     state.tracker.status_date, progress)
+        return dict(backtester.backtest(job, tolerance_days, history), project=name)
+
+    def progress_history(self, name, status_dates):
+        """Percent complete recorded for a project from the last snapshot on or before the first status date"""
+        if self.snapshots is None:
+            return ()
+        first = min(status_dates)
+        earlier = self.snapshots.snapshots(name, until=first)
+        return self.snapshots.progress_history(name, since=earlier[-1]['status_date'] if earlier else first,
+                                               until=max(status_dates))
+
+    def project_summaries(self):
+        """Dashboard summary and version of every project"""
+        summaries = []
+        for name in self.names():
+            state = self.project(name)
+            if state is None:
+                continue
+            with state.lock:
+                state.dashboard.sync(state.tracker)
+                summaries.append({
+                    'name': name,
+                    'version': state.tracker.version,
+                    'loaded_at': state.loaded_at,
+                    'calendar': state.calendar.to_dict() if state.calendar else None,
+                    'network': state.network.to_dict() if state.network else None,
+                    'summary': state.dashboard.summary()
+                })
+        return summaries
+
+    def summary(self):
+        """Portfolio summary added up from the per-project aggregates"""
+        counts = dict.fromkeys(COUNTERS, 0)
+        total_milestones = 0
+        spi_sum = 0.0
+        spi_count = 0
+        projects = self.names()
+        for name in projects:
+            state = self.project(name)
+            if state is None:
+                continue
+            with state.lock:
+                aggregate = state.dashboard
+                aggregate.sync(state.tracker)
+                total_milestones += len(aggregate.contributions)
+                for counter in COUNTERS:
+                    counts[counter] += aggregate.counts[counter]
+                spi_sum += aggregate.spi_sum
+                spi_count += aggregate.spi_count
+
+        summary = {'projects': len(projects), 'total_milestones': total_milestones}
+        summary.update(counts)
+        summary['avg_spi_t'] = round(spi_sum / spi_count, 2) if spi_count else 0
+        return summary
+
+    def shutdown(self):
+        """Stop the forecasting thread pool"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _get_executor(self):
+        """Thread pool used by forecast_all, created on first use"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='forecast')
+            return self._executor
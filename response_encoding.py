@@ -0,0 +1,102 @@
+import gzip
+
+import orjson
+
+from milestone_record import DATE_FIELDS, INPUT_FIELDS, RESULT_FIELDS, Milestone, format_date
+
+# brotli is optional: without it responses are compressed with gzip only
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Layouts of milestone lists in responses: one object per milestone, or one array per field
+FORMATS = ('records', 'columns')
+
+# Media types compressed when the client accepts it
+COMPRESSIBLE_TYPES = frozenset(('application/json', 'text/plain', 'text/html'))
+
+# Smallest body (bytes) worth compressing
+MIN_COMPRESS_SIZE = 1024
+
+# Fast settings, since every response is compressed as it is sent
+GZIP_LEVEL = 3
+BROTLI_QUALITY = 4
+
+
+def encode_json(obj, default, sort_keys=False):
+    """Compact JSON bytes of obj, encoded with orjson
+
+    ``default`` converts objects orjson does not know, e.g. Milestone
+    records, and datetimes (orjson is told to pass them to it, so dates are
+    formatted as in the rest of the application).
+    """
+    option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    return orjson.dumps(obj, default=default, option=option)
+
+
+def get_format(value):
+    """Validated milestone list layout ('records' if not given)"""
+    value = (value or 'records').lower()
+    if value not in FORMATS:
+        raise ValueError(f"Invalid format: {value}. Use {' or '.join(FORMATS)}")
+    return value
+
+
+def milestone_columns(milestones):
+    """Milestone records as {'count': n, 'columns': {field: [value of each milestone]}}
+
+    Each field name is sent once instead of once per milestone. Fields no
+    milestone has are left out, and a milestone without a field has null in
+    its column. Dates are formatted once per distinct date.
+    """
+    milestones = [m if isinstance(m, Milestone) else Milestone.from_dict(m) for m in milestones]
+    dates = {None: None}
+    columns = {}
+    for field in INPUT_FIELDS + RESULT_FIELDS:
+        values = [getattr(milestone, field, None) for milestone in milestones]
+        if field in DATE_FIELDS:
+            for value in set(values).difference(dates):
+                dates[value] = format_date(value)
+            values = [dates[value] for value in values]
+        if any(value is not None for value in values):
+            columns[field] = values
+    return {'count': len(milestones), 'columns': columns}
+
+
+def format_milestones(milestones, response_format):
+    """A milestone list in the requested layout"""
+    return milestone_columns(milestones) if response_format == 'columns' else milestones
+
+
+def compress_response(response, accept_encodings):
+    """Compress a response body with brotli or gzip, as the client's Accept-Encoding prefers
+
+    Streams (e.g. Server-Sent Events) and files are sent as they are. A
+    compressed response gets a weak ETag, since its bytes differ from the
+    uncompressed ones while it stays the same representation.
+    """
+    if (response.direct_passthrough or response.is_streamed or response.mimetype not in COMPRESSIBLE_TYPES
+            or 'Content-Encoding' in response.headers):
+        return response
+    response.vary.add('Accept-Encoding')
+    if response.status_code != 200 or response.content_length and response.content_length < MIN_COMPRESS_SIZE:
+        return response
+    encoding = accept_encodings.best_match(('br', 'gzip') if brotli is not None else ('gzip',))
+    if encoding is None:
+        return response
+    data = response.get_data()
+    if len(data) < MIN_COMPRESS_SIZE:
+        return response
+    if encoding == 'br':
+        data = brotli.compress(data, quality=BROTLI_QUALITY)
+    else:
+        data = gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    response.set_data(data)
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
@@ -0,0 +1,260 @@
+import gc
+import logging
+import pickle
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    name TEXT PRIMARY KEY,
+    generation INTEGER NOT NULL,
+    base_generation INTEGER NOT NULL,
+    version INTEGER NOT NULL,
+    milestone_count INTEGER NOT NULL,
+    updated_at TEXT NOT NULL,
+    state BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS milestones (
+    project TEXT NOT NULL,
+    uid NOT NULL,
+    generation INTEGER NOT NULL,
+    record BLOB NOT NULL,
+    PRIMARY KEY (project, uid)
+);
+CREATE INDEX IF NOT EXISTS milestones_generation ON milestones (project, generation);
+CREATE TABLE IF NOT EXISTS project_parts (
+    project TEXT NOT NULL,
+    part TEXT NOT NULL,
+    generation INTEGER NOT NULL,
+    value BLOB NOT NULL,
+    PRIMARY KEY (project, part)
+);
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS import_jobs (
+    id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    state BLOB NOT NULL
+);
+"""
+
+# Seconds a worker waits for another worker's write to finish
+DEFAULT_WRITE_TIMEOUT = 60.0
+
+
+@contextmanager
+def _gc_paused():
+    """Pause the cyclic garbage collector, which would walk the whole heap many times while
+    (un)pickling hundreds of thousands of records"""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+class SharedStateStore:
+    """Calculated project state shared by the worker processes of one deployment, in SQLite
+
+    Each project is stored as a row holding its milestone order, status
+    date and small ES context values, one row per milestone record with its
+    results, and one row per large context part (baseline curve, calendar,
+    dependency network), all pickled. Every write takes the next number of a
+    store-wide generation counter and only rewrites the milestones and parts
+    that changed, tagging them with it. Workers keep the decoded state in
+    memory and check for changes with PRAGMA data_version, which only moves
+    when another connection committed, so an idle check costs no table
+    read; a worker at generation g then only reads the rows written after
+    g. A project written whole since then (e.g. imported again after a
+    removal) is reported as such, so the worker starts it over. Writes run
+    in BEGIN IMMEDIATE transactions, which queue the writers of all
+    processes, while WAL mode lets readers continue. Import jobs are
+    stored as well, so any worker can report a job another one runs. The
+    database holds pickles: it must only be writable by the application.
+    """
+
+    def __init__(self, path, write_timeout=DEFAULT_WRITE_TIMEOUT):
+        """Open (and create if needed) the shared state database"""
+        self.path = path
+        self.logger = logging.getLogger('SharedStateStore')
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(SCHEMA)
+        # Writes get their own connection, in autocommit mode so transactions are explicit
+        self._write_lock = threading.RLock()
+        self._writer = sqlite3.connect(path, timeout=write_timeout, check_same_thread=False,
+                                       isolation_level=None)
+        self._in_transaction = False
+        self._data_version = None
+
+    def poll(self):
+        """Generations of the stored projects and the active project, None if nothing changed since the last poll"""
+        with self._lock:
+            data_version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+            if data_version == self._data_version:
+                return None
+            self._data_version = data_version
+        return self.generations(), self.get_active()
+
+    def generations(self):
+        """{project name: generation} of every stored project"""
+        with self._lock:
+            return dict(self._conn.execute('SELECT name, generation FROM projects').fetchall())
+
+    def get_active(self):
+        """Name of the project imported last"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM settings WHERE key = 'active'").fetchone()
+        return row[0] if row else None
+
+    def load(self, name, since=None):
+        """A stored project's state and what was written to it after generation ``since`` (default: everything)
+
+        Returns (generation, version, state, records, parts, whole): the
+        project state saved last, {ID: record} of the milestones and {name:
+        value} of the parts written after ``since``, and whether those are
+        all of them because the project was written whole since then; None
+        if it is not stored.
+        """
+        since = 0 if since is None else since
+        with self._lock:
+            # One read transaction, so the rows match the project row
+            self._conn.execute('BEGIN')
+            try:
+                row = self._conn.execute('SELECT generation, base_generation, version, state FROM projects '
+                                         'WHERE name = ?', (name,)).fetchone()
+                if row is None:
+                    return None
+                records = self._conn.execute(
+                    'SELECT uid, record FROM milestones WHERE project = ? AND generation > ?', (name, since)
+                ).fetchall()
+                parts = self._conn.execute(
+                    'SELECT part, value FROM project_parts WHERE project = ? AND generation > ?', (name, since)
+                ).fetchall()
+            finally:
+                self._conn.execute('COMMIT')
+        generation, base_generation, version, state = row
+        with _gc_paused():
+            return (generation, version, pickle.loads(state),
+                    {uid: pickle.loads(record) for uid, record in records},
+                    {part: pickle.loads(value) for part, value in parts},
+                    base_generation > since)
+
+    @contextmanager
+    def transaction(self):
+        """Hold the write lock of all workers; save, remove and set_active run inside it"""
+        with self._write_lock:
+            if self._in_transaction:
+                yield
+                return
+            self._writer.execute('BEGIN IMMEDIATE')
+            self._in_transaction = True
+            try:
+                yield
+                self._writer.execute('COMMIT')
+            except BaseException:
+                self._writer.execute('ROLLBACK')
+                # The process may hold changes that were not saved: report the stored state again
+                self._data_version = None
+                raise
+            finally:
+                self._in_transaction = False
+
+    def save(self, name, version, state, records=(), removed=(), parts=None, replace=False):
+        """Store a project's changes under the next generation, returning it
+
+        ``state`` (a dict with the milestone ``order``) replaces the stored
+        one, ``records`` are the milestones that were added or changed,
+        ``removed`` the IDs of those that were dropped and ``parts`` ({name:
+        value}) the context parts that changed. With ``replace``, the
+        project's stored milestones and parts are dropped first and the
+        project counts as written whole.
+        """
+        with _gc_paused():
+            data = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+            rows = [(record.get('id'), pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)) for record in records]
+            part_rows = [(part, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+                         for part, value in (parts or {}).items()]
+        with self.transaction():
+            generation = self._next_generation()
+            row = self._writer.execute('SELECT base_generation FROM projects WHERE name = ?', (name,)).fetchone()
+            base_generation = generation if replace or row is None else row[0]
+            if replace:
+                self._delete_rows(name)
+            elif removed:
+                self._writer.executemany('DELETE FROM milestones WHERE project = ? AND uid = ?',
+                                         [(name, uid) for uid in removed])
+            self._writer.executemany(
+                'INSERT OR REPLACE INTO milestones (project, uid, generation, record) VALUES (?, ?, ?, ?)',
+                [(name, uid, generation, record) for uid, record in rows]
+            )
+            self._writer.executemany(
+                'INSERT OR REPLACE INTO project_parts (project, part, generation, value) VALUES (?, ?, ?, ?)',
+                [(name, part, generation, value) for part, value in part_rows]
+            )
+            self._writer.execute(
+                'INSERT OR REPLACE INTO projects '
+                '(name, generation, base_generation, version, milestone_count, updated_at, state) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (name, generation, base_generation, version, len(state['order']), datetime.now().isoformat(), data)
+            )
+        self.logger.info(f"Saved {len(rows)} milestones of {name} as generation {generation} (version {version})")
+        return generation
+
+    def remove(self, name):
+        """Drop a stored project"""
+        with self.transaction():
+            self._writer.execute('DELETE FROM projects WHERE name = ?', (name,))
+            self._delete_rows(name)
+
+    def _delete_rows(self, name):
+        """Drop a project's milestones and parts (inside a transaction)"""
+        self._writer.execute('DELETE FROM milestones WHERE project = ?', (name,))
+        self._writer.execute('DELETE FROM project_parts WHERE project = ?', (name,))
+
+    def set_active(self, name):
+        """Record the project imported last"""
+        with self.transaction():
+            self._writer.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('active', ?)", (name,))
+
+    def save_job(self, job_id, created_at, job, keep):
+        """Store the state of an import job (ImportJob.to_dict), keeping the ``keep`` newest jobs"""
+        data = pickle.dumps(job, protocol=pickle.HIGHEST_PROTOCOL)
+        with self.transaction():
+            self._writer.execute('INSERT OR REPLACE INTO import_jobs (id, created_at, state) VALUES (?, ?, ?)',
+                                 (job_id, created_at.isoformat(), data))
+            self._writer.execute('DELETE FROM import_jobs WHERE id NOT IN '
+                                 '(SELECT id FROM import_jobs ORDER BY created_at DESC LIMIT ?)', (keep,))
+
+    def load_job(self, job_id):
+        """Stored state of an import job, None if unknown"""
+        with self._lock:
+            row = self._conn.execute('SELECT state FROM import_jobs WHERE id = ?', (job_id,)).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    def list_jobs(self):
+        """Stored states of all import jobs, oldest first"""
+        with self._lock:
+            rows = self._conn.execute('SELECT state FROM import_jobs ORDER BY created_at').fetchall()
+        return [pickle.loads(row[0]) for row in rows]
+
+    def _next_generation(self):
+        """Bump and return the store-wide generation counter (inside a transaction)"""
+        row = self._writer.execute("SELECT value FROM settings WHERE key = 'generation'").fetchone()
+        generation = int(row[0]) + 1 if row else 1
+        self._writer.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('generation', ?)",
+                             (str(generation),))
+        return generation
+
+    def close(self):
+        """Close the database connections"""
+        with self._write_lock, self._lock:
+            self._writer.close()
+            self._conn.close()
@@ -0,0 +1,277 @@
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+from milestone_record import DATE_FORMAT, format_date, to_datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    project TEXT NOT NULL,
+    status_date TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    version INTEGER,
+    taken_at TEXT NOT NULL,
+    milestone_count INTEGER NOT NULL,
+    sv_t_sum REAL NOT NULL DEFAULT 0,
+    sv_t_count INTEGER NOT NULL DEFAULT 0,
+    spi_t_sum REAL NOT NULL DEFAULT 0,
+    spi_t_count INTEGER NOT NULL DEFAULT 0,
+    behind_schedule INTEGER NOT NULL DEFAULT 0,
+    high_risk INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (project, status_date)
+);
+CREATE TABLE IF NOT EXISTS milestone_snapshots (
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots(id) ON DELETE CASCADE,
+    project TEXT NOT NULL,
+    uid INTEGER NOT NULL,
+    status_date TEXT NOT NULL,
+    percent_complete REAL,
+    sv_t REAL,
+    spi_t REAL,
+    tspi REAL,
+    baseline_finish TEXT,
+    forecast_finish TEXT,
+    status TEXT,
+    risk TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_milestone_snapshots_uid
+    ON milestone_snapshots (project, uid, status_date);
+CREATE INDEX IF NOT EXISTS ix_milestone_snapshots_date
+    ON milestone_snapshots (project, status_date);
+CREATE INDEX IF NOT EXISTS ix_milestone_snapshots_snapshot
+    ON milestone_snapshots (snapshot_id);
+CREATE INDEX IF NOT EXISTS ix_snapshots_date
+    ON snapshots (status_date);
+"""
+
+# Per-milestone columns stored with every snapshot
+SNAPSHOT_FIELDS = ('percent_complete', 'sv_t', 'spi_t', 'tspi', 'baseline_finish', 'forecast_finish', 'status', 'risk')
+
+
+class SnapshotStore:
+    """History of milestone forecasts per project and status date, in SQLite
+
+    Every import or forecast is saved as a snapshot: one row per milestone
+    with its progress and ES metrics, keyed by project, UniqueID and status
+    date. Re-saving the same project and status date replaces the earlier
+    snapshot. Milestone rows repeat the project and status date so the
+    trend of one milestone and the state of a project on a date are both
+    answered from an index without joins or replaying backups. Each
+    snapshot row also stores the totals of its milestones, so summaries by
+    week never touch the milestone rows. The database (and its directory)
+    is only created when the first snapshot is saved or read.
+    """
+
+    def __init__(self, path='snapshots.db'):
+        """Initialize the store; the database is opened on first use"""
+        self.path = path
+        self.logger = logging.getLogger('SnapshotStore')
+        self._lock = threading.Lock()
+        self._db = None
+
+    @property
+    def _conn(self):
+        """Connection to the snapshot database, opened (and created if needed) on first use"""
+        if self._db is None:
+            directory = os.path.dirname(self.path) if self.path != ':memory:' else ''
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            if self.path != ':memory:':
+                conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            conn.executescript(SCHEMA)
+            self._db = conn
+        return self._db
+
+    def save(self, project, status_date, milestones, kind='forecast', version=None):
+        """Save the milestones of a project as its snapshot for a status date
+
+        Returns the snapshot id.
+        """
+        status_key = self._date_key(status_date)
+        totals = self._totals(milestones)
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM snapshots WHERE project = ? AND status_date = ?', (project, status_key))
+            cursor = self._conn.execute(
+                'INSERT INTO snapshots (project, status_date, kind, version, taken_at, milestone_count, sv_t_sum, '
+                'sv_t_count, spi_t_sum, spi_t_count, behind_schedule, high_risk) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (project, status_key, kind, version, datetime.now().strftime(DATE_FORMAT), len(milestones)) + totals
+            )
+            snapshot_id = cursor.lastrowid
+            self._conn.executemany(
+                'INSERT INTO milestone_snapshots (snapshot_id, project, uid, status_date, percent_complete, sv_t, '
+                'spi_t, tspi, baseline_finish, forecast_finish, status, risk) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (self._row(snapshot_id, project, status_key, m) for m in milestones)
+            )
+        self.logger.info(f"Saved {kind} snapshot of {len(milestones)} milestones for {project} at {status_key}")
+        return snapshot_id
+
+    def snapshots(self, project=None, since=None, until=None):
+        """Snapshots taken, optionally for one project and a status date range"""
+        clauses, params = self._range(since, until)
+        if project is not None:
+            clauses.append('project = ?')
+            params.append(project)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        rows = self._query(
+            f'SELECT id, project, status_date, kind, version, taken_at, milestone_count FROM snapshots {where} '
+            'ORDER BY status_date, project',
+            params
+        )
+        return [dict(row) for row in rows]
+
+    def milestone_trend(self, project, uid, since=None, until=None):
+        """Metrics of one milestone at every saved status date, oldest first"""
+        clauses, params = self._range(since, until)
+        clauses[:0] = ['project = ?', 'uid = ?']
+        params[:0] = [project, uid]
+        rows = self._query(
+            f"SELECT status_date, {', '.join(SNAPSHOT_FIELDS)} FROM milestone_snapshots "
+            f"WHERE {' AND '.join(clauses)} ORDER BY status_date",
+            params
+        )
+        return [dict(row) for row in rows]
+
+    def forecast_history(self, project, since=None, until=None):
+        """Saved forecasts of open milestones as (status_date, uid, forecast_finish) rows, oldest first"""
+        clauses, params = self._range(since, until)
+        clauses[:0] = ['project = ?', 'forecast_finish IS NOT NULL', "status != 'Complete'"]
+        params[:0] = [project]
+        rows = self._query(
+            f"SELECT status_date, uid, forecast_finish FROM milestone_snapshots "
+            f"WHERE {' AND '.join(clauses)} ORDER BY status_date",
+            params
+        )
+        return [tuple(row) for row in rows]
+
+    def progress_history(self, project, since=None, until=None):
+        """Recorded percent complete as (status_date, uid, percent_complete) rows, oldest first"""
+        clauses, params = self._range(since, until)
+        clauses[:0] = ['project = ?', 'percent_complete IS NOT NULL']
+        params[:0] = [project]
+        rows = self._query(
+            f"SELECT status_date, uid, percent_complete FROM milestone_snapshots "
+            f"WHERE {' AND '.join(clauses)} ORDER BY status_date",
+            params
+        )
+        return [tuple(row) for row in rows]
+
+    def spi_history(self, project, since=None, until=None):
+        """Average SPI(t) of a project at every saved status date, oldest first"""
+        clauses, params = self._range(since, until)
+        clauses[:0] = ['project = ?', 'spi_t_count > 0']
+        params[:0] = [project]
+        rows = self._query(
+            f"SELECT spi_t_sum / spi_t_count AS spi_t FROM snapshots WHERE {' AND '.join(clauses)} "
+            'ORDER BY status_date',
+            params
+        )
+        return [row['spi_t'] for row in rows]
+
+    def weekly_summary(self, project=None, since=None, until=None):
+        """SV(t) and SPI(t) per project and week, from the last snapshot of each week
+
+        Weeks start on Monday. Milestones without metrics are left out of the
+        averages but counted in 'milestones'.
+        """
+        clauses, params = self._range(since, until)
+        if project is not None:
+            clauses.append('project = ?')
+            params.append(project)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        rows = self._query(
+            f"""
+            WITH weekly AS (
+                SELECT project, date(status_date, '-6 days', 'weekday 1') AS week, MAX(status_date) AS status_date
+                FROM snapshots {where}
+                GROUP BY project, week
+            )
+            SELECT w.project, w.week, w.status_date, s.milestone_count, s.sv_t_sum, s.sv_t_count,
+                   s.spi_t_sum, s.spi_t_count, s.behind_schedule, s.high_risk
+            FROM weekly w
+            JOIN snapshots s ON s.project = w.project AND s.status_date = w.status_date
+            ORDER BY w.week, w.project
+            """,
+            params
+        )
+        return [{
+            'project': row['project'],
+            'week': row['week'],
+            'status_date': row['status_date'],
+            'milestones': row['milestone_count'],
+            'avg_sv_t': round(row['sv_t_sum'] / row['sv_t_count'], 2) if row['sv_t_count'] else None,
+            'avg_spi_t': round(row['spi_t_sum'] / row['spi_t_count'], 2) if row['spi_t_count'] else None,
+            'behind_schedule': row['behind_schedule'],
+            'high_risk': row['high_risk']
+        } for row in rows]
+
+    def since_weeks(self, weeks, until=None):
+        """Status date key of the start of a window of the last N weeks"""
+        until = to_datetime(until) if until is not None else datetime.now()
+        return self._date_key(until - timedelta(weeks=weeks))
+
+    def close(self):
+        """Close the database"""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _query(self, sql, params):
+        """Run a read query and return all rows"""
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _range(self, since, until):
+        """WHERE clauses and parameters for a status date range"""
+        clauses, params = [], []
+        if since is not None:
+            clauses.append('status_date >= ?')
+            params.append(self._date_key(since))
+        if until is not None:
+            clauses.append('status_date <= ?')
+            params.append(self._date_key(until))
+        return clauses, params
+
+    def _date_key(self, value):
+        """Status date as the sortable text stored in the database"""
+        date = to_datetime(value)
+        if date is None:
+            raise ValueError(f'Invalid status date: {value}')
+        return date.strftime(DATE_FORMAT)
+
+    def _totals(self, milestones):
+        """Per-snapshot totals: SV(t) sum/count, SPI(t) sum/count, behind schedule and high risk counts"""
+        sv_t_sum = spi_t_sum = 0.0
+        sv_t_count = spi_t_count = behind_schedule = high_risk = 0
+        for m in milestones:
+            sv_t = m.get('sv_t')
+            if sv_t is not None:
+                sv_t_sum += sv_t
+                sv_t_count += 1
+                percent_complete = m.get('percent_complete')
+                if sv_t < 0 and percent_complete is not None and percent_complete < 100:
+                    behind_schedule += 1
+            spi_t = m.get('spi_t')
+            if spi_t is not None:
+                spi_t_sum += spi_t
+                spi_t_count += 1
+            if m.get('risk') == 'High':
+                high_risk += 1
+        return (sv_t_sum, sv_t_count, spi_t_sum, spi_t_count, behind_schedule, high_risk)
+
+    def _row(self, snapshot_id, project, status_key, milestone):
+        """Database row for one milestone of a snapshot"""
+        return (
+            snapshot_id, project, milestone.get('id'), status_key,
+            milestone.get('percent_complete'), milestone.get('sv_t'), milestone.get('spi_t'), milestone.get('tspi'),
+            format_date(milestone.get('baseline_finish')), format_date(milestone.get('forecast_finish')),
+            milestone.get('status'), milestone.get('risk')
+        )
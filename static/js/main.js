@@ -9,6 +9,11 @@ document.addEventListener('DOMContentLoaded', function() {
     const connectionStatus = document.getElementById('connection-status');
     const lastImportTime = document.getElementById('last-import-time');
     const milestonesTable = document.getElementById('milestones-table');
+    const milestoneSort = document.getElementById('milestone-sort');
+    const milestoneRiskFilter = document.getElementById('milestone-risk-filter');
+    const milestoneNameFilter = document.getElementById('milestone-name-filter');
+    const milestonesLoadMore = document.getElementById('milestones-load-more');
+    const milestonesShown = document.getElementById('milestones-shown');
     const dashboardSummary = document.getElementById('dashboard-summary');
     
     // Bootstrap modal elements
@@ -35,14 +40,41 @@ document.addEventListener('DOMContentLoaded', function() {
     // Store located milestones for later use
     let locatedMilestones = [];
     
+    // State kept in sync by live update events
+    let currentProject = null;
+    let milestonesVersion = null;
+    let liveUpdates = null;
+    const milestoneRows = new Map();
+    
+    // Timeline chart: points are downsampled on the server for the zoomed baseline range
+    const TIMELINE_POINTS = 500;
+    let timelineRange = null;
+    let timelineZoomBound = false;
+    // Live updates and zooming can fire in bursts; load the timeline once they settle
+    const refreshTimeline = debounce(() => fetchTimeline(), 250);
+    
+    // Milestone table paging: rows are loaded a page at a time from the server
+    const MILESTONE_PAGE_SIZE = 200;
+    let milestonesNextPage = null;
+    let milestonesNextCursor = null;
+    let milestonesHasMore = false;
+    let milestonesTotal = 0;
+    
     // Event listeners
     importBtn.addEventListener('click', importFromMSProject);
     checkConnectionBtn.addEventListener('click', checkMSProjectStatus);
     locateMilestonesBtn.addEventListener('click', locateMilestones);
     importLocatedBtn.addEventListener('click', importLocatedMilestones);
+    milestoneSort.addEventListener('change', () => fetchMilestones());
+    milestoneRiskFilter.addEventListener('change', () => fetchMilestones());
+    milestoneNameFilter.addEventListener('input', debounce(() => fetchMilestones(), 300));
+    milestonesLoadMore.addEventListener('click', () => fetchMilestones(true));
     
     // Initial data load (if any exists from previous session)
-    fetchMilestones();
+    reloadAll();
+    
+    // Receive milestone and summary changes as they happen
+    connectLiveUpdates();
     
     // Functions
     async function checkMSProjectStatus() {
@@ -232,14 +264,21 @@ document.addEventListener('DOMContentLoaded', function() {
             statusModal.show();
             
             // Call import API
+            // The milestones are reloaded a page at a time; columns keep the import response small
             const response = await fetch('/api/import-from-msproject', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json'
-                }
+                },
+                body: JSON.stringify({format: 'columns'})
             });
             
-            const data = await response.json();
+            let data = await response.json();
+            
+            // COM imports run as background jobs; wait for the job to finish
+            if (response.status === 202 && data.job) {
+                data = await waitForImportJob(data.job);
+            }
             
             if (data.status === 'success') {
                 // Update connection status
@@ -254,10 +293,15 @@ document.addEventListener('DOMContentLoaded', function() {
                 // Close modal
                 statusModal.hide();
                 
-                // Refresh data display
-                await fetchMilestones();
-                await calculateForecasts();
-                await updateDashboard();
+                // Refresh data display; with live updates connected, changes to
+                // the displayed project arrive as events
+                if (!liveUpdates || data.project !== currentProject) {
+                    await reloadAll();
+                    if (!liveUpdates) {
+                        await calculateForecasts();
+                        await updateDashboard();
+                    }
+                }
             } else if (data.status === 'warning') {
                 // Show warning in modal
                 loadingSpinner.style.display = 'none';
@@ -285,16 +329,86 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
     
-    async function fetchMilestones() {
+    async function waitForImportJob(job) {
+        // Poll the import job, showing its progress, until it has finished
+        while (job.status === 'queued' || job.status === 'running') {
+            const progress = job.progress || {};
+            if (job.status === 'running' && progress.total) {
+                loadingMessage.textContent = `Reading milestones from MS Project... ${progress.scanned} of ${progress.total} tasks`;
+            } else if (job.status === 'queued') {
+                loadingMessage.textContent = 'Waiting for MS Project...';
+            }
+            
+            await new Promise(resolve => setTimeout(resolve, 500));
+            const response = await fetch(`/api/import-jobs/${job.id}`);
+            job = await response.json();
+            if (!response.ok) {
+                throw new Error(job.message || 'Import job not found');
+            }
+        }
+        
+        if (job.status === 'failed') {
+            throw new Error(job.error || 'Failed to import from MS Project');
+        }
+        return job.result;
+    }
+    
+    async function reloadAll() {
+        // Load the first page of milestones and the dashboard of the active project
+        await fetchMilestones();
+        await updateDashboard();
+    }
+    
+    function milestoneQuery(more) {
+        // Sort and filters of the table as /api/milestones query parameters
+        const params = new URLSearchParams({limit: MILESTONE_PAGE_SIZE});
+        const [sort, order] = milestoneSort.value.split(':');
+        if (sort) {
+            params.set('sort', sort);
+            params.set('order', order || 'asc');
+        }
+        if (milestoneRiskFilter.value) params.set('risk', milestoneRiskFilter.value);
+        if (milestoneNameFilter.value.trim()) params.set('name', milestoneNameFilter.value.trim());
+        if (more) {
+            // Later pages come from the same project; a fresh query follows the active one
+            if (currentProject !== null) params.set('project', currentProject);
+            if (milestonesNextCursor) {
+                params.set('cursor', milestonesNextCursor);
+            } else {
+                params.set('page', milestonesNextPage);
+            }
+        }
+        return params;
+    }
+    
+    function isDefaultView() {
+        // Unsorted and unfiltered: new milestones belong at the end of the table
+        return !milestoneSort.value && !milestoneRiskFilter.value && !milestoneNameFilter.value.trim();
+    }
+    
+    async function fetchMilestones(more = false) {
         try {
-            const response = await fetch('/api/milestones');
-            const milestones = await response.json();
+            const response = await fetch(`/api/milestones?${milestoneQuery(more)}`);
+            const data = await response.json();
+            if (data.status === 'error') throw new Error(data.message);
             
-            if (milestones && milestones.length > 0) {
-                renderMilestonesTable(milestones);
+            if (data.project !== undefined) currentProject = data.project;
+            milestonesVersion = data.version;
+            milestonesHasMore = data.has_more;
+            milestonesNextCursor = data.next_cursor;
+            milestonesNextPage = (data.page || 1) + 1;
+            milestonesTotal = data.total;
+            
+            if (more) {
+                appendMilestoneRows(data.items);
+            } else {
+                renderMilestonesTable(data.items);
+            }
+            updatePagingControls();
+            if (milestonesTotal > 0 || !isDefaultView()) {
                 dashboardSummary.style.display = 'flex';
-                return milestones;
             }
+            return data.items;
         } catch (error) {
             console.error('Error fetching milestones:', error);
         }
@@ -302,19 +416,72 @@ document.addEventListener('DOMContentLoaded', function() {
         return [];
     }
     
+    function updatePagingControls() {
+        milestonesLoadMore.style.display = milestonesHasMore ? 'inline-block' : 'none';
+        milestonesShown.textContent = milestonesTotal > 0
+            ? `Showing ${milestoneRows.size} of ${milestonesTotal} milestones`
+            : '';
+    }
+    
+    function debounce(func, wait) {
+        let timer = null;
+        return (...args) => {
+            clearTimeout(timer);
+            timer = setTimeout(() => func(...args), wait);
+        };
+    }
+    
+    function connectLiveUpdates() {
+        if (!window.EventSource) return;
+        
+        // The browser reconnects on its own and resumes from the last event id
+        liveUpdates = new EventSource('/api/events');
+        liveUpdates.addEventListener('milestones', event => applyMilestonesEvent(JSON.parse(event.data)));
+        liveUpdates.addEventListener('summary', event => applySummaryEvent(JSON.parse(event.data)));
+        liveUpdates.addEventListener('project_removed', event => {
+            if (JSON.parse(event.data).project === currentProject) reloadAll();
+        });
+        liveUpdates.addEventListener('reset', () => reloadAll());
+    }
+    
+    function applyMilestonesEvent(delta) {
+        if (currentProject !== null && delta.project !== currentProject) return;
+        if (milestonesVersion !== null && delta.version <= milestonesVersion) return;
+        
+        // A gap in versions means events were missed: reload instead of patching
+        if (milestonesVersion === null || delta.base_version !== milestonesVersion) {
+            reloadAll();
+            return;
+        }
+        
+        patchMilestoneRows(delta.changed, delta.removed);
+        milestonesVersion = delta.version;
+        currentProject = delta.project;
+        dashboardSummary.style.display = 'flex';
+    }
+    
+    function applySummaryEvent(data) {
+        if (currentProject !== null && data.project !== currentProject) return;
+        
+        updateSummary(data.summary);
+        refreshTimeline();
+    }
+    
     async function calculateForecasts() {
         try {
             const response = await fetch('/api/calculate-forecast', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json'
-                }
+                },
+                body: JSON.stringify({format: 'columns'})
             });
             
             const data = await response.json();
             
             if (data.status === 'success') {
-                renderMilestonesTable(data.forecasts);
+                // Reload the displayed page rather than rendering every forecast
+                await fetchMilestones();
                 return data.forecasts;
             }
         } catch (error) {
@@ -326,81 +493,160 @@ document.addEventListener('DOMContentLoaded', function() {
     
     async function updateDashboard() {
         try {
-            const response = await fetch('/api/dashboard-data');
+            // The table pages through /api/milestones and the chart through
+            // /api/timeline, so only the summary is needed here
+            const response = await fetch('/api/dashboard-data?fields=summary');
             const data = await response.json();
             
             // Update summary
             if (data.summary) {
-                totalMilestones.textContent = data.summary.total_milestones;
-                avgSpi.textContent = data.summary.avg_spi_t.toFixed(2);
-                behindCount.textContent = data.summary.behind_schedule;
-                highRiskCount.textContent = data.summary.high_risk;
+                updateSummary(data.summary);
             }
             
             // Generate timeline chart
-            if (data.timeline && data.timeline.length > 0) {
-                renderTimelineChart(data.timeline);
-            }
+            timelineRange = null;
+            await fetchTimeline();
         } catch (error) {
             console.error('Error updating dashboard:', error);
         }
     }
     
+    async function fetchTimeline() {
+        try {
+            const params = new URLSearchParams({points: TIMELINE_POINTS});
+            if (currentProject !== null) params.set('project', currentProject);
+            if (timelineRange) {
+                params.set('start', toDateParam(timelineRange[0]));
+                params.set('end', toDateParam(timelineRange[1]));
+            }
+            
+            const response = await fetch(`/api/timeline?${params}`);
+            if (!response.ok) return;
+            const data = await response.json();
+            
+            if (data.timeline.length > 0 || timelineRange) {
+                renderTimelineChart(data.timeline, data.downsampled ? data.total : null);
+            }
+        } catch (error) {
+            console.error('Error loading timeline:', error);
+        }
+    }
+    
+    function toDateParam(value) {
+        // Plotly ranges look like '2024-03-01 12:34:56.789'; the API takes whole seconds
+        const text = String(value).replace('T', ' ');
+        return text.length >= 19 ? text.slice(0, 19) : text.slice(0, 10);
+    }
+    
+    function updateSummary(summary) {
+        totalMilestones.textContent = summary.total_milestones;
+        avgSpi.textContent = summary.avg_spi_t.toFixed(2);
+        behindCount.textContent = summary.behind_schedule;
+        highRiskCount.textContent = summary.high_risk;
+    }
+    
     function renderMilestonesTable(milestones) {
-        if (!milestones || milestones.length === 0) return;
-        
         // Clear table
         const tbody = milestonesTable.querySelector('tbody');
         tbody.innerHTML = '';
+        milestoneRows.clear();
         
-        // Add rows
-        milestones.forEach(milestone => {
+        if (!milestones || milestones.length === 0) {
             const row = document.createElement('tr');
-            
-            // Status indicator for name column
-            let statusClass = '';
-            if (milestone.status === 'Complete') {
-                statusClass = 'status-complete';
-            } else if (milestone.status === 'In Progress') {
-                statusClass = 'status-in-progress';
+            row.innerHTML = `<td colspan="8" class="text-center">${isDefaultView()
+                ? 'No milestone data available. Import from MS Project first.'
+                : 'No milestones match the filters.'}</td>`;
+            tbody.appendChild(row);
+            return;
+        }
+        
+        // Add rows
+        appendMilestoneRows(milestones);
+    }
+    
+    function appendMilestoneRows(milestones) {
+        const tbody = milestonesTable.querySelector('tbody');
+        (milestones || []).forEach(milestone => {
+            const row = buildMilestoneRow(milestone);
+            milestoneRows.set(String(milestone.id), row);
+            tbody.appendChild(row);
+        });
+    }
+    
+    function patchMilestoneRows(changed, removed) {
+        // Replace or drop only the displayed rows of milestones that changed.
+        // New milestones are appended when the whole unfiltered list is shown;
+        // in a sorted or filtered view they appear on the next query.
+        const tbody = milestonesTable.querySelector('tbody');
+        (changed || []).forEach(milestone => {
+            const id = String(milestone.id);
+            const existing = milestoneRows.get(id);
+            if (!existing && (milestonesHasMore || !isDefaultView())) return;
+            const row = buildMilestoneRow(milestone);
+            if (existing) {
+                existing.replaceWith(row);
             } else {
-                statusClass = 'status-not-started';
+                if (milestoneRows.size === 0) tbody.innerHTML = '';
+                tbody.appendChild(row);
+                milestonesTotal += 1;
             }
-            
-            // SV(t) styling
-            const svClass = milestone.sv_t < 0 ? 'sv-negative' : 'sv-positive';
-            
-            // Risk styling
-            let riskClass = '';
-            if (milestone.risk === 'High') {
-                riskClass = 'risk-high';
-            } else if (milestone.risk === 'Medium') {
-                riskClass = 'risk-medium';
-            } else if (milestone.risk === 'Low') {
-                riskClass = 'risk-low';
+            milestoneRows.set(id, row);
+        });
+        (removed || []).forEach(uid => {
+            const id = String(uid);
+            const existing = milestoneRows.get(id);
+            if (existing) {
+                existing.remove();
+                milestonesTotal -= 1;
             }
-            
-            row.innerHTML = `
-                <td><span class="status-indicator ${statusClass}"></span> ${milestone.name}</td>
-                <td>${formatDate(milestone.baseline_finish)}</td>
-                <td>${formatDate(milestone.forecast_finish || milestone.actual_finish)}</td>
-                <td>${milestone.status}</td>
-                <td class="${svClass}">${milestone.sv_t !== null ? milestone.sv_t : 'N/A'}</td>
-                <td>${milestone.spi_t !== null ? milestone.spi_t : 'N/A'}</td>
-                <td>${milestone.tspi !== null ? milestone.tspi : 'N/A'}</td>
-                <td class="${riskClass}">${milestone.risk || 'N/A'}</td>
-            `;
-            
-            tbody.appendChild(row);
+            milestoneRows.delete(id);
         });
+        updatePagingControls();
     }
     
-    function renderTimelineChart(timelineData) {
-        // Sort milestones by baseline date
-        timelineData.sort((a, b) => {
-            return new Date(a.baseline) - new Date(b.baseline);
-        });
+    function buildMilestoneRow(milestone) {
+        const row = document.createElement('tr');
+        row.dataset.id = milestone.id;
         
+        // Status indicator for name column
+        let statusClass = '';
+        if (milestone.status === 'Complete') {
+            statusClass = 'status-complete';
+        } else if (milestone.status === 'In Progress') {
+            statusClass = 'status-in-progress';
+        } else {
+            statusClass = 'status-not-started';
+        }
+        
+        // SV(t) styling
+        const svClass = milestone.sv_t < 0 ? 'sv-negative' : 'sv-positive';
+        
+        // Risk styling
+        let riskClass = '';
+        if (milestone.risk === 'High') {
+            riskClass = 'risk-high';
+        } else if (milestone.risk === 'Medium') {
+            riskClass = 'risk-medium';
+        } else if (milestone.risk === 'Low') {
+            riskClass = 'risk-low';
+        }
+        
+        row.innerHTML = `
+            <td><span class="status-indicator ${statusClass}"></span> ${milestone.name}</td>
+            <td>${formatDate(milestone.baseline_finish)}</td>
+            <td>${formatDate(milestone.forecast_finish || milestone.actual_finish)}</td>
+            <td>${milestone.status}</td>
+            <td class="${svClass}">${milestone.sv_t !== null ? milestone.sv_t : 'N/A'}</td>
+            <td>${milestone.spi_t !== null ? milestone.spi_t : 'N/A'}</td>
+            <td>${milestone.tspi !== null ? milestone.tspi : 'N/A'}</td>
+            <td class="${riskClass}">${milestone.risk || 'N/A'}</td>
+        `;
+        
+        return row;
+    }
+    
+    function renderTimelineChart(timelineData, total) {
+        // Entries arrive sorted by baseline date
         const milestoneNames = timelineData.map(m => m.name);
         const baselineDates = timelineData.map(m => m.baseline);
         const forecastDates = timelineData.map(m => m.forecast || m.actual);
@@ -434,10 +680,14 @@ document.addEventListener('DOMContentLoaded', function() {
         ];
         
         const layout = {
-            title: 'Milestone Timeline: Baseline vs Forecast',
+            title: total
+                ? `Milestone Timeline: Baseline vs Forecast (${timelineData.length} of ${total} milestones, largest variances per period)`
+                : 'Milestone Timeline: Baseline vs Forecast',
             xaxis: {
                 title: 'Date',
-                type: 'date'
+                type: 'date',
+                range: timelineRange || undefined,
+                autorange: !timelineRange
             },
             yaxis: {
                 title: 'Milestones',
@@ -454,7 +704,25 @@ document.addEventListener('DOMContentLoaded', function() {
             }
         };
         
-        Plotly.newPlot('timeline-chart', plotData, layout);
+        // react() only redraws what differs from the current chart
+        Plotly.react('timeline-chart', plotData, layout);
+        
+        if (!timelineZoomBound) {
+            // Zooming asks the server for the points of the new range
+            document.getElementById('timeline-chart').on('plotly_relayout', event => {
+                if (event['xaxis.autorange']) {
+                    timelineRange = null;
+                } else if (event['xaxis.range[0]'] !== undefined) {
+                    timelineRange = [event['xaxis.range[0]'], event['xaxis.range[1]']];
+                } else if (event['xaxis.range']) {
+                    timelineRange = event['xaxis.range'].slice();
+                } else {
+                    return;
+                }
+                refreshTimeline();
+            });
+            timelineZoomBound = true;
+        }
     }
     
     // Helper functions
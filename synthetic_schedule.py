@@ -0,0 +1,103 @@
+import random
+from datetime import datetime, timedelta
+
+from milestone_record import DATE_FORMAT, Milestone
+
+# Project calendar of generated schedules
+PROJECT_START = datetime(2024, 1, 1, 8, 0, 0)
+STATUS_DATE = datetime(2025, 1, 1)
+
+# Date values real exports contain that are not dates
+BAD_DATES = ('NA', 'TBD', '2024-13-45', '31/02/2024', '')
+
+
+def generate_milestones(count, seed=0, missing_baseline_ratio=0.03, bad_date_ratio=0.01,
+                        unknown_progress_ratio=0.002, status_date=STATUS_DATE):
+    """Synthetic milestone dicts, shaped like an import with string dates
+
+    The schedule runs over two years from PROJECT_START in WBS phases of up
+    to 100 milestones. Milestones due before ``status_date`` are mostly
+    complete, some late and in progress; later ones are partly started or
+    not started. A share of rows has no baseline, an unparseable date or no
+    percent complete, as exports from real schedules do. The same seed
+    always gives the same schedule.
+    """
+    rng = random.Random(seed)
+    span = (status_date - PROJECT_START).days * 2
+    milestones = []
+    for i in range(1, count + 1):
+        phase_start = PROJECT_START + timedelta(days=rng.randint(0, span // 2))
+        baseline_finish = phase_start + timedelta(days=rng.randint(5, span // 2), hours=9)
+        slip = timedelta(days=int(rng.gauss(5, 15)))
+
+        if baseline_finish + slip <= status_date and rng.random() < 0.85:
+            percent_complete = 100
+        elif phase_start <= status_date:
+            percent_complete = rng.choice([0, 10, 25, 50, 75, 90])
+        else:
+            percent_complete = 0
+
+        milestone = {
+            'id': i,
+            'wbs': f'1.{i // 100 + 1}.{i % 100 + 1}',
+            'name': f'Milestone {i}',
+            'percent_complete': percent_complete,
+            'start_date': _format(baseline_finish + slip),
+            'finish_date': _format(baseline_finish + slip),
+            'baseline_start': _format(phase_start),
+            'baseline_finish': _format(baseline_finish),
+            'actual_start': _format(baseline_finish + slip) if percent_complete > 0 else None,
+            'actual_finish': _format(baseline_finish + slip) if percent_complete == 100 else None,
+            'notes': ''
+        }
+
+        roll = rng.random()
+        if roll < missing_baseline_ratio:
+            milestone['baseline_start'] = milestone['baseline_finish'] = None
+        elif roll < missing_baseline_ratio + bad_date_ratio:
+            field = rng.choice(('baseline_start', 'baseline_finish', 'actual_finish'))
+            milestone[field] = rng.choice(BAD_DATES)
+        elif roll < missing_baseline_ratio + bad_date_ratio + unknown_progress_ratio:
+            milestone['percent_complete'] = None
+        milestones.append(milestone)
+    return milestones
+
+
+def generate_records(count, seed=0, **options):
+    """generate_milestones as typed Milestone records (unparseable dates become None)"""
+    return [Milestone.from_dict(milestone) for milestone in generate_milestones(count, seed, **options)]
+
+
+def generate_network(count, seed=0, chain_length=100):
+    """Synthetic dependency network records, as the importers' extract_schedule_tasks returns them
+
+    Tasks of one to ten days follow each other in chains of
+    ``chain_length``; every twentieth task is a milestone that also waits
+    two days on the milestone at the same place in the previous chain.
+    """
+    rng = random.Random(seed)
+    tasks = []
+    finish = PROJECT_START
+    for i in range(1, count + 1):
+        position = (i - 1) % chain_length
+        if position == 0:
+            finish = PROJECT_START + timedelta(days=rng.randint(0, 60))
+        milestone = i % 20 == 0
+        start = finish
+        finish = start + timedelta(days=0 if milestone else rng.randint(1, 10))
+        predecessors = [(i - 1, 'FS', 0.0)] if position else []
+        if milestone and i > chain_length:
+            predecessors.append((i - chain_length, 'FS', 2.0))
+        tasks.append({
+            'id': i,
+            'start': start,
+            'finish': finish,
+            'actual_finish': finish if finish < STATUS_DATE and rng.random() < 0.8 else None,
+            'predecessors': predecessors
+        })
+    return tasks
+
+
+def _format(value):
+    """Date string as written by the importers"""
+    return value.strftime(DATE_FORMAT)
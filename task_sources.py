@@ -0,0 +1,208 @@
+import logging
+
+from instrumentation import metrics
+
+# Task fields read for every milestone, in the order _extract_task_data uses them
+MILESTONE_FIELDS = (
+    'UniqueID', 'WBS', 'Name', 'PercentComplete',
+    'Start', 'Finish', 'BaselineStart', 'BaselineFinish',
+    'ActualStart', 'ActualFinish', 'Notes'
+)
+
+# Task fields read for every work task on each import: progress for the project's earned value,
+# dates and links for its dependency network (ActualFinish is only read from finished tasks)
+SCHEDULE_FIELDS = ('UniqueID', 'PercentComplete', 'Start', 'Finish', 'UniqueIDPredecessors')
+
+# Task fields read in addition when the planned value curve has to be built
+BASELINE_FIELDS = ('BaselineStart', 'BaselineFinish', 'BaselineCost', 'BaselineWork')
+
+# Values used when a field cannot be read from a task
+FIELD_DEFAULTS = {
+    'WBS': '',
+    'PercentComplete': 0,
+    'Notes': '',
+    'UniqueIDPredecessors': '',
+    'BaselineCost': 0,
+    'BaselineWork': 0
+}
+
+# Name of the task filter COMTaskSource defines in the project for milestones
+MILESTONE_FILTER_NAME = 'ES Forecast Milestones'
+
+
+class COMTaskSource:
+    """Reads milestone tasks from an MS Project COM object in few round trips
+
+    Every property read on a COM task is a cross-process call, so this class
+    only reads the fields it needs and decides whether a task is a milestone
+    with as few reads as possible. Two strategies are available:
+
+    - 'filter': define and apply a Project task filter matching milestones,
+      select all visible tasks and read only those. The number of round trips
+      no longer depends on the number of non-milestone tasks. The user's
+      current filter is restored afterwards.
+    - 'scan': walk every task, reading Milestone, Summary, Duration and Name
+      only until the task is classified.
+
+    'auto' tries 'filter' and falls back to 'scan' if Project refuses it
+    (e.g. no active window). Both classify milestones like the original scan:
+    the Milestone flag, a zero duration or 'milestone' in the name, skipping
+    summary tasks. The filter additionally hides summary tasks that carry the
+    Milestone flag.
+    """
+
+    def __init__(self, project, app=None, strategy='auto', logger=None):
+        """Initialize the source for a COM project (and its application for filtering)"""
+        self.project = project
+        self.app = app
+        self.strategy = strategy
+        self.logger = logger or logging.getLogger('COMTaskSource')
+        self.match_counts = {'flag': 0, 'duration': 0, 'name': 0, 'filter': 0}
+        self.tasks_scanned = 0
+        self.task_count = None
+
+    def iter_milestones(self, fields=MILESTONE_FIELDS, progress=None):
+        """Yield a dict of raw field values for each milestone task
+
+        ``progress`` is called as progress(scanned, total) while scanning.
+        """
+        if self.strategy in ('filter', 'auto') and self.app is not None:
+            try:
+                tasks = self._filtered_tasks()
+            except Exception as e:
+                if self.strategy == 'filter':
+                    raise
+                self.logger.warning(f"Milestone filter unavailable, scanning all tasks: {str(e)}")
+            else:
+                yield from self._read_filtered(tasks, fields, progress)
+                return
+
+        yield from self._scan(fields, progress)
+
+    def iter_tasks(self, fields, progress=None):
+        """Yield (task, dict of raw field values) for each work task and milestone, skipping summary tasks
+
+        Each task costs one Summary read besides the requested fields; more
+        fields can be read from the task with read_fields.
+        """
+        tasks = self.project.Tasks
+        self.task_count = tasks.Count
+        metrics.count('com_calls_total', 2)
+
+        for i in range(1, self.task_count + 1):
+            task = tasks(i)
+            metrics.count('com_calls_total')
+            self.tasks_scanned = i
+            if progress:
+                progress(i, self.task_count)
+            if task is None or self._get(task, 'Summary', False):
+                continue
+            yield task, self.read_fields(task, fields)
+
+    def read_fields(self, task, fields=MILESTONE_FIELDS, known=None):
+        """Read the given fields from a task, one COM call per field not already known"""
+        values = dict(known or {})
+        reads = 0
+        try:
+            for field in fields:
+                if field in values:
+                    continue
+                reads += 1
+                try:
+                    values[field] = getattr(task, field)
+                except Exception as e:
+                    if field in ('UniqueID', 'Name'):
+                        raise
+                    self.logger.warning(f"Could not get property {field}: {str(e)}")
+                    values[field] = FIELD_DEFAULTS.get(field)
+        finally:
+            metrics.count('com_calls_total', reads)
+        return values
+
+    def classify(self, task):
+        """Return (match reason, fields already read) for a task, reason None if not a milestone"""
+        known = {}
+        if self._get(task, 'Milestone', False):
+            return 'flag', known
+        if self._get(task, 'Summary', False):
+            return None, known
+        if self._get(task, 'Duration', None) == 0:
+            return 'duration', known
+        metrics.count('com_calls_total')
+        known['Name'] = task.Name
+        if 'milestone' in (known['Name'] or '').lower():
+            return 'name', known
+        return None, known
+
+    def _scan(self, fields, progress):
+        """Walk every task, classifying each with the fewest property reads"""
+        tasks = self.project.Tasks
+        self.task_count = tasks.Count
+        metrics.count('com_calls_total', 2)
+
+        for i in range(1, self.task_count + 1):
+            task = tasks(i)  # 1-based indexing in COM
+            metrics.count('com_calls_total')
+            self.tasks_scanned = i
+            if progress:
+                progress(i, self.task_count)
+
+            # Blank rows in the task sheet come back as None
+            if task is None:
+                continue
+
+            reason, known = self.classify(task)
+            if reason:
+                self.match_counts[reason] += 1
+                yield self.read_fields(task, fields, known)
+
+    def _filtered_tasks(self):
+        """Apply the milestone filter in Project and return the visible tasks"""
+        app = self.app
+        previous_filter = None
+        try:
+            previous_filter = self.project.CurrentFilter
+        except Exception:
+            pass
+
+        # Criteria are evaluated left to right: flag OR zero duration OR name
+        app.FilterEdit(Name=MILESTONE_FILTER_NAME, TaskFilter=True, Create=True, OverwriteExisting=True,
+                       FieldName='Milestone', Test='equals', Value='Yes', ShowInMenu=False,
+                       ShowSummaryTasks=False)
+        app.FilterEdit(Name=MILESTONE_FILTER_NAME, TaskFilter=True, NewFieldName='Duration',
+                       Test='equals', Value='0', Operation='Or')
+        app.FilterEdit(Name=MILESTONE_FILTER_NAME, TaskFilter=True, NewFieldName='Name',
+                       Test='contains', Value='milestone', Operation='Or')
+        try:
+            app.FilterApply(Name=MILESTONE_FILTER_NAME)
+            app.SelectAll()
+            tasks = app.ActiveSelection.Tasks
+            tasks = list(tasks) if tasks is not None else []
+            # CurrentFilter, 3 x FilterEdit, 2 x FilterApply, SelectAll, ActiveSelection.Tasks, one per task
+            metrics.count('com_calls_total', 9 + len(tasks))
+            return tasks
+        finally:
+            try:
+                app.FilterApply(Name=previous_filter or 'All Tasks')
+            except Exception as e:
+                self.logger.warning(f"Could not restore task filter: {str(e)}")
+
+    def _read_filtered(self, tasks, fields, progress):
+        """Read milestone fields from the tasks left visible by the filter"""
+        self.task_count = len(tasks)
+        for i, task in enumerate(tasks, start=1):
+            self.tasks_scanned = i
+            if progress:
+                progress(i, self.task_count)
+            if task is None:
+                continue
+            self.match_counts['filter'] += 1
+            yield self.read_fields(task, fields)
+
+    def _get(self, task, field, default):
+        """Read one classification field, falling back to a default"""
+        metrics.count('com_calls_total')
+        try:
+            return getattr(task, field)
+        except Exception:
+            return default
@@ -0,0 +1,16 @@
+import os
+import tempfile
+
+import pytest
+
+# The application module reads its settings at import: serve the in-process fake
+# MS Project and keep snapshot databases out of the working tree
+os.environ.setdefault('MSPROJECT_BACKEND', 'fake')
+os.environ.setdefault('FAKE_TASK_COUNT', '300')
+os.environ.setdefault('SNAPSHOT_DB', os.path.join(tempfile.mkdtemp(prefix='snapshots-'), 'snapshots.db'))
+
+
+@pytest.fixture(autouse=True)
+def run_in_tmp_path(tmp_path, monkeypatch):
+    """Run each test in its own directory, since imports save milestones_backup.json to the working directory"""
+    monkeypatch.chdir(tmp_path)
@@ -0,0 +1,85 @@
+import copy
+import random
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from baseline_curve import PlannedValueCurve
+from earned_schedule import EarnedScheduleCalculator
+from work_calendar import WorkCalendar
+
+STATUS_DATE = datetime(2025, 6, 2, 9, 30)
+
+
+def random_milestones(count, seed=1):
+    """Milestones mixing complete, open, late and future ones with missing and unparseable fields"""
+    rng = random.Random(seed)
+    base = datetime(2025, 6, 1)
+
+    def date(center, span):
+        value = center + timedelta(days=rng.randint(-span, span), seconds=rng.randint(0, 86399))
+        return value.strftime('%Y-%m-%d %H:%M:%S') if rng.random() < 0.8 else value.strftime('%Y-%m-%d')
+
+    milestones = []
+    for i in range(count):
+        milestone = {'id': i, 'name': f'M{i}',
+                     'percent_complete': rng.choice([0, 0, 25, 50, 75.5, 100, 100, 120])}
+        if rng.random() < 0.9:
+            milestone['baseline_finish'] = date(base, 400)
+        if rng.random() < 0.6:
+            milestone['baseline_start'] = date(base - timedelta(days=300), 200)
+        if rng.random() < 0.3:
+            milestone['actual_finish'] = date(base, 300)
+        if rng.random() < 0.02:
+            milestone['baseline_finish'] = 'not a date'
+        if rng.random() < 0.01:
+            milestone['percent_complete'] = None
+        milestones.append(milestone)
+    return milestones
+
+
+def baseline_curve():
+    """PV curve of a few overlapping baseline tasks"""
+    tasks = [
+        {'id': 1, 'baseline_start': '2024-09-02', 'baseline_finish': '2025-03-28', 'baseline_cost': 400.0},
+        {'id': 2, 'baseline_start': '2025-01-06', 'baseline_finish': '2025-09-26', 'baseline_cost': 250.0},
+        {'id': 3, 'baseline_start': '2025-05-05', 'baseline_finish': '2026-02-27', 'baseline_cost': 350.0},
+    ]
+    return PlannedValueCurve.from_tasks(tasks)
+
+
+@pytest.mark.parametrize('context', ['plain', 'calendar', 'curve'])
+def test_batch_matches_scalar_path(context):
+    calculator = EarnedScheduleCalculator()
+    options = {}
+    if context == 'calendar':
+        options['calendar'] = WorkCalendar('1111100', ['2025-01-01', '2025-05-26', '2025-07-04', '2025-12-25'])
+    elif context == 'curve':
+        options['curve'] = baseline_curve()
+        options['earned_value'] = 420.0
+    milestones = random_milestones(2000)
+
+    scalar = [calculator.calculate_milestone_metrics(m, status_date=STATUS_DATE, **options)
+              for m in copy.deepcopy(milestones)]
+    batch = calculator.calculate_forecasts(copy.deepcopy(milestones), status_date=STATUS_DATE, **options)
+
+    assert len(batch) == len(scalar)
+    for expected, actual in zip(scalar, batch):
+        assert actual == expected
+        assert {k: type(v) for k, v in actual.items()} == {k: type(v) for k, v in expected.items()}
+
+
+def test_batch_evaluates_columns_of_status_dates():
+    calculator = EarnedScheduleCalculator()
+    columns = calculator.milestone_columns(random_milestones(200))[:4]
+    dates = [datetime(2025, 1, 6), datetime(2025, 6, 2)]
+
+    stacked = calculator.calculate_metrics_batch(
+        *columns, status_date=np.array(dates, dtype='datetime64[us]')[:, None]
+    )
+    for row, status_date in enumerate(dates):
+        single = calculator.calculate_metrics_batch(*columns, status_date=status_date)
+        np.testing.assert_array_equal(stacked['sv_t'][row], single['sv_t'])
+        np.testing.assert_array_equal(stacked['risk'][row], single['risk'])
+        assert stacked['forecast_finish'][row].tolist() == single['forecast_finish'].tolist()
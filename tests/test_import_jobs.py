@@ -0,0 +1,92 @@
+import threading
+
+import pytest
+
+from import_jobs import FAILED, SUCCEEDED, ImportJobManager
+
+
+@pytest.fixture
+def manager():
+    manager = ImportJobManager()
+    yield manager
+    manager.shutdown()
+
+
+def blocking_job(started, release):
+    """Job function that reports it started, then waits to be released"""
+    def run(progress):
+        started.set()
+        release.wait(5)
+        return 'done'
+    return run
+
+
+def test_same_key_joins_the_active_job(manager):
+    started, release = threading.Event(), threading.Event()
+    first, created = manager.submit(('project', None), blocking_job(started, release))
+    assert created
+    assert started.wait(5)
+
+    joined, created = manager.submit(('project', None), lambda progress: 'second')
+    assert not created
+    assert joined is first
+
+    other, created = manager.submit(('project', '2025-06-02'), lambda progress: 'other')
+    assert created
+    assert other is not first
+
+    release.set()
+    assert first.done.wait(5) and other.done.wait(5)
+    assert (first.status, first.result) == (SUCCEEDED, 'done')
+    assert other.result == 'other'
+
+
+def test_queued_job_is_joined_too(manager):
+    started, release = threading.Event(), threading.Event()
+    manager.submit(('blocker',), blocking_job(started, release))
+    assert started.wait(5)
+
+    queued, _ = manager.submit(('project',), lambda progress: 'queued')
+    joined, created = manager.submit(('project',), lambda progress: 'never run')
+    assert not created
+    assert joined is queued
+
+    release.set()
+    assert queued.done.wait(5)
+    assert queued.result == 'queued'
+
+
+def test_finished_job_is_not_joined(manager):
+    first, _ = manager.submit(('project',), lambda progress: 1 / 0)
+    assert first.done.wait(5)
+    assert first.status == FAILED
+
+    second, created = manager.submit(('project',), lambda progress: 'retry')
+    assert created
+    assert second is not first
+    assert second.done.wait(5)
+    assert second.result == 'retry'
+
+
+def test_imports_without_a_status_date_join_the_running_job():
+    import app as application
+
+    started, release = threading.Event(), threading.Event()
+    application.import_jobs.submit(('blocker',), blocking_job(started, release))
+    assert started.wait(5)
+    client = application.app.test_client()
+    try:
+        first = client.post('/api/import-from-msproject', json={})
+        second = client.post('/api/import-from-msproject', json={})
+        dated = client.post('/api/import-from-msproject', json={'status_date': '2025-06-02'})
+    finally:
+        release.set()
+
+    assert first.status_code == second.status_code == dated.status_code == 202
+    assert second.get_json()['job']['id'] == first.get_json()['job']['id']
+    assert second.get_json()['message'] == 'Import of this project already in progress'
+    assert dated.get_json()['job']['id'] != first.get_json()['job']['id']
+    for response in (first, dated):
+        job = application.import_jobs.get(response.get_json()['job']['id'])
+        assert job.done.wait(30)
+        assert job.status == SUCCEEDED
@@ -0,0 +1,137 @@
+import base64
+import json
+
+import pytest
+
+from change_tracker import MilestoneChangeTracker
+from earned_schedule import EarnedScheduleCalculator
+from milestone_index import SORT_FIELDS, MilestoneIndex, _sort_key, _sort_value
+from synthetic_schedule import STATUS_DATE, generate_records
+
+ORDERS = [None] + list(SORT_FIELDS)
+
+
+def make_tracker(count=600, seed=5):
+    """Tracker holding freshly calculated synthetic milestones"""
+    calculator = EarnedScheduleCalculator()
+    tracker = MilestoneChangeTracker()
+    tracker.update(
+        generate_records(count, seed),
+        lambda milestones: calculator.calculate_forecasts(milestones, status_date=STATUS_DATE),
+        STATUS_DATE
+    )
+    return tracker
+
+
+@pytest.fixture(scope='module')
+def tracker():
+    return make_tracker()
+
+
+@pytest.fixture
+def index(tracker):
+    index = MilestoneIndex()
+    index.sync(tracker)
+    return index
+
+
+def read_pages(index, limit, **query):
+    """UIDs of every page, following next_cursor from the first page"""
+    uids = []
+    cursor = None
+    while True:
+        result = index.query(cursor=cursor, limit=limit, **query)
+        uids.extend(milestone['id'] for milestone in result['items'])
+        if not result['has_more']:
+            return uids, result['total']
+        cursor = result['next_cursor']
+
+
+def raw_cursor(*parts):
+    return base64.urlsafe_b64encode(json.dumps(list(parts)).encode()).decode().rstrip('=')
+
+
+@pytest.mark.parametrize('descending', [False, True])
+@pytest.mark.parametrize('sort', ORDERS)
+def test_cursor_pages_cover_the_order_once(index, tracker, sort, descending):
+    uids, total = read_pages(index, 37, sort=sort, descending=descending)
+    everything = index.query(sort=sort, descending=descending, limit=1000)
+
+    assert total == len(tracker.order)
+    assert uids == [milestone['id'] for milestone in everything['items']]
+    assert len(set(uids)) == total
+
+
+@pytest.mark.parametrize('sort', ORDERS)
+def test_ascending_pages_follow_the_sort_keys(index, tracker, sort):
+    uids, _ = read_pages(index, 50, sort=sort)
+
+    if sort is None:
+        assert uids == tracker.order
+    else:
+        keys = [(_sort_key(_sort_value(sort, tracker.records[uid])), uid) for uid in uids]
+        assert keys == sorted(keys)
+
+
+@pytest.mark.parametrize('filters', [{'risk': 'High'}, {'status': ['Complete', 'Not Started']}, {'name': '1'}])
+@pytest.mark.parametrize('sort', ORDERS)
+def test_cursor_pages_of_filtered_queries(index, tracker, sort, filters):
+    uids, total = read_pages(index, 7, sort=sort, descending=True, **filters)
+    everything = index.query(sort=sort, descending=True, limit=1000, **filters)
+
+    assert uids == [milestone['id'] for milestone in everything['items']]
+    assert len(uids) == total == everything['total']
+
+
+def test_cursor_survives_removal_of_its_milestone(tracker):
+    index = MilestoneIndex()
+    index.sync(tracker)
+    first = index.query(sort='sv_t', limit=20)
+    last_uid = first['items'][-1]['id']
+    expected = [milestone['id'] for milestone in index.query(sort='sv_t', limit=1000)['items']][20:]
+
+    index.remove(last_uid)
+    result = index.query(sort='sv_t', cursor=first['next_cursor'], limit=1000)
+
+    assert [milestone['id'] for milestone in result['items']] == expected
+
+
+@pytest.mark.parametrize('sort, cursor', [
+    (None, 'not base64 json'),
+    ('sv_t', raw_cursor('sv_t', False, 'abc', 1)),
+    (None, raw_cursor(None, False, 5, [1])),
+    (None, raw_cursor(None, False, None, 1)),
+    (None, raw_cursor(None, False, -1, 1)),
+    ('risk', raw_cursor('risk', False, 1.5, 1)),
+    ('forecast_finish', raw_cursor('forecast_finish', False, 3, 1)),
+    ('forecast_finish', raw_cursor('forecast_finish', False, 'yesterday', 1)),
+    ('forecast_finish', raw_cursor('forecast_finish', False, '2025-01-01T00:00:00+02:00', 1)),
+    ('spi_t', raw_cursor('spi_t', 'yes', 1.0, 1)),
+    ('spi_t', raw_cursor('spi_t', False, True, 1)),
+    ('sv_t', raw_cursor(['sv_t'], False, 1.0, 1)),
+    (None, raw_cursor('name', False, 'a', 1)),
+    ('sv_t', raw_cursor('sv_t', False, 1.0, '1')),
+    ('sv_t', raw_cursor('sv_t', False, 1.0)),
+])
+def test_malformed_cursor_is_rejected(index, sort, cursor):
+    with pytest.raises(ValueError):
+        index.query(sort=sort, cursor=cursor)
+
+
+def test_malformed_cursor_is_a_bad_request():
+    import app as application
+
+    client = application.app.test_client()
+    accepted = client.post('/api/import-from-msproject', json={'status_date': '2025-01-01'})
+    job = application.import_jobs.get(accepted.get_json()['job']['id'])
+    assert job.done.wait(30)
+
+    first = client.get('/api/milestones?sort=sv_t&limit=5').get_json()
+    second = client.get(f"/api/milestones?sort=sv_t&limit=5&cursor={first['next_cursor']}")
+    assert second.status_code == 200
+    assert second.get_json()['items']
+
+    for sort, cursor in (('sv_t', raw_cursor('sv_t', False, 'abc', 1)), ('', raw_cursor(None, False, 5, [1]))):
+        response = client.get(f'/api/milestones?sort={sort}&cursor={cursor}')
+        assert response.status_code == 400
+        assert response.get_json()['message'].startswith('Invalid cursor')
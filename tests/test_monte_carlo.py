@@ -0,0 +1,20 @@
+import pytest
+
+from earned_schedule import EarnedScheduleCalculator
+from monte_carlo import MAX_TRIALS, MonteCarloForecaster, SPIDistribution
+from synthetic_schedule import STATUS_DATE, generate_records
+
+
+@pytest.mark.parametrize('trials', [0, -1, MAX_TRIALS + 1])
+def test_trials_out_of_range_are_rejected(trials):
+    forecaster = MonteCarloForecaster(EarnedScheduleCalculator())
+
+    with pytest.raises(ValueError):
+        forecaster.prepare(generate_records(10), SPIDistribution(), status_date=STATUS_DATE, trials=trials)
+
+
+def test_trials_default_to_the_forecaster_setting():
+    forecaster = MonteCarloForecaster(EarnedScheduleCalculator(), trials=250)
+
+    job = forecaster.prepare(generate_records(10), SPIDistribution(), status_date=STATUS_DATE)
+    assert job['trials'] == 250
@@ -0,0 +1,192 @@
+from datetime import timedelta
+
+import pytest
+
+from earned_schedule import EarnedScheduleCalculator
+from live_updates import EventBroker
+from portfolio import PortfolioStore
+from shared_state import SharedStateStore
+from synthetic_schedule import STATUS_DATE, generate_network, generate_records
+
+COUNT = 400
+
+
+class NetworkSource:
+    """Schedule source without a baseline or calendar that provides a dependency network"""
+
+    def __init__(self, tasks):
+        self.tasks = tasks
+
+    def get_baseline_version(self):
+        raise LookupError('No time-phased baseline')
+
+    def get_calendar(self):
+        return None
+
+    def extract_schedule_tasks(self, baseline=False):
+        return self.tasks
+
+
+@pytest.fixture
+def workers(tmp_path):
+    """Factory of portfolio stores sharing one state database, as worker processes do"""
+    created = []
+
+    def worker():
+        store = PortfolioStore(EarnedScheduleCalculator(), shared=SharedStateStore(str(tmp_path / 'shared.db')))
+        created.append(store)
+        return store
+    yield worker
+    for store in created:
+        store.shutdown()
+        store.shared.close()
+
+
+def changed_records(step, count=COUNT):
+    """The synthetic schedule with the progress of every twentieth milestone moved ``step`` times"""
+    records = generate_records(count, seed=1)
+    for record in records[::20]:
+        record['percent_complete'] = min(100, (record.get('percent_complete') or 0) + 5 * step)
+    return records
+
+
+def assert_same_project(store, other, name='P'):
+    state, other_state = store.project(name), other.project(name)
+    assert other_state.tracker.version == state.tracker.version
+    assert other_state.tracker.order == state.tracker.order
+    assert other_state.tracker.status_date == state.tracker.status_date
+    assert [m.to_dict() for m in other_state.milestones()] == [m.to_dict() for m in state.milestones()]
+    for project in (state, other_state):
+        project.dashboard.sync(project.tracker)
+    assert other_state.dashboard.summary() == state.dashboard.summary()
+    if store.shared is not None:
+        assert other_state.dashboard.etag(other_state.shared_generation) == state.dashboard.etag(
+            state.shared_generation)
+    for query in ({'sort': 'sv_t'}, {'sort': 'forecast_finish', 'risk': 'High'}):
+        pages = [project.index.query(limit=1000, **query) for project in (state, other_state)]
+        assert [[m['id'] for m in page['items']] for page in pages] == [[m['id'] for m in pages[0]['items']]] * 2
+
+
+def test_other_worker_takes_over_an_import(workers):
+    writer, reader = workers(), workers()
+    writer.load('P', generate_records(COUNT, seed=1), STATUS_DATE)
+
+    reader.sync_shared()
+
+    assert reader.active == 'P'
+    assert_same_project(writer, reader)
+
+
+def test_takeover_reads_only_the_milestones_that_changed(workers):
+    writer, reader = workers(), workers()
+    writer.load('P', generate_records(COUNT, seed=1), STATUS_DATE)
+    reader.sync_shared()
+    generation = reader.project('P').shared_generation
+
+    delta = writer.load('P', changed_records(1), STATUS_DATE)
+    written = reader.shared.load('P', generation)
+    reader.sync_shared()
+
+    assert 0 < len(delta['changed']) < COUNT
+    assert sorted(written[3]) == sorted(m['id'] for m in delta['changed'])
+    assert not written[4] and not written[5]
+    assert_same_project(writer, reader)
+
+
+def test_forecasts_and_removals_are_taken_over(workers):
+    writer, reader = workers(), workers()
+    writer.load('P', generate_records(COUNT, seed=1), STATUS_DATE)
+    reader.sync_shared()
+
+    writer.forecast('P', STATUS_DATE + timedelta(days=14))
+    reader.sync_shared()
+    assert_same_project(writer, reader)
+
+    kept = [record for record in generate_records(COUNT, seed=1) if record['id'] % 7]
+    writer.load('P', kept, STATUS_DATE + timedelta(days=14))
+    reader.sync_shared()
+    assert_same_project(writer, reader)
+    assert len(reader.project('P').tracker.records) == len(kept)
+
+    writer.remove('P')
+    reader.sync_shared()
+    assert reader.project('P') is None
+    assert reader.shared.load('P') is None
+
+
+def test_late_worker_reads_everything(workers):
+    writer = workers()
+    writer.load('P', generate_records(COUNT, seed=1), STATUS_DATE)
+    for step in (1, 2, 3):
+        writer.load('P', changed_records(step), STATUS_DATE + timedelta(days=7 * step))
+
+    late = workers()
+    late.sync_shared()
+
+    assert_same_project(writer, late)
+
+
+def test_project_imported_again_after_removal_is_read_whole(workers):
+    writer, reader = workers(), workers()
+    writer.load('P', generate_records(COUNT, seed=1), STATUS_DATE)
+    reader.sync_shared()
+
+    writer.remove('P')
+    writer.load('P', generate_records(COUNT // 2, seed=2), STATUS_DATE)
+    reader.sync_shared()
+
+    assert_same_project(writer, reader)
+
+
+def test_writes_alternate_between_workers_with_a_network(workers):
+    """Each worker takes over the other's writes first, and propagates over the network as one process would"""
+    tasks = generate_network(COUNT, seed=3)
+    first, second = workers(), workers()
+    single = PortfolioStore(EarnedScheduleCalculator())
+
+    for store in (first, single):
+        store.load('P', generate_records(COUNT, seed=1), STATUS_DATE, source=NetworkSource(tasks))
+    for step, store in ((1, second), (2, first), (3, second)):
+        status_date = STATUS_DATE + timedelta(days=7 * step)
+        for each in (store, single):
+            each.forecast('P', status_date)
+        for each in (store, single):
+            each.load('P', changed_records(step), status_date, source=NetworkSource(tasks))
+        assert_same_project(single, store)
+
+    first.sync_shared()
+    assert_same_project(second, first)
+    assert any(record.get('driving_predecessor') for record in first.project('P').milestones())
+
+
+def test_failed_write_saves_the_whole_project_next_time(workers):
+    writer, reader = workers(), workers()
+    writer.load('P', generate_records(COUNT, seed=1), STATUS_DATE)
+    reader.sync_shared()
+
+    with pytest.raises(RuntimeError):
+        with writer.shared_write(['P']):
+            writer._forecast('P', STATUS_DATE + timedelta(days=7))
+            raise RuntimeError('Write failed')
+    writer.forecast('P', STATUS_DATE + timedelta(days=14))
+    reader.sync_shared()
+
+    assert_same_project(writer, reader)
+
+
+def test_event_ids_of_another_stream_get_a_reset():
+    broker = EventBroker()
+    other = EventBroker()
+    first = broker.publish('milestones', {'version': 1})
+    broker.publish('milestones', {'version': 2})
+
+    replayed = broker.subscribe(first)
+    assert replayed.queue.get_nowait().startswith(f'id: {broker.event_id(2)}\nevent: milestones\n')
+    assert replayed.queue.empty()
+
+    for last_event_id in (other.publish('milestones', {}), broker.event_id(5), 'not an id'):
+        subscription = broker.subscribe(last_event_id)
+        assert '\nevent: reset\n' in subscription.queue.get_nowait()
+        assert subscription.queue.empty()
+
+    assert broker.subscribe(broker.event_id(2)).queue.empty()
@@ -0,0 +1,43 @@
+import pytest
+
+from synthetic_schedule import STATUS_DATE, generate_records
+
+
+@pytest.fixture(scope='module')
+def client():
+    import app as application
+
+    application.portfolio.load('Sweep', generate_records(200, 7), STATUS_DATE)
+    yield application.app.test_client()
+    application.portfolio.remove('Sweep')
+
+
+@pytest.mark.parametrize('url', ['/api/status-sweep', '/api/backtest'])
+@pytest.mark.parametrize('options, message', [
+    ({'step_days': 0}, 'step_days must be at least 1'),
+    ({'step_days': -7}, 'step_days must be at least 1'),
+    ({'status_dates': 5}, 'status_dates must be a list of dates (YYYY-MM-DD)'),
+    ({'status_dates': {'date': '2025-01-01'}}, 'status_dates must be a list of dates (YYYY-MM-DD)'),
+    ({'status_dates': ['2025-01-01', 20250108]}, 'status_dates must be a list of dates (YYYY-MM-DD)'),
+    ({'status_dates': []}, 'status_dates must list at least one date'),
+    ({'status_dates': ['2025-01-01', 'soon']}, 'Invalid status_dates: soon'),
+])
+def test_invalid_status_dates_are_a_bad_request(client, url, options, message):
+    response = client.post(url, json=dict(options, project='Sweep'))
+
+    assert response.status_code == 400
+    assert response.get_json()['message'] == message
+
+
+def test_sweep_over_a_range_and_a_list_of_status_dates(client):
+    ranged = client.post('/api/status-sweep', json={
+        'project': 'Sweep', 'start': '2024-12-04', 'end': '2025-01-01', 'step_days': 14, 'metrics': ['sv_t']
+    })
+    listed = client.post('/api/status-sweep', data={
+        'project': 'Sweep', 'status_dates': '2024-12-04,2024-12-18,2025-01-01', 'metrics': 'sv_t'
+    })
+
+    assert ranged.status_code == listed.status_code == 200
+    assert ranged.get_json()['status_dates'] == listed.get_json()['status_dates']
+    assert len(ranged.get_json()['status_dates']) == 3
+    assert ranged.get_json()['sv_t'] == listed.get_json()['sv_t']
@@ -0,0 +1,80 @@
+from fake_com import make_fake_application
+from instrumentation import metrics
+from task_sources import MILESTONE_FIELDS, COMTaskSource
+
+TASK_COUNT = 2000
+
+# CurrentFilter, 3 x FilterEdit, 2 x FilterApply, SelectAll, ActiveSelection, Selection.Tasks
+FILTER_OVERHEAD = 9
+
+
+def classification_reads(task):
+    """Reads the scan needs to classify a task: Milestone, then Summary, Duration and Name until decided"""
+    fields = task._properties
+    if fields['Milestone']:
+        return 1, True
+    if fields['Summary']:
+        return 2, False
+    if fields['Duration'] == 0:
+        return 3, True
+    return 4, 'milestone' in fields['Name'].lower()
+
+
+def read_milestones(strategy, milestone_ratio=0.05):
+    """Read the milestones of a fresh fake project, returning (rows, tasks, counter, estimated calls)"""
+    app, counter = make_fake_application(task_count=TASK_COUNT, milestone_ratio=milestone_ratio, seed=3)
+    project = app.ActiveProject
+    tasks = project.Tasks._tasks
+    counter.reset()
+    metrics.reset()
+    source = COMTaskSource(project, app, strategy=strategy)
+    rows = list(source.iter_milestones())
+    return rows, tasks, counter, metrics.value('com_calls_total')
+
+
+def test_filter_strategy_reads_only_milestones():
+    rows, tasks, counter, estimated = read_milestones('filter')
+
+    assert rows
+    # One Tasks.Next per visible milestone and one read per field
+    assert counter.total == FILTER_OVERHEAD + len(rows) * (1 + len(MILESTONE_FIELDS))
+    assert counter.calls['Tasks.Next'] == len(rows)
+    assert estimated == counter.total
+
+
+def test_scan_strategy_stops_reading_once_a_task_is_classified():
+    rows, tasks, counter, estimated = read_milestones('scan')
+
+    expected = 2  # Project.Tasks, Tasks.Count
+    milestones = 0
+    for task in tasks:
+        expected += 1  # Tasks.Item
+        if task is None:
+            continue
+        reads, is_milestone = classification_reads(task)
+        expected += reads
+        if is_milestone:
+            milestones += 1
+            # Name is already known when the task was classified by name
+            expected += len(MILESTONE_FIELDS) - (reads == 4)
+
+    assert len(rows) == milestones
+    assert counter.total == expected
+    assert counter.calls['Tasks.Item'] == len(tasks)
+    assert estimated == counter.total
+
+
+def test_filter_cost_per_milestone_does_not_depend_on_other_tasks():
+    few = read_milestones('filter', milestone_ratio=0.01)
+    many = read_milestones('filter', milestone_ratio=0.2)
+
+    for rows, tasks, counter, estimated in (few, many):
+        assert (counter.total - FILTER_OVERHEAD) / len(rows) == 1 + len(MILESTONE_FIELDS)
+    assert few[2].total < many[2].total
+
+
+def test_strategies_find_the_same_milestones():
+    filtered = read_milestones('filter')[0]
+    scanned = read_milestones('scan')[0]
+
+    assert filtered == scanned
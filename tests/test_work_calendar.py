@@ -0,0 +1,138 @@
+import random
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pytest
+
+from work_calendar import INDEX_END, INDEX_START, WorkCalendar
+
+HOLIDAYS = [date(2025, 1, 1), date(2025, 4, 18), date(2025, 12, 25), date(2025, 12, 26), date(2026, 1, 1)]
+
+CALENDARS = {
+    'weekdays': ('1111100', HOLIDAYS),
+    'six-day week': ('1111110', HOLIDAYS),
+    'four-day week': ('Mon Tue Wed Thu', []),
+}
+
+
+def reference(weekmask, holidays):
+    return np.busdaycalendar(weekmask=weekmask, holidays=holidays)
+
+
+def random_days(count, first, last, seed):
+    rng = random.Random(seed)
+    span = (last - first).days
+    return [first + timedelta(days=rng.randint(0, span)) for _ in range(count)]
+
+
+@pytest.fixture(params=sorted(CALENDARS))
+def calendars(request):
+    weekmask, holidays = CALENDARS[request.param]
+    return WorkCalendar(weekmask, holidays), reference(weekmask, holidays)
+
+
+@pytest.mark.parametrize('first, last', [
+    (date(2024, 11, 1), date(2026, 3, 1)),
+    # Across and beyond both ends of the compiled index
+    (INDEX_START - timedelta(days=4000), INDEX_END + timedelta(days=4000)),
+])
+def test_working_days_between_counts_like_numpy(calendars, first, last):
+    calendar, busdaycal = calendars
+    starts = random_days(300, first, last, seed=1)
+    ends = random_days(300, first, last, seed=2)
+
+    for start, end in zip(starts, ends):
+        # Differences of working time are antisymmetric; busday_count shifts reversed ranges by a day
+        if start <= end:
+            expected = int(np.busday_count(start, end, busdaycal=busdaycal))
+        else:
+            expected = -int(np.busday_count(end, start, busdaycal=busdaycal))
+        assert calendar.working_days_between(datetime.combine(start, datetime.min.time()),
+                                             datetime.combine(end, datetime.min.time())) == expected
+
+
+def test_add_working_days_lands_on_the_nth_working_day(calendars):
+    calendar, busdaycal = calendars
+    rng = random.Random(3)
+
+    for start in random_days(300, INDEX_START - timedelta(days=400), INDEX_END + timedelta(days=400), seed=4):
+        days = rng.randint(-400, 400)
+        expected = np.busday_offset(start, days, roll='forward', busdaycal=busdaycal).item()
+        assert calendar.add_working_days(datetime.combine(start, datetime.min.time()), days).date() == expected
+
+
+def test_is_working_day_matches_numpy(calendars):
+    calendar, busdaycal = calendars
+
+    for day in random_days(500, INDEX_START - timedelta(days=100), INDEX_END + timedelta(days=100), seed=5):
+        assert calendar.is_working_day(day) == bool(np.is_busday(day, busdaycal=busdaycal))
+
+
+def test_holidays_are_skipped():
+    calendar = WorkCalendar('1111100', HOLIDAYS)
+
+    # Wed 2024-12-31 to Fri 2025-01-03, across New Year's Day
+    assert calendar.working_days_between(datetime(2024, 12, 31), datetime(2025, 1, 3)) == 2
+    assert calendar.add_working_days(datetime(2024, 12, 31, 9), 1) == datetime(2025, 1, 2, 9)
+    # Thu 2025-12-24 + 1 working day skips both Christmas holidays
+    assert calendar.add_working_days(datetime(2025, 12, 24), 1) == datetime(2025, 12, 29)
+    assert not calendar.is_working_day(date(2025, 4, 18))
+
+
+def test_partial_days_count_only_on_working_days():
+    calendar = WorkCalendar('1111100')
+
+    # Friday noon to Monday noon is one working day
+    assert calendar.working_days_between(datetime(2025, 6, 6, 12), datetime(2025, 6, 9, 12)) == 1
+    # Saturday and Sunday times all map to the end of Friday
+    saturday, sunday = calendar.working_time(np.array(['2025-06-07T08:00', '2025-06-08T20:00'],
+                                                      dtype='datetime64[us]'))
+    assert saturday == sunday
+    # Half a working day after Friday 18:00 is Monday 06:00
+    assert calendar.add_working_days(datetime(2025, 6, 6, 18), 0.5) == datetime(2025, 6, 9, 6)
+    # Working days are floored like timedelta.days
+    assert calendar.working_days_between(datetime(2025, 6, 9, 12), datetime(2025, 6, 9, 6)) == -1
+
+
+def test_working_time_round_trips_on_working_days():
+    calendar = WorkCalendar('1111100', HOLIDAYS)
+    rng = np.random.default_rng(6)
+    moments = (np.datetime64('2024-01-01T00:00', 'us')
+               + rng.integers(0, 3 * 365 * 86400 * 10 ** 6, 1000).astype('timedelta64[us]'))
+    moments = moments[[calendar.is_working_day(moment.item()) for moment in moments]]
+
+    assert (calendar.from_working_time(calendar.working_time(moments)) == moments).all()
+
+
+def test_from_exceptions_expands_date_ranges():
+    exceptions = [(date(2025, 8, 4), date(2025, 8, 15)), (datetime(2025, 12, 25, 8), None)]
+    calendar = WorkCalendar.from_exceptions([True] * 5 + [False] * 2, exceptions, name='Standard')
+
+    assert calendar.working_days_between(datetime(2025, 8, 1), datetime(2025, 8, 19)) == 2
+    assert not calendar.is_working_day(date(2025, 12, 25))
+    assert calendar.is_working_day(date(2025, 12, 26))
+    assert calendar.to_dict() == {
+        'name': 'Standard',
+        'working_days': ['Mon', 'Tue', 'Wed', 'Thu', 'Fri'],
+        'holidays': [str(day) for day in np.arange('2025-08-04', '2025-08-16', dtype='datetime64[D]')
+                     if np.is_busday(day)] + ['2025-12-25']
+    }
+
+
+def test_calendar_key_follows_weekmask_and_holidays():
+    assert WorkCalendar('1111100', HOLIDAYS).key == WorkCalendar('Mon Tue Wed Thu Fri', HOLIDAYS).key
+    assert WorkCalendar('1111100', HOLIDAYS).key != WorkCalendar('1111100').key
+    assert WorkCalendar('1111100').key != WorkCalendar('1111110').key
+
+
+def test_out_of_range_results_raise_overflow_error():
+    calendar = WorkCalendar('1111100')
+
+    with pytest.raises(OverflowError):
+        calendar.add_working_days(datetime(2025, 1, 1), 3 * 10 ** 6)
+
+
+@pytest.mark.parametrize('weekmask, holidays', [('1111', []), ('0000000', []), ('1111100', ['not a date'])])
+def test_invalid_calendars_are_rejected(weekmask, holidays):
+    with pytest.raises(ValueError):
+        WorkCalendar(weekmask, holidays)
@@ -0,0 +1,141 @@
+import logging
+from bisect import bisect_left, insort
+
+import numpy as np
+
+from change_tracker import applies_to
+from dashboard_aggregate import timeline_entry
+from milestone_record import to_datetime
+
+# Default, smallest and largest number of points per timeline response
+DEFAULT_POINTS = 500
+MIN_POINTS = 2
+MAX_POINTS = 5000
+
+
+class TimelineIndex:
+    """Timeline entries sorted by baseline date, downsampled per viewport
+
+    Entries are kept in baseline order with bisect from tracker deltas, and
+    their dates and variances are copied to NumPy columns once per change,
+    so a viewport (a baseline date range) is found by binary search rather
+    than by scanning every milestone. When more entries fall in the viewport
+    than the requested number of points, it is split into equal time
+    buckets and each bucket contributes its entry with the lowest SV(t)
+    (the worst slip) and the one with the highest, so outliers stay visible
+    at every zoom level.
+    """
+
+    def __init__(self):
+        """Initialize an empty index"""
+        self.logger = logging.getLogger('TimelineIndex')
+        self.reset()
+
+    def reset(self):
+        """Forget all milestones"""
+        self.entries = {}
+        self.version = None
+        self._keys = {}
+        self._sorted = []
+        self._columns = None
+
+    def sync(self, tracker, delta=None):
+        """Bring the index up to date with a MilestoneChangeTracker (see DashboardAggregate.sync)"""
+        if applies_to(delta, self.version, tracker):
+            for milestone in delta['changed']:
+                self.update(milestone.get('id'), milestone)
+            for uid in delta['removed']:
+                self.remove(uid)
+        elif self.version != tracker.version:
+            self.reset()
+            for uid in tracker.order:
+                self._add(uid, tracker.records[uid])
+            # One sort instead of an insort per milestone
+            self._sorted.sort()
+            self.logger.info(f"Rebuilt timeline index for {len(self.entries)} milestones")
+        self.version = tracker.version
+
+    def update(self, uid, milestone):
+        """Index a milestone's timeline entry, replacing its previous one"""
+        self.remove(uid)
+        key = self._add(uid, milestone, append=False)
+        if key is not None:
+            insort(self._sorted, key)
+
+    def _add(self, uid, milestone, append=True):
+        """Store a milestone's entry; returns its (baseline, uid) key (None without an entry)"""
+        entry = timeline_entry(milestone)
+        baseline = to_datetime(entry['baseline']) if entry else None
+        if baseline is None:
+            return None
+        self.entries[uid] = entry
+        self._keys[uid] = baseline
+        if append:
+            self._sorted.append((baseline, uid))
+        self._columns = None
+        return baseline, uid
+
+    def remove(self, uid):
+        """Drop a milestone's timeline entry, if any"""
+        if self.entries.pop(uid, None) is None:
+            return
+        entry = (self._keys.pop(uid), uid)
+        del self._sorted[bisect_left(self._sorted, entry)]
+        self._columns = None
+
+    def query(self, points=DEFAULT_POINTS, start=None, end=None):
+        """Timeline entries with a baseline from start to end (inclusive), at most about ``points``
+
+        Entries come in baseline order. ``downsampled`` tells whether
+        buckets were used; ``total`` counts every entry in the viewport.
+        """
+        points = max(MIN_POINTS, min(int(points or DEFAULT_POINTS), MAX_POINTS))
+        if start is not None and end is not None and end < start:
+            raise ValueError('The end of the timeline range is before its start')
+
+        dates, variance = self._get_columns()
+        low = int(np.searchsorted(dates, np.datetime64(start, 'us'), 'left')) if start is not None else 0
+        high = int(np.searchsorted(dates, np.datetime64(end, 'us'), 'right')) if end is not None else len(dates)
+        total = max(high - low, 0)
+
+        if total <= points:
+            picks = range(low, high)
+        else:
+            picks = self._bucket_extremes(dates, variance, low, high, points // 2)
+
+        return {
+            'version': self.version,
+            'total': total,
+            'downsampled': total > points,
+            'start': start,
+            'end': end,
+            'timeline': [self.entries[self._sorted[i][1]] for i in picks]
+        }
+
+    def _get_columns(self):
+        """Baseline dates (datetime64[us]) and SV(t) (NaN if missing) in index order"""
+        if self._columns is None:
+            dates = np.array([key for key, _ in self._sorted], dtype='datetime64[us]')
+            variance = np.array([self.entries[uid]['variance_days'] for _, uid in self._sorted], dtype=float)
+            self._columns = (dates, variance)
+        return self._columns
+
+    def _bucket_extremes(self, dates, variance, low, high, buckets):
+        """Positions of the lowest and highest SV(t) entry of each equal-time bucket of [low, high)"""
+        first = dates[low].astype('int64')
+        span = dates[high - 1].astype('int64') - first + 1
+        edges = (first + span * np.arange(1, buckets, dtype=np.int64) // buckets).astype('datetime64[us]')
+        bounds = [low] + (np.searchsorted(dates[low:high], edges, 'left') + low).tolist() + [high]
+
+        picks = []
+        for begin, stop in zip(bounds[:-1], bounds[1:]):
+            if begin == stop:
+                continue
+            values = variance[begin:stop]
+            if np.isnan(values).all():
+                picks.append(begin)
+                continue
+            lowest = begin + int(np.nanargmin(values))
+            highest = begin + int(np.nanargmax(values))
+            picks.extend(sorted({lowest, highest}))
+        return picks
@@ -0,0 +1,214 @@
+import logging
+from heapq import heapify, heappop, heappush
+
+from change_tracker import applies_to
+from dashboard_aggregate import COUNTERS, milestone_contribution
+
+# Separator between the levels of a WBS code (MS Project's default code mask)
+WBS_SEPARATOR = '.'
+
+# Largest number of levels below the queried node returned at once
+MAX_DEPTH = 10
+
+
+def wbs_path(code):
+    """Levels of a WBS code, e.g. '1.2.3' -> ('1', '2', '3'); empty for no code"""
+    return tuple(part for part in str(code or '').strip().split(WBS_SEPARATOR) if part)
+
+
+def _level_key(part):
+    """Sort key of a WBS level: numbers in numeric order, before other codes"""
+    return (0, int(part), '') if part.isdigit() else (1, 0, part)
+
+
+class WBSNode:
+    """Rolled-up totals of one WBS branch: its own milestones and everything below it"""
+
+    __slots__ = ('code', 'children', 'milestones', 'counts', 'spi_sum', 'spi_count', 'variances', 'stale',
+                 'stale_count')
+
+    def __init__(self, code):
+        """Initialize an empty branch"""
+        self.code = code
+        self.children = {}
+        self.milestones = 0
+        self.counts = dict.fromkeys(COUNTERS, 0)
+        self.spi_sum = 0.0
+        self.spi_count = 0
+        # Min-heap of (SV(t), uid) of the branch's milestones; removed entries
+        # are counted in stale and dropped when they reach the top
+        self.variances = []
+        self.stale = {}
+        self.stale_count = 0
+
+    def add(self, uid, counters, spi_t, sv_t, sign=1, place=heappush):
+        """Add (sign=1) or take away (sign=-1) one milestone's contribution, O(log n)"""
+        self.milestones += sign
+        for counter in counters:
+            self.counts[counter] += sign
+        if spi_t is not None:
+            self.spi_sum += sign * spi_t
+            self.spi_count += sign
+            if not self.spi_count:
+                # Drop float residue left by subtracting
+                self.spi_sum = 0.0
+        if sv_t is not None:
+            if sign > 0:
+                place(self.variances, (sv_t, uid))
+            else:
+                entry = (sv_t, uid)
+                self.stale[entry] = self.stale.get(entry, 0) + 1
+                self.stale_count += 1
+                if self.stale_count * 2 > len(self.variances):
+                    self._compact()
+
+    def worst(self):
+        """(SV(t), uid) of the branch's lowest SV(t), (None, None) without one; amortized O(log n)"""
+        heap = self.variances
+        while heap and heap[0] in self.stale:
+            self._forget(heappop(heap))
+        return heap[0] if heap else (None, None)
+
+    def _forget(self, entry):
+        """Count one removed copy of entry as dropped from the heap"""
+        self.stale_count -= 1
+        if self.stale[entry] == 1:
+            del self.stale[entry]
+        else:
+            self.stale[entry] -= 1
+
+    def _compact(self):
+        """Drop every removed entry from the heap once they are the majority, O(n)"""
+        live = []
+        for entry in self.variances:
+            if entry in self.stale:
+                self._forget(entry)
+            else:
+                live.append(entry)
+        heapify(live)
+        self.variances = live
+
+    def summary(self):
+        """Totals of the branch, in the layout of the dashboard summary"""
+        counts = self.counts
+        worst_sv_t, worst_uid = self.worst()
+        return {
+            'wbs': self.code,
+            'total_milestones': self.milestones,
+            'completed': counts['completed'],
+            'behind_schedule': counts['behind_schedule'],
+            'on_schedule': counts['on_schedule'],
+            'avg_spi_t': round(self.spi_sum / self.spi_count, 2) if self.spi_count else 0,
+            'worst_sv_t': worst_sv_t,
+            'worst_milestone': worst_uid,
+            'high_risk': counts['high_risk'],
+            'medium_risk': counts['medium_risk'],
+            'low_risk': counts['low_risk']
+        }
+
+
+class WBSRollup:
+    """Prefix tree of WBS codes with SV(t), SPI(t) and risk totals at every branch
+
+    A milestone counts in the node of its own WBS code and in each of its
+    ancestors up to the root (the whole project); milestones without a
+    code count at the root only. Changing or removing a milestone undoes
+    its old contribution along its ancestor path and adds the new one, so
+    keeping the tree current costs O(depth * log n) per milestone and
+    reading a branch's totals needs no scan. Each node keeps its SV(t)
+    values in a min-heap with lazily dropped removals, which gives the
+    worst SV(t) after removals as well.
+    """
+
+    def __init__(self):
+        """Initialize an empty tree"""
+        self.logger = logging.getLogger('WBSRollup')
+        self.reset()
+
+    def reset(self):
+        """Forget all milestones"""
+        self.root = WBSNode('')
+        self.contributions = {}
+        self.version = None
+
+    def sync(self, tracker, delta=None):
+        """Bring the tree up to date with a MilestoneChangeTracker (see DashboardAggregate.sync)"""
+        if applies_to(delta, self.version, tracker):
+            for milestone in delta['changed']:
+                self.update(milestone.get('id'), milestone)
+            for uid in delta['removed']:
+                self.remove(uid)
+        elif self.version != tracker.version:
+            self.reset()
+            for uid in tracker.order:
+                self.update(uid, tracker.records[uid], list.append)
+            # One heapify per branch instead of a push per milestone
+            nodes = [self.root]
+            while nodes:
+                node = nodes.pop()
+                heapify(node.variances)
+                nodes.extend(node.children.values())
+            self.logger.info(f"Rebuilt WBS rollup for {len(self.contributions)} milestones")
+        self.version = tracker.version
+
+    def update(self, uid, milestone, place=heappush):
+        """Add a milestone along its WBS path, replacing its previous contribution
+
+        ``place`` puts its SV(t) in each branch's list (list.append leaves
+        the lists to be heapified afterwards, as a rebuild does).
+        """
+        self.remove(uid)
+        counters, spi_t, _ = milestone_contribution(milestone)
+        path = wbs_path(milestone.get('wbs'))
+        sv_t = milestone.get('sv_t')
+        node = self.root
+        node.add(uid, counters, spi_t, sv_t, place=place)
+        for depth in range(len(path)):
+            child = node.children.get(path[depth])
+            if child is None:
+                child = node.children[path[depth]] = WBSNode(WBS_SEPARATOR.join(path[:depth + 1]))
+            child.add(uid, counters, spi_t, sv_t, place=place)
+            node = child
+        self.contributions[uid] = (path, counters, spi_t, sv_t)
+
+    def remove(self, uid):
+        """Undo a milestone's contribution along its WBS path, dropping branches left empty"""
+        contribution = self.contributions.pop(uid, None)
+        if contribution is None:
+            return
+        path, counters, spi_t, sv_t = contribution
+        nodes = [self.root]
+        for part in path:
+            nodes.append(nodes[-1].children[part])
+        for node in nodes:
+            node.add(uid, counters, spi_t, sv_t, sign=-1)
+        for depth in range(len(path), 0, -1):
+            if nodes[depth].milestones:
+                break
+            del nodes[depth - 1].children[path[depth - 1]]
+
+    def query(self, wbs=None, depth=1):
+        """Totals of a WBS branch (default: the whole project) and of its branches ``depth`` levels down
+
+        Raises KeyError if no milestone has the code or one below it.
+        """
+        depth = int(depth)
+        if not 0 <= depth <= MAX_DEPTH:
+            raise ValueError(f'depth must be between 0 and {MAX_DEPTH}')
+        node = self.root
+        for part in wbs_path(wbs):
+            node = node.children.get(part)
+            if node is None:
+                raise KeyError(wbs)
+        return self._tree(node, depth)
+
+    def _tree(self, node, depth):
+        """Summary of a node with its children's summaries down to depth levels"""
+        summary = node.summary()
+        summary['branches'] = len(node.children)
+        if depth > 0:
+            summary['children'] = [
+                self._tree(node.children[part], depth - 1)
+                for part in sorted(node.children, key=_level_key)
+            ]
+        return summary
@@ -0,0 +1,171 @@
+import hashlib
+from datetime import date
+
+import numpy as np
+
+from earned_schedule import MAX_DATETIME64, MAX_FORECAST_DAYS, MIN_DATETIME64, US_PER_DAY
+
+# Default span of the precompiled index (both Mondays); dates outside it are
+# extrapolated week by week from the weekmask
+INDEX_START = date(1990, 1, 1)
+INDEX_END = date(2100, 1, 4)
+
+# Day numbers count from 1970-01-01, a Thursday
+EPOCH_WEEKDAY = 3
+
+# Longest non-working exception expanded into holidays (days)
+MAX_EXCEPTION_DAYS = 3660
+
+WEEKDAY_NAMES = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+
+def _day_number(value):
+    """Days since 1970-01-01 of a date or datetime"""
+    return int(np.datetime64(value, 'D').astype('int64'))
+
+
+def _monday_on_or_before(day):
+    """Day number of the Monday starting the week of a day number"""
+    return day - (day + EPOCH_WEEKDAY) % 7
+
+
+class WorkCalendar:
+    """Working days of a project calendar, compiled into a cumulative index
+
+    ``weekmask`` and ``holidays`` take the same forms as numpy.busdaycalendar
+    ('1111100' or 'Mon Tue Wed Thu Fri', dates). The calendar is compiled once
+    into the number of working days before every day of the index span, so
+    working-day differences and working-day offsets are array lookups that
+    run on whole milestone columns at once. Dates outside the span continue
+    the weekmask (without holidays) week by week.
+
+    Times are mapped to a working-time coordinate: the number of working days
+    before the day plus the elapsed fraction of the day if it is a working
+    day. Differences of coordinates are durations in working days, and a
+    coordinate maps back to a moment on a working day.
+    """
+
+    def __init__(self, weekmask='1111100', holidays=(), name=None):
+        """Compile the calendar; raises ValueError for an invalid weekmask or holidays"""
+        try:
+            holidays = np.array([np.datetime64(h, 'D') for h in holidays], dtype='datetime64[D]')
+            busdaycal = np.busdaycalendar(weekmask=weekmask, holidays=holidays)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f'Invalid work calendar: {str(e)}')
+        self.name = name
+        self.weekmask = busdaycal.weekmask
+        self.holidays = busdaycal.holidays
+        self._compile(busdaycal)
+
+    @classmethod
+    def from_exceptions(cls, working_weekdays, exceptions=(), name=None):
+        """Calendar from working flags Monday..Sunday and non-working (start, finish) date ranges
+
+        This is the form MS Project calendars come in; each exception covers
+        every day from its start to its finish date.
+        """
+        holidays = []
+        for start, finish in exceptions:
+            first = _day_number(start)
+            days = min(_day_number(finish or start) - first + 1, MAX_EXCEPTION_DAYS)
+            holidays.extend(np.arange(first, first + max(days, 1)).astype('datetime64[D]').tolist())
+        weekmask = [1 if working else 0 for working in working_weekdays]
+        return cls(weekmask, holidays, name)
+
+    def _compile(self, busdaycal):
+        """Cumulative working-day counts over the index span, aligned to whole weeks"""
+        first = _day_number(INDEX_START)
+        last = _day_number(INDEX_END)
+        if len(self.holidays):
+            holiday_days = self.holidays.astype('int64')
+            first = min(first, _monday_on_or_before(int(holiday_days[0])))
+            last = max(last, _monday_on_or_before(int(holiday_days[-1])) + 7)
+
+        days = np.arange(first, last).astype('datetime64[D]')
+        working = np.is_busday(days, busdaycal=busdaycal)
+        self._first = first
+        self._size = last - first
+        # _cumulative[i]: working days before day first + i (one entry past the end)
+        self._cumulative = np.concatenate(([0], np.cumsum(working, dtype=np.int64)))
+        # _working_days[k]: offset of the k-th working day
+        self._working_days = np.flatnonzero(working).astype(np.int64)
+        self._week_prefix = np.concatenate(([0], np.cumsum(self.weekmask, dtype=np.int64)))
+        self._week_days = np.flatnonzero(self.weekmask).astype(np.int64)
+        self._per_week = int(self.weekmask.sum())
+
+    @property
+    def key(self):
+        """Fingerprint of the weekmask and holidays, for cache and context keys"""
+        digest = hashlib.sha1(self.weekmask.tobytes())
+        digest.update(self.holidays.astype('int64').tobytes())
+        return digest.hexdigest()
+
+    def day_counts(self, days):
+        """Working days before each day number (int64 array)"""
+        days = np.asarray(days, dtype=np.int64)
+        offset = days - self._first
+        inside = self._cumulative[np.clip(offset, 0, self._size)]
+        after = offset - self._size
+        return np.where(
+            after > 0,
+            self._cumulative[-1] + (after // 7) * self._per_week + self._week_prefix[after % 7],
+            np.where(offset < 0, (offset // 7) * self._per_week + self._week_prefix[offset % 7], inside)
+        )
+
+    def nth_working_days(self, counts):
+        """Day number of the working day with each number of working days before it"""
+        counts = np.asarray(counts, dtype=np.int64)
+        total = len(self._working_days)
+        inside = self._working_days[np.clip(counts, 0, total - 1)]
+        after = counts - total
+        return self._first + np.where(
+            after >= 0,
+            self._size + (after // self._per_week) * 7 + self._week_days[after % self._per_week],
+            np.where(counts < 0, (counts // self._per_week) * 7 + self._week_days[counts % self._per_week], inside)
+        )
+
+    def working_time(self, values):
+        """Working-time coordinates (working days) of a datetime64 array; NaN for NaT"""
+        values = np.asarray(values, dtype='datetime64[us]')
+        missing = np.isnat(values)
+        us = np.where(missing, 0, values.astype('int64'))
+        days = us // US_PER_DAY
+        fraction = (us - days * US_PER_DAY) / US_PER_DAY
+        counts = self.day_counts(days)
+        working = self.day_counts(days + 1) - counts
+        return np.where(missing, np.nan, counts + fraction * working)
+
+    def from_working_time(self, coordinates):
+        """datetime64[us] array of working-time coordinates; NaT where not finite or out of range"""
+        coordinates = np.asarray(coordinates, dtype=float)
+        representable = np.isfinite(coordinates) & (np.abs(coordinates) < MAX_FORECAST_DAYS)
+        coordinates = np.where(representable, coordinates, 0.0)
+        whole = np.floor(coordinates)
+        days = self.nth_working_days(whole.astype(np.int64))
+        us = days * US_PER_DAY + np.rint((coordinates - whole) * US_PER_DAY).astype(np.int64)
+        return np.where(representable, us.astype('datetime64[us]'), np.datetime64('NaT'))
+
+    def working_days_between(self, start, end):
+        """Whole working days from start to end, floored like timedelta.days"""
+        start_time, end_time = self.working_time([start, end]).tolist()
+        return int(np.floor(end_time - start_time))
+
+    def add_working_days(self, start, days):
+        """Moment ``days`` working days after start; raises OverflowError beyond the datetime range"""
+        result = self.from_working_time(self.working_time([start]) + days)[0]
+        if np.isnat(result) or not MIN_DATETIME64 <= result <= MAX_DATETIME64:
+            raise OverflowError('date value out of range')
+        return result.item()
+
+    def is_working_day(self, value):
+        """Whether a date or datetime falls on a working day"""
+        day = _day_number(value)
+        return bool(self.day_counts(day + 1) - self.day_counts(day))
+
+    def to_dict(self):
+        """Description for the API"""
+        return {
+            'name': self.name,
+            'working_days': [name for name, working in zip(WEEKDAY_NAMES, self.weekmask) if working],
+            'holidays': [str(day) for day in self.holidays]
+        }